@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Servidor UDP Assíncrono para Transferência de Arquivos Confiável
+Mesmo protocolo de server.py, com um único event loop asyncio e uma corrotina por transferência
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, Iterable, List, Tuple
+import logging
+
+import config
+import protocol
+from pacing import Pacer
+from selective_repeat import SelectiveRepeatSender
+from server import UDPServer
+from sessions import TransferSession
+
+logger = logging.getLogger(__name__)
+
+class ServerProtocol(asyncio.DatagramProtocol):
+    """Entrega os datagramas recebidos ao servidor assíncrono"""
+
+    def __init__(self, server: 'AsyncUDPServer'):
+        self.server = server
+
+    def datagram_received(self, data: bytes, client_address: Tuple[str, int]):
+        self.server.dispatch(data, client_address)
+
+    def error_received(self, exc: Exception):
+        logger.warning(f"Erro no socket: {exc}")
+
+class AsyncUDPServer(UDPServer):
+    """Servidor UDP em um event loop: milhares de transferências sem uma thread por requisição"""
+
+    YIELD_EVERY = 32  # Segmentos enviados sem pacing antes de devolver o controle ao loop
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loop = None
+        self.transport = None
+        self.writer_socket = None  # Cópia do socket para aguardar escrita sem tomar o add_writer do transporte
+        self.writable = None  # Futuro compartilhado resolvido quando o socket volta a aceitar envios
+        self.stopped = None
+        self.tasks = set()
+        self.ack_events: Dict[int, asyncio.Event] = {}  # {transfer_id: evento de ACK recebido}
+        self.ready_events: Dict[int, asyncio.Event] = {}  # {transfer_id: evento de READY recebido}
+
+    def create_pools(self, queue_policy: str):
+        """Sem pools de workers: GETs e retransmissões são corrotinas no event loop"""
+        self.transfer_pool = self.control_pool = None
+
+    def start(self):
+        """Inicia o servidor e roda o event loop até stop()"""
+        # Loop criado à mão em vez de asyncio.run, que só existe a partir do Python 3.7
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.serve())
+        except Exception as e:
+            logger.error(f"Erro ao iniciar servidor: {e}")
+            self.stop()
+        finally:
+            # Ctrl+C interrompe o loop com tarefas pendentes: cancela e aguarda antes de fechá-lo
+            all_tasks = asyncio.all_tasks if hasattr(asyncio, 'all_tasks') else asyncio.Task.all_tasks
+            pending = all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+    async def serve(self):
+        """Abre o socket e atende requisições até o servidor ser parado"""
+        self.loop = asyncio.get_event_loop()
+        self.stopped = asyncio.Event()
+
+        # Socket próprio e não bloqueante: os segmentos são enviados com sendmsg diretamente
+        self.socket = self.create_socket()
+        self.socket.setblocking(False)
+        self.transport, _ = await self.loop.create_datagram_endpoint(lambda: ServerProtocol(self), sock=self.socket)
+        self.writer_socket = self.socket.dup()
+        self.running = True
+
+        logger.info(f"Servidor UDP assíncrono iniciado em {self.host}:{self.port}")
+        logger.info(f"Tamanho do payload: {self.MAX_PAYLOAD_SIZE} bytes (negociável até {self.max_segment_size})")
+        logger.info(f"Pacing: {self.create_pacer().describe()}")
+        logger.info(f"Controle de congestionamento: {self.congestion}")
+
+        self.spawn(self.janitor())
+        try:
+            await self.stopped.wait()
+        finally:
+            for task in list(self.tasks):
+                task.cancel()
+            self.loop.remove_writer(self.writer_socket.fileno())
+            self.writer_socket.close()
+            self.transport.close()
+
+    def stop(self):
+        """Para o servidor"""
+        self.running = False
+        if self.loop is not None and self.stopped is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.stopped.set)
+        logger.info(f"Cache de segmentos: {self.segment_cache.stats()}")
+        logger.info("Servidor parado")
+
+    async def janitor(self):
+        """Descarta periodicamente transferências ociosas"""
+        while True:
+            await asyncio.sleep(config.SESSION_JANITOR_INTERVAL)
+            self.purge_sessions()
+
+    def spawn(self, coroutine):
+        """Cria uma tarefa mantendo uma referência até ela terminar"""
+        task = self.loop.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def dispatch(self, data: bytes, client_address: Tuple[str, int]):
+        """Trata ACKs, READYs e sondagens na hora; GETs e retransmissões viram corrotinas"""
+        try:
+            if protocol.is_binary_message(data):
+                if data[0] == protocol.MSG_ACK:
+                    self.handle_ack(data, client_address)
+                elif data[0] == protocol.MSG_NACK:
+                    retransmit = self.parse_nack(data, client_address)
+                    if retransmit is not None:
+                        self.spawn(self.retransmit(*retransmit))
+                elif data[0] == protocol.MSG_DELTA_SUMS:
+                    self.handle_delta_sums(data, client_address)
+                return
+
+            request = data.decode('utf-8').strip()
+            logger.info(f"Requisição de {client_address} na porta {self.port}: {request}")
+
+            if request.startswith('GET '):
+                filename, options = protocol.parse_get_request(request)
+                self.spawn(self.serve_file(filename, client_address, options))
+            elif request.startswith('READY '):
+                self.handle_ready(request, client_address)
+            elif request.startswith('PROBE '):
+                self.handle_probe(int(request.split(' ')[1]), client_address)
+            elif request.startswith('RETRANSMIT '):
+                retransmit = self.parse_retransmit(request, client_address)
+                if retransmit is not None:
+                    self.spawn(self.retransmit(*retransmit))
+            elif request.startswith('FEC '):
+                self.handle_fec(request, client_address)
+            else:
+                self.send_error(client_address, "Formato de requisição inválido")
+
+        except Exception as e:
+            logger.error(f"Erro ao processar requisição: {e}")
+            self.send_error(client_address, f"Erro interno: {str(e)}")
+
+    def send_datagram(self, data: bytes, client_address: Tuple[str, int]):
+        """Envia uma mensagem de controle pelo transporte (enfileirada se o socket estiver cheio)"""
+        self.transport.sendto(data, client_address)
+
+    def handle_ack(self, data: bytes, client_address: Tuple[str, int]):
+        """Processa um ACK e acorda a corrotina da transferência"""
+        transfer_id, cumulative, bitmap = protocol.unpack_ack(data)
+        session = self.sessions.get(transfer_id, client_address)
+        if session is None or session.sender is None:
+            return
+
+        session.sender.on_ack(cumulative, bitmap)
+        event = self.ack_events.get(transfer_id)
+        if event is not None:
+            event.set()
+
+    def handle_ready(self, request: str, client_address: Tuple[str, int]):
+        """Registra o READY e acorda a corrotina que aguarda o handshake"""
+        session = super().handle_ready(request, client_address)
+        if session is not None and session.transfer_id in self.ready_events:
+            self.ready_events[session.transfer_id].set()
+        return session
+
+    async def await_ready_async(self, session: TransferSession) -> bool:
+        """Aguarda o READY repetindo o FILE_INFO com backoff; False se o cliente não responder"""
+        event = self.ready_events[session.transfer_id] = asyncio.Event()
+        timeout = config.HANDSHAKE_TIMEOUT
+        try:
+            attempt = 0
+            while attempt < config.HANDSHAKE_ATTEMPTS:
+                if session.ready.is_set():
+                    return True
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                    return True
+                except asyncio.TimeoutError:
+                    pass
+                # Cliente ainda enviando DELTA_SUMS: o READY virá depois da comparação
+                if time.monotonic() - session.last_delta < timeout:
+                    continue
+                attempt += 1
+                if attempt < config.HANDSHAKE_ATTEMPTS:
+                    self.send_datagram(session.file_info, session.client_address)
+                    timeout = min(timeout * 2, config.HANDSHAKE_MAX_BACKOFF)
+        finally:
+            self.ready_events.pop(session.transfer_id, None)
+
+        self.abandon_handshake(session)
+        return False
+
+    async def pace(self, pacer: Pacer, size: int):
+        """Aguarda a vez do pacote no token bucket com loop.call_later, sem bloquear o loop"""
+        delay = pacer.delay(size)
+        if delay <= 0:
+            return
+        waiter = self.loop.create_future()
+        handle = self.loop.call_later(delay, lambda: waiter.done() or waiter.set_result(None))
+        try:
+            await waiter
+        finally:
+            handle.cancel()
+
+    def wait_writable(self) -> asyncio.Future:
+        """Futuro resolvido quando o buffer de envio do socket tiver espaço (EAGAIN no envio direto)"""
+        if self.writable is None or self.writable.done():
+            self.writable = self.loop.create_future()
+            self.loop.add_writer(self.writer_socket.fileno(), self.on_writable)
+        return self.writable
+
+    def on_writable(self):
+        """Socket voltou a aceitar envios: acorda todas as transferências que aguardavam"""
+        self.loop.remove_writer(self.writer_socket.fileno())
+        if not self.writable.done():
+            self.writable.set_result(None)
+
+    async def send_segment(self, segments, segment_number: int, session: TransferSession, pacer: Pacer) -> bool:
+        """Envia um segmento respeitando o pacing; False se o número for inválido"""
+        if not 0 <= segment_number < len(segments):
+            return False
+
+        size = segments.segment_length(segment_number)
+        await self.pace(pacer, size)
+        if session.congestion is not None:
+            await self.pace(session.congestion.pacer, size)
+        while True:
+            try:
+                segments.send(self.socket, segment_number, session.client_address, session.prefix)
+                return True
+            except BlockingIOError:
+                # Buffer de envio cheio; shield para o cancelamento de uma transferência não cancelar o futuro das outras
+                await asyncio.shield(self.wait_writable())
+
+    async def send_parity_async(self, segments, blocks: List[int], session: TransferSession, pacer: Pacer):
+        """Envia as paridades FEC dos blocos cujo envio terminou"""
+        for first in blocks:
+            for packet in self.parity_packets(segments, session, first):
+                await self.pace(pacer, len(packet))
+                if session.congestion is not None:
+                    await self.pace(session.congestion.pacer, len(packet))
+                while True:
+                    try:
+                        self.socket.sendto(packet, session.client_address)
+                        break
+                    except BlockingIOError:
+                        await asyncio.shield(self.wait_writable())
+
+    async def open_segments_async(self, session: TransferSession):
+        """Carrega os segmentos fora do loop: montar o cache ou o índice lê o arquivo inteiro"""
+        return await self.loop.run_in_executor(None, self.load_segments, session.filename,
+                                               session.algorithm, session.segment_size, session.compression)
+
+    async def serve_file(self, filename: str, client_address: Tuple[str, int], options: Dict[str, str]):
+        """Corrotina de uma transferência: FILE_INFO, segmentos e fim de transmissão"""
+        try:
+            # Calcula o índice de checksums fora do loop; o resto da negociação é barato
+            negotiated = self.negotiate_options(options)
+            await self.loop.run_in_executor(None, self.warm_index, filename, negotiated)
+            
+            transfer = self.start_transfer(filename, client_address, options)
+            if transfer is None:
+                return
+            session, num_segments, negotiated = transfer
+
+            # Aguarda o READY do cliente, repetindo o FILE_INFO se ele ou o READY se perderem
+            if not await self.await_ready_async(session):
+                return
+            accepted = self.apply_ready(session, negotiated, num_segments)
+            if accepted is None:
+                return
+            window, ranges = accepted
+
+            # Receptor multicast: os segmentos chegam pelo grupo e esta transferência só atende NACKs
+            if session.channel is not None:
+                await self.serve_channel_async(session)
+                return
+
+            # A sessão não expira durante o envio
+            session.sending = True
+            try:
+                if negotiated.get('mode') == protocol.MODE_SR:
+                    await self.send_file_segments_sr_async(session, num_segments, window, ranges)
+                else:
+                    await self.send_file_segments_async(session, ranges)
+            finally:
+                session.sending = False
+                self.sessions.finish(session.transfer_id)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao processar arquivo {filename}: {e}")
+            self.send_error(client_address, f"Erro ao processar arquivo: {str(e)}")
+
+    async def serve_channel_async(self, session: TransferSession):
+        """Inscreve o receptor no canal; o primeiro a confirmar envia o arquivo ao grupo"""
+        channel = session.channel
+        if not self.channels.join(channel, session):
+            if channel.finished:
+                self.sessions.finish(session.transfer_id)
+            return
+        await asyncio.sleep(config.MULTICAST_JOIN_WINDOW)
+        channel.session.sending = True
+        try:
+            await self.send_file_segments_async(channel.session)
+        finally:
+            self.close_channel(channel)
+
+    def warm_index(self, filename: str, negotiated: Dict):
+        """Carrega ou calcula o índice de checksums da transferência"""
+        if os.path.exists(filename):
+            self.checksum_index.get(filename, negotiated['segment_size'], negotiated['checksum'])
+
+    async def send_file_segments_async(self, session: TransferSession, ranges: List[Tuple[int, int]] = None):
+        """Envia os intervalos (inicio, quantidade) de segmentos pedidos (o arquivo inteiro se None)"""
+        pacer = self.create_pacer()
+        segments = await self.open_segments_async(session)
+        try:
+            ranges = ranges if ranges is not None else [(0, len(segments))]
+            blocks = self.create_block_tracker(session, ranges)
+            for segment_number in protocol.iter_ranges(ranges):
+                await self.send_segment(segments, segment_number, session, pacer)
+                if blocks is not None:
+                    await self.send_parity_async(segments, blocks.sent(segment_number), session, pacer)
+                if pacer.unlimited and segment_number % self.YIELD_EVERY == self.YIELD_EVERY - 1:
+                    await asyncio.sleep(0)
+
+            self.send_end_transmission(session)
+            logger.info(f"Transmissão do arquivo {session.filename} concluída na porta {self.port}")
+        finally:
+            segments.close()
+
+    async def send_file_segments_sr_async(self, session: TransferSession, num_segments: int, window: int,
+                                          ranges: List[Tuple[int, int]] = None):
+        """Selective repeat: aguarda ACKs e temporizadores sem bloquear o loop"""
+        session.congestion = self.create_controller(session)
+        sender = SelectiveRepeatSender(num_segments, window, config.SR_RETRANSMIT_TIMEOUT, ranges, session.congestion)
+        session.sender = sender
+        blocks = self.create_block_tracker(session, ranges if ranges is not None else [(0, num_segments)])
+        event = self.ack_events[session.transfer_id] = asyncio.Event()
+        pacer = self.create_pacer()
+        retransmissions = 0
+        sent = 0
+
+        segments = await self.open_segments_async(session)
+        try:
+            while not sender.done:
+                if time.monotonic() - sender.last_activity > config.SR_IDLE_TIMEOUT:
+                    logger.warning(f"Sem ACKs de {session.client_address}, abandonando transferência de {session.filename}")
+                    return
+
+                # Retransmite segmentos com temporizador expirado
+                for segment_number in sender.expired():
+                    await self.send_segment(segments, segment_number, session, pacer)
+                    sender.mark_sent(segment_number)
+                    retransmissions += 1
+
+                # Envia um segmento novo se a janela permitir
+                if sender.can_send():
+                    segment_number = sender.next_segment
+                    await self.send_segment(segments, segment_number, session, pacer)
+                    sender.mark_sent(segment_number)
+                    if blocks is not None:
+                        await self.send_parity_async(segments, blocks.sent(segment_number), session, pacer)
+                    sent += 1
+                    if pacer.unlimited and sent % self.YIELD_EVERY == 0:
+                        await asyncio.sleep(0)
+                    continue
+
+                # Janela cheia: aguarda ACK ou expiração de temporizador
+                event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), sender.next_timeout())
+                except asyncio.TimeoutError:
+                    pass
+
+            self.send_end_transmission(session)
+            logger.info(f"Transmissão selective repeat de {session.filename} concluída ({retransmissions} retransmissões, "
+                        f"{session.congestion.describe()})")
+        finally:
+            segments.close()
+            session.sender = None
+            self.ack_events.pop(session.transfer_id, None)
+
+    async def retransmit(self, session: TransferSession, segment_numbers: Iterable[int]):
+        """Responde a um NACK com uma rajada paced dos segmentos pedidos"""
+        try:
+            pacer = self.create_pacer()
+            retransmitted = 0
+            invalid = []
+            segments = await self.open_segments_async(session)
+            try:
+                for segment_number in segment_numbers:
+                    if await self.send_segment(segments, segment_number, session, pacer):
+                        retransmitted += 1
+                    else:
+                        invalid.append(segment_number)
+            finally:
+                segments.close()
+            if invalid:
+                self.send_error(session.client_address, f"{len(invalid)} segmento(s) inválido(s), a partir de {invalid[0]}")
+
+            logger.info(f"{retransmitted} segmento(s) retransmitido(s) para {session.client_address} na porta {self.port}")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao retransmitir segmentos de {session.filename}: {e}")
+            self.send_error(session.client_address, f"Erro ao retransmitir: {str(e)}")
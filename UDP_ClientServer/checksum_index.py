@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Índice de Checksums Pré-calculados para o Servidor UDP
+Guarda em disco os digests de cada segmento e do arquivo inteiro, invalidados por mtime/tamanho
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+import checksums
+import config
+
+try:
+    import fcntl
+    HAS_FLOCK = True
+except ImportError:  # Windows: cada processo calcula seus próprios índices
+    HAS_FLOCK = False
+
+# Arquivo auxiliar: [magic(8)][tamanho(8)][mtime_ns(8)][tamanho_segmento(4)][algoritmo(16)]
+#                   [tamanho_digest(1)][num_segmentos(4)][digest do arquivo][digests dos segmentos]
+INDEX_MAGIC = b'UDPIDX01'
+INDEX_HEADER = struct.Struct('!8sQqI16sBI')
+
+class ChecksumIndex:
+    """Digests por segmento e do arquivo inteiro de uma versão do arquivo"""
+
+    def __init__(self, file_size: int, mtime_ns: int, segment_size: int, algorithm: str,
+                 file_digest: bytes, digests: bytes):
+        self.file_size = file_size
+        self.mtime_ns = mtime_ns
+        self.segment_size = segment_size
+        self.algorithm = algorithm
+        self.file_digest = file_digest
+        self.digests = digests
+        self.digest_size = len(file_digest)
+        self.num_segments = (file_size + segment_size - 1) // segment_size
+
+    def digest(self, segment_number: int) -> bytes:
+        """Digest pré-calculado de um segmento"""
+        start = segment_number * self.digest_size
+        return self.digests[start:start + self.digest_size]
+
+    def matches(self, stat: os.stat_result, segment_size: int, algorithm: str) -> bool:
+        """Indica se o índice ainda corresponde ao arquivo em disco"""
+        return (self.file_size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+                and self.segment_size == segment_size and self.algorithm == algorithm)
+
+    def to_bytes(self) -> bytes:
+        """Serializa o índice para o arquivo auxiliar"""
+        header = INDEX_HEADER.pack(INDEX_MAGIC, self.file_size, self.mtime_ns, self.segment_size,
+                                   self.algorithm.encode('ascii'), self.digest_size, self.num_segments)
+        return header + self.file_digest + self.digests
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional['ChecksumIndex']:
+        """Lê um índice serializado; None se estiver corrompido"""
+        if len(data) < INDEX_HEADER.size:
+            return None
+        magic, file_size, mtime_ns, segment_size, algorithm, digest_size, num_segments = \
+            INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or len(data) != INDEX_HEADER.size + digest_size * (num_segments + 1):
+            return None
+
+        offset = INDEX_HEADER.size
+        file_digest = data[offset:offset + digest_size]
+        digests = data[offset + digest_size:]
+        return cls(file_size, mtime_ns, segment_size, algorithm.rstrip(b'\0').decode('ascii'),
+                   file_digest, digests)
+
+    @classmethod
+    def build(cls, path: str, segment_size: int, algorithm: str) -> 'ChecksumIndex':
+        """Calcula os digests de todos os segmentos e do arquivo inteiro"""
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            file_hash = checksums.new(algorithm)
+            digests = bytearray()
+
+            if stat.st_size > 0:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for start in range(0, stat.st_size, segment_size):
+                            # Ler o mmap além do fim de um arquivo truncado derrubaria o processo (SIGBUS)
+                            if os.fstat(file.fileno()).st_size < stat.st_size:
+                                raise OSError(f"Arquivo {path} truncado durante o cálculo do índice")
+                            with view[start:start + segment_size] as payload:
+                                digests += checksums.digest(algorithm, payload)
+                                file_hash.update(payload)
+                    finally:
+                        view.release()
+
+        return cls(stat.st_size, stat.st_mtime_ns, segment_size, algorithm, file_hash.digest(), bytes(digests))
+
+class ChecksumIndexStore:
+    """Índices persistidos em arquivos auxiliares e carregados sob demanda"""
+
+    def __init__(self, directory: str = config.CHECKSUM_INDEX_DIR):
+        self.directory = directory
+        self.indexes = {}  # {(caminho, tamanho_segmento, algoritmo): ChecksumIndex}
+        self.lock = threading.Lock()
+        self.build_locks = {}  # {chave: Lock} evita calcular o mesmo índice em paralelo
+
+    def sidecar_path(self, path: str, segment_size: int, algorithm: str) -> str:
+        """Caminho do arquivo auxiliar de um arquivo servido"""
+        name = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{name}-{segment_size}-{algorithm}.idx")
+
+    def get(self, path: str, segment_size: int, algorithm: str = 'md5') -> ChecksumIndex:
+        """Retorna o índice válido do arquivo: da memória, do disco ou recalculado"""
+        key = (os.path.abspath(path), segment_size, algorithm)
+        stat = os.stat(path)
+
+        # Sem checksum não há o que calcular nem persistir
+        if checksums.digest_size(algorithm) == 0:
+            return ChecksumIndex(stat.st_size, stat.st_mtime_ns, segment_size, algorithm, b'', b'')
+
+        with self.lock:
+            index = self.indexes.get(key)
+            if index is not None and index.matches(stat, segment_size, algorithm):
+                return index
+            build_lock = self.build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            try:
+                # Outra thread pode ter carregado o índice enquanto aguardávamos
+                with self.lock:
+                    index = self.indexes.get(key)
+                if index is None or not index.matches(stat, segment_size, algorithm):
+                    index = self.load(path, segment_size, algorithm)
+                if index is None or not index.matches(stat, segment_size, algorithm):
+                    with self.process_lock(path, segment_size, algorithm):
+                        # Outro processo (--workers) pode ter persistido o índice enquanto aguardávamos
+                        index = self.load(path, segment_size, algorithm)
+                        if index is None or not index.matches(stat, segment_size, algorithm):
+                            index = ChecksumIndex.build(path, segment_size, algorithm)
+                            # Só persiste se o arquivo não mudou durante o cálculo
+                            if index.matches(os.stat(path), segment_size, algorithm):
+                                self.save(path, index)
+
+                with self.lock:
+                    self.indexes[key] = index
+                return index
+            finally:
+                with self.lock:
+                    self.build_locks.pop(key, None)
+
+    @contextmanager
+    def process_lock(self, path: str, segment_size: int, algorithm: str):
+        """Trava entre processos durante o cálculo de um índice, para só um worker ler o arquivo inteiro"""
+        lock_file = None
+        if HAS_FLOCK:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                lock_file = open(self.sidecar_path(path, segment_size, algorithm) + '.lock', 'wb')
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            except OSError:
+                # Sem permissão de escrita cada processo calcula o índice sozinho
+                if lock_file is not None:
+                    lock_file.close()
+                lock_file = None
+        try:
+            yield
+        finally:
+            if lock_file is not None:
+                lock_file.close()  # Fechar o descritor libera o flock
+
+    def load(self, path: str, segment_size: int, algorithm: str) -> Optional[ChecksumIndex]:
+        """Carrega o índice persistido, se existir"""
+        try:
+            with open(self.sidecar_path(path, segment_size, algorithm), 'rb') as sidecar:
+                return ChecksumIndex.from_bytes(sidecar.read())
+        except OSError:
+            return None
+
+    def save(self, path: str, index: ChecksumIndex):
+        """Persiste o índice de forma atômica (outros processos podem estar lendo)"""
+        temp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(index.to_bytes())
+            os.replace(temp_path, self.sidecar_path(path, index.segment_size, index.algorithm))
+        except OSError:
+            # Sem permissão de escrita o índice continua válido em memória
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Registro de Algoritmos de Checksum do Protocolo UDP
+Permite negociar por transferência o algoritmo e o tamanho do campo de checksum
+"""
+
+import hashlib
+import struct
+import zlib
+from typing import Callable, Dict, List
+
+import config
+
+class Crc32Hash:
+    """CRC32 (zlib) com a interface incremental do hashlib"""
+
+    digest_size = 4
+
+    def __init__(self, data: bytes = b''):
+        self.value = zlib.crc32(data)
+
+    def update(self, data: bytes):
+        self.value = zlib.crc32(data, self.value)
+
+    def digest(self) -> bytes:
+        return struct.pack('!I', self.value)
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+class NoHash:
+    """Sem checksum: para loopback ou redes confiáveis"""
+
+    digest_size = 0
+
+    def __init__(self, data: bytes = b''):
+        pass
+
+    def update(self, data: bytes):
+        pass
+
+    def digest(self) -> bytes:
+        return b''
+
+    def hexdigest(self) -> str:
+        return ''
+
+# {nome: fábrica de objetos com update()/digest()/hexdigest() e digest_size}
+ALGORITHMS: Dict[str, Callable] = {
+    'md5': hashlib.md5,
+    'crc32': Crc32Hash,
+    'blake2b': lambda data=b'': hashlib.blake2b(data, digest_size=config.BLAKE2B_DIGEST_SIZE),
+    'none': NoHash,
+}
+
+# xxHash é opcional: registrado apenas se o pacote estiver instalado
+try:
+    import xxhash
+    ALGORITHMS['xxh64'] = xxhash.xxh64
+except ImportError:
+    pass
+
+DIGEST_SIZES = {name: factory().digest_size for name, factory in ALGORITHMS.items()}
+
+def available() -> List[str]:
+    """Algoritmos suportados nesta instalação"""
+    return list(ALGORITHMS)
+
+def new(algorithm: str, data: bytes = b''):
+    """Cria um calculador incremental do algoritmo"""
+    return ALGORITHMS[algorithm](data)
+
+def digest(algorithm: str, data: bytes) -> bytes:
+    """Calcula o checksum de um bloco de dados"""
+    if algorithm == 'crc32':
+        return struct.pack('!I', zlib.crc32(data))
+    return ALGORITHMS[algorithm](data).digest()
+
+def digest_size(algorithm: str) -> int:
+    """Tamanho em bytes do campo de checksum no cabeçalho"""
+    return DIGEST_SIZES[algorithm]
+
+def negotiate(requested: str = None) -> str:
+    """Escolhe o algoritmo de uma transferência a partir do solicitado pelo cliente"""
+    if not config.ENABLE_CHECKSUM:
+        return 'none'
+    if requested in ALGORITHMS:
+        return requested
+    return config.CHECKSUM_ALGORITHM
@@ -4,9 +4,8 @@ Cliente UDP para Transferência de Arquivos Confiável
 Implementa recepção de arquivos com verificação de integridade e retransmissão
 """
 
+import select
 import socket
-import struct
-import hashlib
 import os
 import time
 import threading
@@ -14,12 +13,38 @@ from typing import Dict, List, Tuple, Optional
 import logging
 import sys
 
+import checksums
+import compression
+import config
+import fec
+import multicast
+import protocol
+from reassembly import FileAssembler, ResumeJournal
+from rtt import RTTEstimator
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def split_segments(num_segments: int, parts: int) -> List[Tuple[int, int]]:
+    """Divide [0, num_segments) em até 'parts' intervalos contíguos de tamanhos próximos"""
+    parts = max(1, min(parts, num_segments))
+    size, extra = divmod(num_segments, parts)
+    ranges, start = [], 0
+    for index in range(parts):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
 class UDPClient:
-    def __init__(self, server_host: str, server_port: int, timeout: float = 5.0):
+    def __init__(self, server_host: str, server_port: int, timeout: float = 5.0,
+                 mode: str = config.DEFAULT_MODE, window: int = config.SR_WINDOW_SIZE,
+                 checksum: str = config.CHECKSUM_ALGORITHM, segment_size: int = config.MAX_PAYLOAD_SIZE,
+                 probe_mtu: bool = False, streams: int = 1, resume: bool = config.RESUME_ENABLED,
+                 span: Optional[Tuple[str, str]] = None, delta: bool = False,
+                 fec_code: Optional[Tuple[int, int]] = None, fec_adaptive: bool = config.FEC_ADAPTIVE,
+                 compress: Optional[str] = None, join_multicast: bool = False):
         self.server_host = server_host
         self.server_port = server_port
         self.server_address = (server_host, server_port)
@@ -29,11 +54,73 @@ class UDPClient:
         
         # Estado da transferência
         self.current_file = None
+        self.transfer_id = None  # ID atribuído pelo servidor no FILE_INFO
         self.expected_segments = 0
-        self.received_segments = {}
-        self.missing_segments = set()
+        self.range_start = 0  # Intervalo [range_start, range_end) recebido por este fluxo
+        self.range_end = 0
+        self.range_received = 0  # Segmentos do intervalo já gravados (inclusive os retomados do journal)
+        self.range_resumed = 0  # Segmentos do intervalo que já estavam no disco ao começar
+        self.request_ranges = None  # Intervalos faltantes pedidos no READY ao retomar um download
+        self.assembler = None  # FileAssembler: segmentos gravados direto no arquivo de saída
         self.file_info = {}
         
+        # Leitura parcial: ('bytes' ou 'segments', 'inicio-fim') pedido no GET e trecho concedido em bytes
+        self.span = span
+        self.byte_offset = 0
+        self.byte_length = 0
+        
+        # Janela deslizante (selective repeat)
+        self.mode = mode
+        self.window = window
+        self.transfer_mode = protocol.MODE_STREAM  # Modo aceito pelo servidor
+        self.next_expected = 0  # Menor segmento ainda não recebido
+        self.unacked_segments = 0  # Segmentos recebidos desde o último ACK
+        
+        # RTT da sessão (handshake, READY, sondagens e NACKs) e intervalo médio entre segmentos,
+        # que definem quanto silêncio indica perda em vez de um timeout fixo
+        self.rtt = RTTEstimator()
+        self.arrival_gap = 0.0
+        self.last_arrival = None
+        self.ready_sent_at = None  # Último envio do READY; None após o primeiro segmento
+        self.ready_sends = 0
+        
+        # Checksum solicitado e o aceito pelo servidor
+        self.checksum = checksum
+        self.checksum_algorithm = 'md5'
+        self.segment_header = protocol.segment_header(checksums.digest_size('md5'))
+        
+        # Tamanho do segmento: solicitado (ou descoberto por sondagem) e aceito pelo servidor
+        self.segment_size = segment_size
+        self.probe_mtu = probe_mtu
+        self.recv_buffer_size = config.BUFFER_SIZE  # Acompanha o maior datagrama esperado
+        
+        # Fluxos paralelos, cada um com seu socket e sua transferência no servidor
+        self.streams = streams
+        
+        # Downloads interrompidos mantêm o .part e um journal para serem retomados
+        self.resume = resume
+        
+        # Sincronização delta: segmentos iguais aos de uma cópia local antiga não são baixados
+        self.delta = delta
+        
+        # FEC: código K:M pedido no GET; o decodificador guarda as paridades e mede a perda por bloco
+        self.fec_code = fec_code
+        self.fec_adaptive = fec_adaptive
+        self.decoder = None  # BlockDecoder se o servidor aceitou o FEC
+        self.fec_requested = None  # Último M pedido ao servidor
+        self.fec_recovered = 0  # Segmentos reconstruídos sem retransmissão
+        
+        # Compressão pedida no GET e codec aceito pelo servidor; bytes recebidos e restaurados
+        self.compress = compress
+        self.codec = None
+        self.wire_bytes = 0
+        self.payload_bytes = 0
+        
+        # Multicast: pedido no GET; grupo e ID do canal informados no FILE_INFO se o servidor aceitar
+        self.join_multicast = join_multicast
+        self.group = None
+        self.channel_id = None
+        
         # Configurações de simulação de perda
         self.simulate_loss = False
         self.loss_probability = 0.1  # 10% de chance de perda
@@ -45,6 +132,12 @@ class UDPClient:
             self.socket.settimeout(self.timeout)
             self.running = True
             
+            # Buffer do socket grande o bastante para uma janela de segmentos grandes
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, config.SOCKET_RECV_BUFFER)
+            except OSError as e:
+                logger.warning(f"Não foi possível ajustar SO_RCVBUF: {e}")
+            
             logger.info(f"Cliente conectado ao servidor {self.server_host}:{self.server_port}")
             return True
             
@@ -63,196 +156,877 @@ class UDPClient:
         """Solicita um arquivo do servidor"""
         try:
             logger.info(f"Solicitando arquivo: {filename}")
+            output_path = os.path.join(output_dir, filename)
             
-            # Envia requisição GET
-            request = f"GET {filename}"
-            self.socket.sendto(request.encode('utf-8'), self.server_address)
+            # Um download interrompido só é retomado com o mesmo segmento e checksum
+            journal = ResumeJournal.load(output_path) if self.resume else None
+            if journal is not None:
+                self.adopt_journal(journal)
+            elif self.probe_mtu:
+                self.segment_size = self.probe_segment_size()
             
-            # Aguarda informações do arquivo
-            file_info = self.receive_file_info()
+            file_info = self.open_transfer(filename)
             if not file_info:
-                logger.error("Não foi possível obter informações do arquivo - servidor pode não estar rodando")
                 return False
             
-            # Inicializa estado da transferência
-            self.current_file = filename
-            self.expected_segments = file_info['num_segments']
-            self.received_segments = {}
-            self.missing_segments = set()
-            self.file_info = file_info
-            
-            logger.info(f"Arquivo: {filename}")
-            logger.info(f"Tamanho: {file_info['file_size']} bytes")
-            logger.info(f"Segmentos esperados: {file_info['num_segments']}")
-            
-            # Inicia thread de recepção
-            receive_thread = threading.Thread(target=self.receive_file_segments)
-            receive_thread.daemon = True
-            receive_thread.start()
-            
-            # Aguarda conclusão da transferência
-            receive_thread.join()
-            
-            # Salva o arquivo
-            if len(self.received_segments) == self.expected_segments:
-                # Reconstrói e salva o arquivo
-                if self.save_file(os.path.join(output_dir, filename)):
-                    logger.info(f"Arquivo {filename} recebido com sucesso!")
-                    return True
+            # Segmentos são gravados no deslocamento final à medida que chegam; com o digest do
+            # servidor o .part de uma tentativa anterior da mesma versão do arquivo é reaproveitado
+            digest = file_info['options'].get('digest') if self.resume else None
+            self.assembler = FileAssembler(output_path, file_info['file_size'], self.segment_size,
+                                           self.checksum_algorithm, digest, self.byte_offset, self.byte_length)
+            if self.assembler.resumed:
+                logger.info(f"Retomando download: {self.assembler.resumed}/{self.assembler.num_segments} "
+                            f"segmentos já estavam no disco")
+            elif journal is not None:
+                logger.info("Download anterior não corresponde à versão atual do arquivo, recomeçando do zero")
+            try:
+                # Cópia antiga do arquivo inteiro: só os segmentos com digest diferente serão pedidos
+                if ('delta' in file_info['options'] and self.byte_length == file_info['file_size']
+                        and os.path.isfile(output_path)):
+                    self.sync_local_copy(output_path)
+                
+                # Recebe o arquivo do grupo multicast, em um único fluxo ou dividido em intervalos paralelos
+                if self.group is not None:
+                    self.receive_multicast()
+                elif self.streams > 1 and self.assembler.num_segments > 1:
+                    self.receive_streams(filename)
                 else:
+                    self.receive_range(self.assembler.first_segment, self.assembler.end_segment)
+                
+                # Salva o arquivo
+                if not self.assembler.complete:
+                    logger.error("Arquivo incompleto")
+                    return False
+                # Verificação fim a fim com o digest do arquivo inteiro, se informado (trechos só têm os checksums dos segmentos)
+                whole_file = self.byte_length == file_info['file_size']
+                if not self.save_file(file_info['options'].get('digest') if whole_file else None):
                     logger.error("Falha ao salvar arquivo")
                     return False
-            else:
-                logger.error("Arquivo incompleto")
-                return False
+                logger.info(f"Arquivo {filename} recebido com sucesso!")
+                return True
+            finally:
+                # Transferência não concluída: mantém .part e journal para retomar, ou remove o arquivo parcial
+                if self.assembler.fd is not None and self.assembler.suspend():
+                    logger.info(f"Download interrompido com {self.assembler.count}/{self.assembler.num_segments} "
+                                f"segmentos; execute novamente para retomar")
                 
         except Exception as e:
             logger.error(f"Erro ao solicitar arquivo: {e}")
             return False
     
-    def receive_file_info(self) -> Optional[Dict]:
-        """Recebe informações do arquivo do servidor"""
+    def adopt_journal(self, journal: ResumeJournal):
+        """Pede ao servidor o tamanho de segmento e o checksum com que o .part foi gravado"""
+        if journal.algorithm not in checksums.available():
+            return
+        self.segment_size = journal.segment_size
+        self.checksum = journal.algorithm
+        logger.info(f"Journal de download interrompido encontrado: segmentos de {journal.segment_size} bytes, "
+                    f"checksum {journal.algorithm}")
+    
+    def open_transfer(self, filename: str) -> Optional[Dict]:
+        """Envia o GET e prepara o estado da transferência a partir do FILE_INFO"""
+        # Envia requisição GET com as opções desejadas
+        options = {'checksum': self.checksum, 'segment_size': self.segment_size}
+        # O canal multicast não tem ACKs: receptores usam o modo stream com NACKs
+        if self.mode == protocol.MODE_SR and not self.join_multicast:
+            options.update({'mode': protocol.MODE_SR, 'window': self.window_for_buffer()})
+        if self.span is not None:
+            options[self.span[0]] = self.span[1]
+        if self.delta:
+            options['delta'] = 1
+        if self.fec_code is not None:
+            options['fec'] = f"{self.fec_code[0]}:{self.fec_code[1]}"
+        if self.compress is not None:
+            options['compression'] = self.compress
+        if self.join_multicast:
+            options['multicast'] = 1
+        request = f"GET {filename} {protocol.format_options(options)}"
+        
+        # Aguarda informações do arquivo, repetindo o GET se nada chegar
+        file_info = self.receive_file_info(request.encode('utf-8'))
+        if not file_info:
+            logger.error("Não foi possível obter informações do arquivo - servidor pode não estar rodando")
+            return None
+        
+        # Segmentos, ACKs e NACKs identificam a transferência pelo ID
+        if 'transfer' not in file_info['options']:
+            logger.error("Servidor não informou o ID da transferência")
+            return None
+        
+        # Inicializa estado da transferência
+        self.current_file = filename
+        self.transfer_id = int(file_info['options']['transfer'])
+        self.expected_segments = file_info['num_segments']
+        self.range_received = 0
+        self.file_info = file_info
+        self.transfer_mode = file_info['options'].get('mode', protocol.MODE_STREAM)
+        self.next_expected = 0
+        self.unacked_segments = 0
+        
+        # Servidores antigos não informam o checksum: usam MD5
+        self.checksum_algorithm = file_info['options'].get('checksum', 'md5')
+        if self.checksum_algorithm not in checksums.ALGORITHMS:
+            logger.error(f"Checksum não suportado: {self.checksum_algorithm}")
+            return None
+        
+        # Compressão aceita: o cabeçalho ganha o tamanho original e os payloads são restaurados ao chegar
+        self.codec = file_info['options'].get('compression')
+        if self.codec is not None and self.codec not in compression.CODECS:
+            logger.error(f"Compressão não suportada: {self.codec}")
+            return None
+        if self.compress is not None and self.codec is None:
+            logger.warning("Servidor não aceitou a compressão, recebendo os segmentos sem compressão")
+        self.wire_bytes = self.payload_bytes = 0
+        self.segment_header = protocol.segment_header(checksums.digest_size(self.checksum_algorithm),
+                                                      self.codec is not None)
+        
+        # Servidores antigos usam o payload padrão; o buffer de recepção acompanha o datagrama
+        self.segment_size = int(file_info['options'].get('segment_size', config.MAX_PAYLOAD_SIZE))
+        self.recv_buffer_size = max(config.BUFFER_SIZE, protocol.datagram_size(
+            self.segment_size, checksums.digest_size(self.checksum_algorithm), self.codec is not None))
+        
+        # Trecho concedido; servidores sem leitura parcial enviam o arquivo inteiro
+        self.byte_offset = int(file_info['options'].get('offset', 0))
+        self.byte_length = int(file_info['options'].get('length', file_info['file_size'] - self.byte_offset))
+        if self.span is not None and 'offset' not in file_info['options']:
+            logger.warning("Servidor não aceitou a leitura parcial, recebendo o arquivo inteiro")
+        
+        # Blocos FEC alinhados ao primeiro segmento do trecho; servidores sem FEC não informam o código
+        self.decoder = None
+        self.fec_recovered = 0
+        if 'fec' in file_info['options']:
+            k, m = fec.parse_code(file_info['options']['fec'])
+            base, _ = protocol.byte_range_segments(self.byte_offset, self.byte_length, self.segment_size)
+            self.decoder = fec.BlockDecoder(k, m, base)
+            self.fec_requested = m
+        elif self.fec_code is not None:
+            logger.warning("Servidor não aceitou o FEC, perdas serão recuperadas só por retransmissão")
+        
+        # Canal multicast: os segmentos do grupo carregam o ID do canal, os NACKs seguem pela transferência própria
+        self.group = self.channel_id = None
+        if 'group' in file_info['options'] and 'channel' in file_info['options']:
+            self.group = multicast.parse_group(file_info['options']['group'])
+            self.channel_id = int(file_info['options']['channel'])
+        elif self.join_multicast:
+            logger.warning("Servidor não aceitou o multicast, recebendo por unicast")
+        
+        logger.info(f"Arquivo: {filename}")
+        logger.info(f"Tamanho: {file_info['file_size']} bytes")
+        if self.byte_length != file_info['file_size']:
+            logger.info(f"Trecho: bytes [{self.byte_offset}, {self.byte_offset + self.byte_length})")
+        logger.info(f"Segmentos esperados: {file_info['num_segments']}")
+        logger.info(f"Checksum: {self.checksum_algorithm}")
+        logger.info(f"Tamanho do segmento: {self.segment_size} bytes")
+        if self.codec is not None:
+            logger.info(f"Compressão: {self.codec}")
+        if self.transfer_mode == protocol.MODE_SR:
+            self.window = int(file_info['options'].get('window', self.window))
+            logger.info(f"Modo selective repeat com janela de {self.window} segmentos")
+        if self.decoder is not None:
+            logger.info(f"FEC: {self.decoder.k} segmentos e {self.decoder.m} paridades por bloco"
+                        f"{' (adaptativo)' if self.fec_adaptive and self.group is None else ''}")
+        if self.group is not None:
+            logger.info(f"Multicast: grupo {multicast.format_group(self.group)}, canal {self.channel_id}")
+        return file_info
+    
+    def sync_local_copy(self, path: str):
+        """Envia os digests da cópia local em DELTA_SUMS e grava no .part os segmentos que o servidor confirmar"""
+        digest_size = checksums.digest_size(self.checksum_algorithm)
+        per_datagram = max(1, (config.DELTA_DATAGRAM_SIZE - protocol.DELTA_HEADER.size) // digest_size)
+        pending = {}  # {primeiro segmento: DELTA_SUMS sem resposta}
+        compared = reused = stalled = 0
+        
+        with open(path, 'rb') as local_copy:
+            sums = self.iter_delta_sums(local_copy, per_datagram, digest_size)
+            try:
+                while True:
+                    # Mantém até DELTA_WINDOW datagramas sem resposta
+                    while len(pending) < config.DELTA_WINDOW:
+                        message = next(sums, None)
+                        if message is None:
+                            break
+                        first_segment, count, packet = message
+                        pending[first_segment] = packet
+                        compared += count
+                        self.socket.sendto(packet, self.server_address)
+                    if not pending:
+                        break
+                    
+                    self.socket.settimeout(self.rtt.rto)
+                    try:
+                        data, _ = self.socket.recvfrom(self.recv_buffer_size)
+                    except socket.timeout:
+                        # DELTA_SUMS ou DELTA_MATCH perdido: repete os pendentes, desistindo sem progresso
+                        self.rtt.backoff()
+                        stalled += 1
+                        if stalled >= config.NACK_MAX_STALLED:
+                            logger.warning("Servidor não respondeu aos digests, baixando os segmentos restantes")
+                            break
+                        for packet in pending.values():
+                            self.socket.sendto(packet, self.server_address)
+                        continue
+                    
+                    if data.startswith(b'ERROR '):
+                        logger.warning(f"Erro do servidor: {data[6:].decode('utf-8', 'replace')}")
+                        break
+                    if not data or data[0] != protocol.MSG_DELTA_MATCH:
+                        continue  # FILE_INFO repetido enquanto o READY não é enviado
+                    transfer_id, first_segment, count, bitmap = protocol.unpack_delta(data)
+                    if transfer_id != self.transfer_id or pending.pop(first_segment, None) is None:
+                        continue
+                    stalled = 0
+                    
+                    # Segmentos confirmados são copiados da cópia local para o .part
+                    for offset in range(count):
+                        if bitmap[offset >> 3] & (0x80 >> (offset & 7)):
+                            segment_number = first_segment + offset
+                            if self.assembler.write(segment_number, self.read_local_segment(local_copy, segment_number)):
+                                reused += 1
+                    self.assembler.maybe_checkpoint()
+            finally:
+                self.socket.settimeout(self.timeout)
+        
+        logger.info(f"Delta: {reused} de {compared} segmentos comparados reaproveitados da cópia local, "
+                    f"{self.assembler.num_segments - self.assembler.count} a baixar")
+    
+    def iter_delta_sums(self, local_copy, per_datagram: int, digest_size: int):
+        """DELTA_SUMS (primeiro segmento, quantidade, datagrama) dos segmentos faltantes que a cópia local cobre"""
+        # Só segmentos presentes por inteiro, com o tamanho que terão na versão do servidor, podem ser iguais
+        local_size = os.fstat(local_copy.fileno()).st_size
+        covered = local_size // self.segment_size
+        if local_size >= self.assembler.file_size:
+            covered = self.assembler.end_segment
+        
+        for start, count in self.assembler.missing_ranges(0, covered):
+            for first_segment in range(start, start + count, per_datagram):
+                last = min(first_segment + per_datagram, start + count)
+                digests = b''.join(checksums.digest(self.checksum_algorithm,
+                                                    self.read_local_segment(local_copy, segment_number))
+                                   for segment_number in range(first_segment, last))
+                yield (first_segment, last - first_segment,
+                       protocol.pack_delta_sums(self.transfer_id, first_segment, digests, digest_size))
+    
+    def read_local_segment(self, local_copy, segment_number: int) -> bytes:
+        """Bytes da cópia local na posição de um segmento, com o tamanho dele na versão do servidor"""
+        local_copy.seek(segment_number * self.segment_size)
+        return local_copy.read(self.assembler.segment_length(segment_number))
+    
+    def receive_range(self, start: int, end: int) -> bool:
+        """Confirma o FILE_INFO pedindo os segmentos [start, end) e os recebe"""
+        self.range_start, self.range_end = start, end
+        self.next_expected = start
+        
+        # Segmentos retomados do journal já contam como recebidos; o servidor envia só os que faltam
+        missing_ranges = self.assembler.missing_ranges(start, end)
+        self.range_received = self.range_resumed = self.range_count - sum(count for _, count in missing_ranges)
+        self.request_ranges = None
+        if self.range_resumed:
+            self.request_ranges = protocol.coalesce_ranges(missing_ranges, config.RESUME_MAX_RANGES)
+        
+        # Confirma o FILE_INFO: o servidor só começa a enviar após o READY
+        self.ready_sends = 0
+        self.send_ready()
+        return self.receive_file_segments()
+    
+    def receive_streams(self, filename: str) -> bool:
+        """Divide o arquivo em intervalos recebidos em paralelo, cada um com socket e transferência próprios"""
+        streams = [self]
+        for _ in range(self.streams - 1):
+            stream = self.create_stream()
+            if stream.connect() and stream.open_transfer(filename) and stream.same_file(self):
+                streams.append(stream)
+            else:
+                # Servidor ocupado ou arquivo alterado: segue com os fluxos já abertos
+                logger.warning(f"Fluxo adicional não pôde ser aberto, usando {len(streams)} fluxo(s)")
+                stream.disconnect()
+                break
+        
+        first = self.assembler.first_segment
+        ranges = [(first + start, first + end) for start, end in split_segments(self.assembler.num_segments, len(streams))]
+        logger.info(f"Recebendo {self.assembler.num_segments} segmentos em {len(streams)} fluxos: {ranges}")
+        # Todos os fluxos gravam no mesmo arquivo de saída, cada um no seu intervalo
+        for stream in streams[1:]:
+            stream.assembler = self.assembler
+        threads = [threading.Thread(target=stream.receive_range, args=segment_range, daemon=True)
+                   for stream, segment_range in zip(streams, ranges)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        for stream in streams[1:]:
+            stream.disconnect()
+        return self.assembler.complete
+    
+    def create_stream(self) -> 'UDPClient':
+        """Cliente com as mesmas opções para um fluxo adicional (tamanho de segmento já negociado)"""
+        stream = UDPClient(self.server_host, self.server_port, self.timeout, self.mode, self.window,
+                           self.checksum, self.segment_size, span=self.span, fec_code=self.fec_code,
+                           fec_adaptive=self.fec_adaptive, compress=self.compress)
+        stream.simulate_loss = self.simulate_loss
+        stream.loss_probability = self.loss_probability
+        return stream
+    
+    def same_file(self, other: 'UDPClient') -> bool:
+        """Indica se duas transferências descrevem a mesma versão do arquivo"""
+        keys = ('file_size', 'num_segments')
+        return (all(self.file_info[key] == other.file_info[key] for key in keys)
+                and self.file_info['options'].get('digest') == other.file_info['options'].get('digest')
+                and (self.byte_offset, self.byte_length) == (other.byte_offset, other.byte_length)
+                and self.segment_size == other.segment_size
+                and self.checksum_algorithm == other.checksum_algorithm)
+    
+    def requested_datagram_size(self) -> int:
+        """Tamanho do datagrama de dados com o segmento e o checksum solicitados"""
+        digest_size = checksums.DIGEST_SIZES.get(self.checksum, checksums.digest_size('md5'))
+        return protocol.datagram_size(self.segment_size, digest_size, self.compress is not None)
+    
+    def window_for_buffer(self) -> int:
+        """Janela limitada ao que cabe no buffer de recepção do socket"""
+        # O Linux informa o dobro do valor efetivo (inclui espaço de controle)
+        receive_buffer = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) // 2
+        window = max(1, min(self.window, receive_buffer // self.requested_datagram_size()))
+        if window < self.window:
+            logger.info(f"Janela reduzida de {self.window} para {window} segmentos para caber no buffer do socket")
+        return window
+    
+    def probe_segment_size(self) -> int:
+        """Descobre o maior segmento entregue pelo caminho, aumentando o tamanho até haver perda"""
+        best = config.MAX_PAYLOAD_SIZE
+        requested = self.segment_size
         try:
-            # Reduz o timeout para detectar servidor não disponível mais rapidamente
-            original_timeout = self.socket.gettimeout()
-            self.socket.settimeout(3.0)  # 3 segundos para detectar servidor não disponível
-            
-            data, _ = self.socket.recvfrom(4096)
-            message = data.decode('utf-8')
-            
-            # Restaura timeout original
-            self.socket.settimeout(original_timeout)
+            self.socket.settimeout(config.PROBE_TIMEOUT)
+            for size in config.PROBE_SIZES:
+                if size <= best:
+                    continue
+                self.segment_size = size
+                if not self.send_probe(self.requested_datagram_size()):
+                    break
+                best = size
+        finally:
+            self.segment_size = requested
+            self.socket.settimeout(self.timeout)
+        
+        logger.info(f"Sondagem: segmentos de até {best} bytes chegam sem perda")
+        return best
+    
+    def send_probe(self, size: int) -> bool:
+        """Pede ao servidor um datagrama de 'size' bytes; True se ele chegar íntegro"""
+        for attempt in range(config.PROBE_ATTEMPTS):
+            sent_at = time.monotonic()
+            self.socket.sendto(f"PROBE {size}".encode('utf-8'), self.server_address)
+            try:
+                while True:
+                    # Respostas atrasadas de sondagens menores são descartadas
+                    data, _ = self.socket.recvfrom(size + 1)
+                    if (len(data) == size and data[0] == protocol.MSG_PROBE
+                            and protocol.PROBE_HEADER.unpack_from(data)[1] == size):
+                        if attempt == 0:
+                            self.rtt.sample(time.monotonic() - sent_at)
+                        return True
+            except socket.timeout:
+                continue
+            except OSError:
+                # Datagrama maior que o permitido pelo sistema
+                return False
+        return False
+    
+    def receive_file_info(self, request: bytes) -> Optional[Dict]:
+        """Envia o GET e recebe as informações do arquivo, repetindo o GET com backoff"""
+        original_timeout = self.socket.gettimeout()
+        try:
+            deadline = time.monotonic() + self.timeout
+            sent_at = time.monotonic()
+            self.socket.sendto(request, self.server_address)
             
-            if message.startswith('FILE_INFO '):
-                parts = message.split(' ')
-                if len(parts) >= 4:
-                    return {
-                        'filename': parts[1],
-                        'file_size': int(parts[2]),
-                        'num_segments': int(parts[3])
-                    }
-            elif message.startswith('ERROR '):
-                error_msg = message[6:]
-                logger.error(f"Erro do servidor: {error_msg}")
-                return None
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.error("Timeout ao aguardar informações do arquivo - servidor não está respondendo")
+                    return None
+                
+                self.socket.settimeout(min(self.rtt.rto, config.HANDSHAKE_MAX_BACKOFF, remaining))
+                try:
+                    data, _ = self.socket.recvfrom(config.BUFFER_SIZE)
+                except socket.timeout:
+                    # GET ou FILE_INFO perdido; o servidor ignora GETs repetidos durante o handshake
+                    self.rtt.backoff()
+                    sent_at = None  # Karn: a resposta de um GET repetido não mede o RTT
+                    self.socket.sendto(request, self.server_address)
+                    continue
+                
+                # Respostas atrasadas de sondagens não são o FILE_INFO
+                if protocol.is_binary_message(data):
+                    continue
+                message = data.decode('utf-8')
+                
+                if message.startswith('FILE_INFO '):
+                    parts, options = protocol.parse_options(message.split(' '))
+                    if len(parts) >= 4:
+                        if sent_at is not None:
+                            self.rtt.sample(time.monotonic() - sent_at)
+                        return {
+                            'filename': parts[1],
+                            'file_size': int(parts[2]),
+                            'num_segments': int(parts[3]),
+                            'options': options
+                        }
+                elif message.startswith('ERROR '):
+                    error_msg = message[6:]
+                    logger.error(f"Erro do servidor: {error_msg}")
+                    return None
                 
-        except socket.timeout:
-            logger.error("Timeout ao aguardar informações do arquivo - servidor não está respondendo")
         except Exception as e:
             logger.error(f"Erro ao receber informações do arquivo: {e}")
-        
-        # Restaura timeout original em caso de erro
-        try:
+            return None
+        finally:
+            # Restaura timeout original
             self.socket.settimeout(original_timeout)
-        except:
-            pass
-            
-        return None
+    
+    def send_ready(self):
+        """Confirma o FILE_INFO com a janela, o tamanho de segmento e o segmento inicial"""
+        options = {'transfer': self.transfer_id, 'segment_size': self.segment_size,
+                   'start': self.range_start, 'end': self.range_end}
+        if self.request_ranges is not None:
+            # Retomada: servidores sem a opção ranges enviam o trecho do primeiro ao último intervalo
+            if self.request_ranges:
+                first, (last, count) = self.request_ranges[0][0], self.request_ranges[-1]
+                options.update(start=first, end=last + count, ranges=protocol.format_ranges(self.request_ranges))
+            else:
+                options['start'] = self.range_end
+        if self.transfer_mode == protocol.MODE_SR:
+            options['window'] = self.window
+        # O primeiro segmento responde ao READY: amostra de RTT, a menos que o READY tenha sido repetido
+        self.ready_sends += 1
+        self.ready_sent_at = time.monotonic()
+        self.socket.sendto(f"READY {protocol.format_options(options)}".encode('utf-8'), self.server_address)
     
     def receive_file_segments(self):
         """Recebe todos os segmentos do arquivo"""
         try:
-            while len(self.received_segments) < self.expected_segments:
+            selective_repeat = self.transfer_mode == protocol.MODE_SR
+            last_data_time = time.monotonic()
+            self.last_arrival = None
+            
+            while self.range_received < self.range_count:
+                # ACK pendente sai em até SR_ACK_DELAY; sem ele, espera o silêncio que indica perda
+                idle_timeout = self.idle_timeout()
+                if selective_repeat and self.unacked_segments:
+                    self.socket.settimeout(min(config.SR_ACK_DELAY, idle_timeout))
+                else:
+                    self.socket.settimeout(idle_timeout)
                 try:
-                    data, _ = self.socket.recvfrom(4096)
+                    data, _ = self.socket.recvfrom(self.recv_buffer_size)
                     
-                    # Verifica se é uma mensagem de controle (texto) ou segmento de dados (binário)
-                    try:
-                        message = data.decode('utf-8')
+                    # Segmentos de dados começam com o tipo binário; o resto são mensagens de controle
+                    if protocol.is_binary_message(data):
+                        if data[0] == protocol.MSG_FEC:
+                            # Paridade: perdas do bloco reconstruídas sem pedir retransmissão
+                            recovered = self.process_parity(data)
+                            self.record_arrival()
+                            last_data_time = time.monotonic()
+                            if selective_repeat and recovered:
+                                self.send_ack()
+                            continue
+                        segment_number = self.process_segment(data)
+                        self.record_arrival()
+                    else:
+                        message = data.decode('utf-8', 'replace')
                         
                         if message.startswith('END_TRANSMISSION'):
+                            if not self.is_current_transfer(message):
+                                continue
                             logger.info("Recebido sinal de fim de transmissão")
                             break
+                        elif message.startswith('FILE_INFO ') and self.is_current_transfer(message):
+                            # FILE_INFO repetido: o READY se perdeu
+                            if self.range_received == self.range_resumed:
+                                self.send_ready()
+                            continue
                         elif message.startswith('ERROR '):
                             error_msg = message[6:]
                             logger.error(f"Erro do servidor: {error_msg}")
                             break
-                        else:
-                            # Se não for mensagem de controle, deve ser um segmento de dados
-                            # Processa como segmento binário
-                            self.process_segment(data)
-                            
-                    except UnicodeDecodeError:
-                        # Dados binários - processa como segmento
-                        self.process_segment(data)
+                        continue
+                    
+                    last_data_time = time.monotonic()
+                    if selective_repeat:
+                        self.acknowledge_segment(segment_number)
                         
                 except socket.timeout:
-                    logger.warning("Timeout ao aguardar segmentos")
+                    silence = time.monotonic() - last_data_time
+                    if silence >= self.timeout:
+                        logger.warning("Timeout ao aguardar segmentos")
+                        break
+                    if selective_repeat and self.unacked_segments and silence < idle_timeout:
+                        # ACK atrasado: nenhum segmento novo chegou para levá-lo junto
+                        self.send_ack()
+                        continue
+                    
+                    # Silêncio além do RTO: o temporizador dobra até um segmento chegar
+                    self.rtt.backoff()
+                    if selective_repeat:
+                        # Reenvia o estado atual para destravar a janela do servidor
+                        self.send_ack()
+                        continue
+                    if self.range_received == self.range_resumed:
+                        # Nada chegou ainda: o servidor repete o FILE_INFO se o READY se perdeu
+                        continue
+                    # Fim do fluxo perdido (últimos segmentos ou END_TRANSMISSION): recupera por NACK
+                    logger.info(f"Nenhum segmento há {silence * 1000:.0f} ms, iniciando recuperação")
                     break
                 except Exception as e:
                     logger.error(f"Erro ao receber segmento: {e}")
                     break
             
-            # Verifica se recebeu todos os segmentos
-            if len(self.received_segments) == self.expected_segments:
-                logger.info(f"Todos os {self.expected_segments} segmentos recebidos com sucesso")
-                return True
-            else:
-                missing_segments = set(range(self.expected_segments)) - set(self.received_segments.keys())
-                logger.warning(f"Segmentos perdidos: {sorted(missing_segments)}")
-                
-                # Tenta solicitar retransmissão dos segmentos perdidos
-                self.request_missing_segments(missing_segments)
-                
-                # Verifica novamente após retransmissão
-                if len(self.received_segments) == self.expected_segments:
-                    logger.info("Todos os segmentos recebidos após retransmissão")
-                    return True
-                else:
-                    logger.error("Arquivo incompleto")
-                    return False
+            self.socket.settimeout(self.timeout)
+            if selective_repeat:
+                if self.range_received == self.range_count:
+                    # Confirma o fim algumas vezes, pois o ACK final pode se perder
+                    for _ in range(3):
+                        self.send_ack()
+            
+            if self.fec_recovered:
+                logger.info(f"{self.fec_recovered} segmento(s) reconstruído(s) por FEC sem retransmissão")
+            if self.codec is not None and self.wire_bytes:
+                logger.info(f"Compressão {self.codec}: {self.wire_bytes} bytes recebidos para {self.payload_bytes} "
+                            f"({self.payload_bytes / self.wire_bytes:.2f}x)")
+            
+            return self.complete_range()
                     
         except Exception as e:
             logger.error(f"Erro ao receber segmentos: {e}")
             return False
     
-    def process_segment(self, data: bytes):
-        """Processa um segmento recebido"""
+    def complete_range(self) -> bool:
+        """Verifica o intervalo recebido e recupera por NACK os segmentos que faltarem"""
+        if self.range_received == self.range_count:
+            logger.info(f"Todos os {self.range_count} segmentos recebidos com sucesso")
+            return True
+        
+        missing_ranges = self.assembler.missing_ranges(self.range_start, self.range_end)
+        logger.warning(f"Segmentos perdidos: {self.range_count - self.range_received} "
+                       f"em {len(missing_ranges)} intervalos")
+        
+        # Tenta solicitar retransmissão dos segmentos perdidos
+        self.request_missing_segments(missing_ranges)
+        
+        # Verifica novamente após retransmissão
+        if self.range_received == self.range_count:
+            logger.info("Todos os segmentos recebidos após retransmissão")
+            return True
+        logger.error("Arquivo incompleto")
+        return False
+    
+    def receive_multicast(self) -> bool:
+        """Recebe o envio do canal multicast e recupera por NACK unicast os segmentos que faltarem"""
+        self.range_start, self.range_end = self.assembler.first_segment, self.assembler.end_segment
+        missing_ranges = self.assembler.missing_ranges(self.range_start, self.range_end)
+        self.range_received = self.range_resumed = self.range_count - sum(count for _, count in missing_ranges)
+        self.request_ranges = None
+        
+        # Entra no grupo pela interface que alcança o servidor, antes do READY que libera o envio
+        try:
+            group_socket = multicast.open_receiver(self.group, multicast.local_interface(self.server_host))
+        except OSError as e:
+            logger.warning(f"Não foi possível entrar no grupo {multicast.format_group(self.group)}: {e}; "
+                           f"recebendo só por retransmissão")
+            self.send_ready()
+            return self.complete_range()
+        
+        try:
+            self.ready_sends = 0
+            self.send_ready()
+            # O canal espera outros receptores antes de enviar: o primeiro segmento não mede o RTT do READY
+            self.ready_sent_at = None
+            self.last_arrival = None
+            last_data_time = time.monotonic()
+            received = self.range_received
+            
+            while self.range_received < self.range_count:
+                readable, _, _ = select.select([group_socket, self.socket], [], [], self.idle_timeout())
+                if not readable:
+                    silence = time.monotonic() - last_data_time
+                    if silence >= self.timeout:
+                        logger.warning("Timeout ao aguardar segmentos do grupo")
+                        break
+                    self.rtt.backoff()
+                    if self.range_received == self.range_resumed:
+                        # Canal ainda na janela de entrada de receptores
+                        continue
+                    logger.info(f"Nenhum segmento há {silence * 1000:.0f} ms, iniciando recuperação")
+                    break
+                
+                finished = False
+                for sock in readable:
+                    data, _ = sock.recvfrom(self.recv_buffer_size)
+                    if protocol.is_binary_message(data):
+                        if data[0] == protocol.MSG_FEC:
+                            self.process_parity(data)
+                        else:
+                            self.process_segment(data)
+                        self.record_arrival()
+                        last_data_time = time.monotonic()
+                        continue
+                    
+                    message = data.decode('utf-8', 'replace')
+                    _, options = protocol.parse_options(message.split(' '))
+                    if message.startswith('END_TRANSMISSION') and options.get('transfer') == str(self.channel_id):
+                        logger.info("Recebido sinal de fim de transmissão do grupo")
+                        finished = True
+                    elif message.startswith('FILE_INFO ') and self.is_current_transfer(message):
+                        # FILE_INFO repetido: o READY se perdeu
+                        if self.range_received == self.range_resumed:
+                            self.send_ready()
+                            self.ready_sent_at = None
+                    elif message.startswith('ERROR '):
+                        logger.warning(f"Erro do servidor: {message[6:]}")
+                if finished:
+                    break
+            
+            logger.info(f"{self.range_received - received} segmento(s) recebido(s) pelo grupo "
+                        f"{multicast.format_group(self.group)}")
+        finally:
+            group_socket.close()
+        
+        if self.fec_recovered:
+            logger.info(f"{self.fec_recovered} segmento(s) reconstruído(s) por FEC sem retransmissão")
+        return self.complete_range()
+    
+    def idle_timeout(self) -> float:
+        """Silêncio que indica perda: o RTO mais alguns intervalos entre segmentos (pacing do servidor)"""
+        return min(self.rtt.rto + config.RTT_GAP_FACTOR * self.arrival_gap, self.timeout)
+    
+    def record_arrival(self):
+        """Atualiza o intervalo médio entre datagramas e mede o RTT do READY no primeiro segmento"""
+        now = time.monotonic()
+        if self.ready_sent_at is not None:
+            if self.ready_sends == 1:
+                self.rtt.sample(now - self.ready_sent_at)
+            self.ready_sent_at = None
+        if self.last_arrival is not None:
+            self.arrival_gap += RTTEstimator.ALPHA * ((now - self.last_arrival) - self.arrival_gap)
+        self.last_arrival = now
+    
+    @property
+    def range_count(self) -> int:
+        """Número de segmentos no intervalo deste fluxo"""
+        return self.range_end - self.range_start
+    
+    def is_current_transfer(self, message: str) -> bool:
+        """Indica se uma mensagem de controle com 'transfer=ID' pertence à transferência atual"""
+        _, options = protocol.parse_options(message.split(' '))
+        return options.get('transfer', str(self.transfer_id)) == str(self.transfer_id)
+    
+    def accepts_transfer(self, transfer_id: int) -> bool:
+        """Segmentos da transferência própria (retransmissões) ou do canal multicast em que o cliente entrou"""
+        return transfer_id == self.transfer_id or (self.channel_id is not None and transfer_id == self.channel_id)
+    
+    def process_segment(self, data: bytes) -> Optional[int]:
+        """Processa um segmento recebido; retorna seu número se for válido"""
         try:
-            # Extrai cabeçalho - deve ser 24 bytes como definido no servidor
-            if len(data) < 24:  # Tamanho mínimo do cabeçalho (24 bytes)
+            # Extrai cabeçalho - o tamanho depende do checksum negociado
+            if not data or data[0] != protocol.MSG_DATA:
+                return
+            
+            data_start = protocol.SEGMENT_PREFIX.size + self.segment_header.size
+            if len(data) < data_start:
                 logger.warning("Segmento muito pequeno, ignorando")
                 return
             
-            header = data[:24]
-            segment_number, checksum, filename_length, data_length = struct.unpack('!I16sHH', header)
+            _, transfer_id = protocol.SEGMENT_PREFIX.unpack_from(data)
+            if not self.accepts_transfer(transfer_id):
+                logger.debug(f"Segmento de outra transferência ({transfer_id}), ignorando")
+                return
             
-            # Extrai nome do arquivo e dados
-            filename_start = 24
-            filename_end = filename_start + filename_length
-            data_start = filename_end
+            if self.codec is not None:
+                segment_number, checksum, data_length, original_length = self.segment_header.unpack_from(
+                    data, protocol.SEGMENT_PREFIX.size)
+            else:
+                segment_number, checksum, data_length = self.segment_header.unpack_from(data, protocol.SEGMENT_PREFIX.size)
             
             if len(data) < data_start + data_length:
                 logger.warning("Segmento incompleto, ignorando")
                 return
             
-            filename = data[filename_start:filename_end].decode('utf-8')
-            segment_data = data[data_start:data_start + data_length]
+            # Sem cópia: o payload vai do datagrama direto para o checksum e o disco
+            segment_data = memoryview(data)[data_start:data_start + data_length]
             
             # Verifica se deve simular perda
             if self.simulate_loss and self.should_discard_segment():
                 logger.info(f"Simulando perda do segmento {segment_number}")
                 return
             
+            # Payload comprimido: restaurado antes do checksum, que é o dos dados originais
+            if self.codec is not None:
+                self.wire_bytes += data_length
+                segment_data = compression.decompress(self.codec, segment_data, original_length)
+                self.payload_bytes += original_length
+            
             # Verifica checksum
             if self.verify_checksum(segment_data, checksum):
-                self.received_segments[segment_number] = {
-                    'data': segment_data,
-                    'checksum': checksum,
-                    'filename': filename
-                }
+                # Duplicatas (retransmissões desnecessárias) são confirmadas mas não gravadas de novo
+                if self.assembler.write(segment_number, segment_data):
+                    self.range_received += 1
+                    self.assembler.maybe_checkpoint()
                 logger.debug(f"Segmento {segment_number} recebido e verificado")
+                if self.decoder is not None:
+                    self.track_block(segment_number)
+                return segment_number
             else:
                 logger.warning(f"Checksum inválido para segmento {segment_number}")
                 
+        except ValueError as e:
+            logger.warning(f"{e}, ignorando")
         except Exception as e:
             logger.error(f"Erro ao processar segmento: {e}")
+        
+        return None
+    
+    def process_parity(self, data: bytes) -> int:
+        """Processa uma paridade FEC; retorna quantos segmentos perdidos ela permitiu reconstruir"""
+        try:
+            digest_size = checksums.digest_size(self.checksum_algorithm)
+            if self.decoder is None or len(data) <= protocol.FEC_HEADER.size + digest_size:
+                return 0
+            transfer_id, first, m, row, checksum, parity = protocol.unpack_fec(data, digest_size)
+            if not self.accepts_transfer(transfer_id):
+                return 0
+            
+            if self.simulate_loss and self.should_discard_segment():
+                logger.info(f"Simulando perda da paridade {row} do bloco {first}")
+                return 0
+            if not self.verify_checksum(parity, checksum):
+                logger.warning(f"Checksum inválido para a paridade {row} do bloco {first}")
+                return 0
+            
+            self.decoder.add_parity(first, m, row, bytes(parity))
+            return self.recover_block(first)
+        except Exception as e:
+            logger.error(f"Erro ao processar paridade: {e}")
+            return 0
+    
+    def recover_block(self, first: int) -> int:
+        """Reconstrói os segmentos perdidos de um bloco se houver paridades suficientes"""
+        parity = self.decoder.parity.get(first)
+        if not parity:
+            return 0
+        
+        # Segmentos do bloco já no disco entram na decodificação; os outros são as incógnitas
+        known, missing = {}, []
+        for segment_number in range(first, min(first + self.decoder.k, self.assembler.end_segment)):
+            data = self.assembler.read(segment_number)
+            if data is None:
+                missing.append(segment_number - first)
+            else:
+                known[segment_number - first] = data
+        if not missing:
+            self.decoder.discard(first)
+            return 0
+        if len(missing) > len(parity):
+            return 0
+        
+        # Só este fluxo conta os segmentos do seu intervalo; os dos vizinhos chegam pelos fluxos deles
+        recovered = 0
+        for column, payload in fec.decode(self.decoder.k, known, parity, missing).items():
+            segment_number = first + column
+            if (self.range_start <= segment_number < self.range_end
+                    and self.assembler.write(segment_number, payload[:self.assembler.segment_length(segment_number)])):
+                self.range_received += 1
+                recovered += 1
+        self.decoder.discard(first)
+        if recovered:
+            self.fec_recovered += recovered
+            if first == self.decoder.current_block:
+                self.decoder.recovered[first] = self.decoder.recovered.get(first, 0) + recovered
+            self.assembler.maybe_checkpoint()
+            logger.debug(f"Bloco {first}: {recovered} segmento(s) reconstruído(s) por FEC")
+        return recovered
+    
+    def track_block(self, segment_number: int):
+        """Mede a perda de cada bloco terminado e tenta reconstruir o bloco do segmento recebido"""
+        previous = self.decoder.advance(segment_number)
+        if previous is not None:
+            # Perdas do bloco anterior, inclusive as já reconstruídas, definem as paridades pedidas
+            start = max(previous, self.range_start)
+            end = min(previous + self.decoder.k, self.range_end)
+            lost = sum(1 for number in range(start, end) if not self.assembler.has(number))
+            self.decoder.record_loss(end - start, lost + self.decoder.recovered.pop(previous, 0))
+            self.adapt_fec()
+        
+        block = self.decoder.block_of(segment_number)
+        if block in self.decoder.parity:
+            self.recover_block(block)
+    
+    def adapt_fec(self):
+        """Pede ao servidor as paridades por bloco adequadas à perda observada"""
+        # O M do canal multicast é o mesmo para todos os receptores
+        if not self.fec_adaptive or self.channel_id is not None:
+            return
+        parity = self.decoder.recommended_parity()
+        # Repetido enquanto as paridades recebidas não mostrarem o novo M (o pedido pode se perder)
+        if parity == self.fec_requested and parity == self.decoder.m:
+            return
+        if parity != self.fec_requested:
+            logger.info(f"Perda observada de {self.decoder.loss:.1%}: pedindo {parity} paridade(s) por bloco")
+        self.fec_requested = parity
+        try:
+            self.socket.sendto(f"FEC transfer={self.transfer_id} parity={parity}".encode('utf-8'), self.server_address)
+        except OSError as e:
+            logger.error(f"Erro ao enviar FEC: {e}")
+    
+    def acknowledge_segment(self, segment_number: Optional[int]):
+        """Decide se um ACK deve ser enviado após receber um segmento"""
+        in_order = segment_number is not None and segment_number == self.next_expected
+        
+        # Avança o ponteiro cumulativo
+        previous = self.next_expected
+        while self.assembler.has(self.next_expected):
+            self.next_expected += 1
+        # Saltou segmentos que já estavam no disco (buraco preenchido, retomada ou delta): a janela
+        # do servidor só avança com este ACK
+        jumped = self.next_expected - previous > 1
+        
+        self.unacked_segments += 1
+        # ACK imediato para segmentos fora de ordem/inválidos, atrasado para os em ordem
+        if (not in_order or jumped or self.unacked_segments >= config.SR_ACK_EVERY
+                or self.next_expected >= self.range_end):
+            self.send_ack()
+    
+    def send_ack(self):
+        """Envia ACK cumulativo com bitmap dos segmentos recebidos além dele"""
+        while self.assembler.has(self.next_expected):
+            self.next_expected += 1
+        
+        # Bit i do bitmap = segmento next_expected + 1 + i, extraído do bitmap de recebidos
+        bitmap = self.assembler.window(self.next_expected + 1, self.window)
+        
+        try:
+            self.socket.sendto(protocol.pack_ack(self.transfer_id, self.next_expected, bitmap), self.server_address)
+            self.unacked_segments = 0
+        except Exception as e:
+            logger.error(f"Erro ao enviar ACK: {e}")
     
     def verify_checksum(self, data: bytes, expected_checksum: bytes) -> bool:
         """Verifica o checksum dos dados"""
-        calculated_checksum = hashlib.md5(data).digest()
+        if self.checksum_algorithm == 'none':
+            return True
+        calculated_checksum = checksums.digest(self.checksum_algorithm, data)
         return calculated_checksum == expected_checksum
     
+    def verify_file_digest(self, path: str, expected_digest: str) -> bool:
+        """Compara o digest do arquivo remontado com o informado pelo servidor"""
+        file_hash = checksums.new(self.checksum_algorithm)
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                file_hash.update(block)
+        
+        if file_hash.hexdigest() != expected_digest:
+            logger.error(f"Digest do arquivo não confere: esperado {expected_digest}, obtido {file_hash.hexdigest()}")
+            return False
+        logger.info("Digest do arquivo inteiro verificado")
+        return True
+    
     def should_discard_segment(self) -> bool:
         """Decide se deve descartar um segmento (simulação de perda)"""
         import random
@@ -260,59 +1034,90 @@ class UDPClient:
     
     def check_missing_segments(self):
         """Verifica quais segmentos estão faltando"""
-        self.missing_segments = set(range(self.expected_segments)) - set(self.received_segments.keys())
+        missing_ranges = self.assembler.missing_ranges(self.range_start, self.range_end)
         
-        if self.missing_segments:
-            logger.warning(f"Segmentos perdidos: {sorted(self.missing_segments)}")
-            self.request_missing_segments()
+        if missing_ranges:
+            logger.warning(f"Segmentos perdidos: {self.range_count - self.range_received} em {len(missing_ranges)} intervalos")
+            self.request_missing_segments(missing_ranges)
     
-    def request_missing_segments(self, missing_segments: set):
-        """Solicita retransmissão dos segmentos perdidos"""
-        for segment_number in missing_segments:
-            try:
-                request = f"RETRANSMIT {self.current_file} {segment_number}"
-                self.socket.sendto(request.encode('utf-8'), self.server_address)
-                logger.info(f"Solicitando retransmissão do segmento {segment_number}")
+    def request_missing_segments(self, missing_ranges: List[Tuple[int, int]]):
+        """Solicita os segmentos perdidos em rodadas de NACKs com intervalos (inicio, quantidade)"""
+        missing = missing_ranges
+        missing_count = self.range_count - self.range_received
+        rounds = 0
+        stalled_rounds = 0
+        
+        try:
+            while missing and rounds < config.NACK_MAX_ROUNDS:
+                rounds += 1
+                nack_sent_at = time.monotonic()
+                self.send_nack(missing)
+                self.last_arrival = None
                 
-                # Aguarda retransmissão com timeout
-                try:
-                    self.socket.settimeout(5.0)  # 5 segundos de timeout
-                    retransmitted_data, _ = self.socket.recvfrom(4096)
-                    
-                    # Processa segmento retransmitido
-                    self.process_segment(retransmitted_data)
-                    logger.info(f"Segmento {segment_number} retransmitido com sucesso")
-                    
-                except socket.timeout:
-                    logger.error(f"Timeout na retransmissão do segmento {segment_number}")
+                # Recebe a rajada de retransmissões até o servidor silenciar (RTO mais o intervalo entre segmentos)
+                while self.range_received < self.range_count:
+                    self.socket.settimeout(self.idle_timeout())
+                    try:
+                        data, _ = self.socket.recvfrom(self.recv_buffer_size)
+                    except socket.timeout:
+                        break
                     
-            except Exception as e:
-                logger.error(f"Erro ao solicitar retransmissão do segmento {segment_number}: {e}")
+                    if data.startswith(b'ERROR '):
+                        logger.warning(f"Erro do servidor: {data[6:].decode('utf-8', 'replace')}")
+                    elif protocol.is_binary_message(data) and data[0] == protocol.MSG_FEC:
+                        self.process_parity(data)
+                    elif protocol.is_binary_message(data) and self.process_segment(data) is not None:
+                        # O primeiro segmento da rajada responde a este NACK
+                        if nack_sent_at is not None:
+                            self.rtt.sample(time.monotonic() - nack_sent_at)
+                            nack_sent_at = None
+                        self.record_arrival()
+                
+                # Segmentos só são marcados, nunca desmarcados: basta reler o bitmap do intervalo
+                still_missing_count = self.range_count - self.range_received
+                logger.info(f"Rodada {rounds}: {missing_count - still_missing_count} de {missing_count} segmentos recuperados")
+                
+                # Desiste após rodadas seguidas sem progresso (servidor indisponível)
+                if still_missing_count == missing_count:
+                    self.rtt.backoff()
+                    stalled_rounds += 1
+                    if stalled_rounds >= config.NACK_MAX_STALLED:
+                        logger.error("Retransmissão sem progresso, desistindo")
+                        break
+                else:
+                    stalled_rounds = 0
+                missing_count = still_missing_count
+                missing = self.assembler.missing_ranges(self.range_start, self.range_end) if missing_count else []
+                
+        except Exception as e:
+            logger.error(f"Erro ao solicitar retransmissão: {e}")
         
         # Restaura timeout original
         self.socket.settimeout(self.timeout)
     
-    def save_file(self, output_filename: str = None) -> bool:
-        """Reconstrói o arquivo a partir dos segmentos recebidos"""
+    def send_nack(self, ranges: List[Tuple[int, int]]):
+        """Envia NACKs com os intervalos perdidos, divididos para caber em datagramas"""
+        logger.info(f"Solicitando retransmissão de {sum(count for _, count in ranges)} segmentos em {len(ranges)} intervalos")
+        
+        for index in range(0, len(ranges), config.NACK_MAX_RANGES):
+            chunk = ranges[index:index + config.NACK_MAX_RANGES]
+            self.socket.sendto(protocol.pack_nack(self.transfer_id, chunk), self.server_address)
+    
+    def save_file(self, expected_digest: Optional[str] = None) -> bool:
+        """Conclui o arquivo remontado em disco, renomeando o .part para o nome final"""
         try:
-            if not output_filename:
-                output_filename = self.current_file
-            
             # Verifica se todos os segmentos foram recebidos
-            if len(self.received_segments) != self.expected_segments:
-                logger.error(f"Arquivo incompleto: {len(self.received_segments)}/{self.expected_segments} segmentos")
+            if not self.assembler.complete:
+                logger.error(f"Arquivo incompleto: {self.assembler.count}/{self.assembler.num_segments} segmentos")
                 return False
             
-            # Reconstrói arquivo na ordem correta
-            with open(output_filename, 'wb') as output_file:
-                for segment_number in range(self.expected_segments):
-                    if segment_number in self.received_segments:
-                        segment_data = self.received_segments[segment_number]['data']
-                        output_file.write(segment_data)
-                    else:
-                        logger.error(f"Segmento {segment_number} não encontrado")
-                        return False
+            # O .part só substitui a saída (com --delta, a cópia local) se o digest conferir;
+            # senão .part e journal ficam no disco e o arquivo existente não é tocado
+            if expected_digest and not self.verify_file_digest(self.assembler.part_path, expected_digest):
+                logger.error("Arquivo recebido não foi salvo; execute com --no-resume para baixá-lo do zero")
+                return False
             
+            output_filename = self.assembler.finish()
             logger.info(f"Arquivo salvo com sucesso: {output_filename}")
             return True
             
@@ -338,6 +1143,39 @@ def main():
     parser.add_argument('--timeout', type=float, default=5.0, help='Timeout em segundos (padrão: 5.0)')
     parser.add_argument('--simulate-loss', action='store_true', help='Habilita simulação de perda')
     parser.add_argument('--loss-probability', type=float, default=0.1, help='Probabilidade de perda (padrão: 0.1)')
+    parser.add_argument('--mode', choices=[protocol.MODE_SR, protocol.MODE_STREAM], default=config.DEFAULT_MODE,
+                        help=f'Modo de transferência (padrão: {config.DEFAULT_MODE})')
+    parser.add_argument('--window', type=int, default=config.SR_WINDOW_SIZE,
+                        help=f'Janela do modo selective repeat (padrão: {config.SR_WINDOW_SIZE})')
+    parser.add_argument('--segment-size', type=int, default=config.MAX_PAYLOAD_SIZE,
+                        help=f'Payload por segmento solicitado ao servidor (padrão: {config.MAX_PAYLOAD_SIZE})')
+    parser.add_argument('--probe-mtu', action='store_true',
+                        help='Sonda o maior segmento entregue sem perda antes de solicitar o arquivo')
+    parser.add_argument('--streams', type=int, default=config.CLIENT_STREAMS,
+                        help='Fluxos paralelos, cada um com um intervalo do arquivo (padrão: %(default)s)')
+    span = parser.add_mutually_exclusive_group()
+    span.add_argument('--bytes', metavar='INICIO-FIM',
+                      help='Recebe só os bytes [INICIO, FIM) do arquivo ("INICIO-" até o fim)')
+    span.add_argument('--segments', metavar='INICIO-FIM',
+                      help='Recebe só os segmentos [INICIO, FIM) do arquivo ("INICIO-" até o fim)')
+    span.add_argument('--tail', type=int, metavar='N', help='Recebe só os últimos N bytes do arquivo')
+    parser.add_argument('--delta', action='store_true',
+                        help='Baixa só os segmentos que diferem da cópia local já existente em --output-dir')
+    parser.add_argument('--fec', nargs='?', metavar='K:M',
+                        const=f"{config.FEC_DATA_SEGMENTS}:{config.FEC_PARITY_SEGMENTS}",
+                        help='Pede M paridades a cada K segmentos para reconstruir perdas sem retransmissão '
+                             '(padrão: %(const)s); M é o mínimo, aumentado conforme a perda observada')
+    parser.add_argument('--fec-fixed', action='store_true',
+                        help='Mantém o M negociado em vez de ajustá-lo à perda observada')
+    parser.add_argument('--compress', choices=compression.available(),
+                        help='Pede os segmentos comprimidos com o codec (os que não diminuem seguem sem compressão)')
+    parser.add_argument('--multicast', action='store_true',
+                        help='Entra no grupo multicast do servidor para receber o arquivo junto com outros clientes '
+                             '(perdas recuperadas por NACK unicast; usa o modo stream)')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='Descarta downloads interrompidos em vez de manter .part e journal para retomá-los')
+    parser.add_argument('--checksum', choices=checksums.available(), default=config.CHECKSUM_ALGORITHM,
+                        help=f'Algoritmo de checksum dos segmentos (padrão: {config.CHECKSUM_ALGORITHM})')
     
     args = parser.parse_args()
     
@@ -346,7 +1184,24 @@ def main():
         print("Erro: Porta deve ser maior que 1024")
         sys.exit(1)
     
-    client = UDPClient(args.server_host, args.server_port, args.timeout)
+    span = None
+    if args.bytes:
+        span = ('bytes', args.bytes)
+    elif args.segments:
+        span = ('segments', args.segments)
+    elif args.tail is not None:
+        span = ('bytes', f"-{args.tail}")
+    
+    fec_code = None
+    if args.fec:
+        try:
+            fec_code = fec.parse_code(args.fec)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    client = UDPClient(args.server_host, args.server_port, args.timeout, args.mode, args.window, args.checksum,
+                       args.segment_size, args.probe_mtu, max(1, args.streams), not args.no_resume, span,
+                       args.delta, fec_code, not args.fec_fixed, args.compress, args.multicast)
     
     try:
         if not client.connect():
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Registro de Codecs de Compressão do Protocolo UDP
+Cada segmento é comprimido isoladamente (sem cabeçalhos de formato); se a compressão não
+reduzir o payload, ele segue armazenado sem compressão ("stored")
+"""
+
+import lzma
+import zlib
+from typing import Callable, Dict, List, Tuple
+
+import config
+
+# Cada segmento é um fluxo independente: sem dicionário compartilhado, perdas não afetam os vizinhos
+_LZMA_FILTERS = [{'id': lzma.FILTER_LZMA2, 'preset': config.COMPRESSION_LZMA_PRESET}]
+
+def _zlib_compress(data: bytes) -> bytes:
+    """Deflate cru (sem cabeçalho zlib nem Adler-32: o segmento já tem checksum)"""
+    compressor = zlib.compressobj(config.COMPRESSION_ZLIB_LEVEL, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+def _zlib_decompress(data: bytes, original_length: int) -> bytes:
+    # O terceiro argumento de zlib.decompress é só o buffer inicial: o limite vem do decompressobj
+    decompressor = zlib.decompressobj(-15)
+    restored = decompressor.decompress(data, original_length)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Payload comprimido excede {original_length} bytes")
+    return restored
+
+def _lzma_compress(data: bytes) -> bytes:
+    """LZMA2 cru (sem o contêiner .xz, que custaria dezenas de bytes por segmento)"""
+    return lzma.compress(data, format=lzma.FORMAT_RAW, filters=_LZMA_FILTERS)
+
+def _lzma_decompress(data: bytes, original_length: int) -> bytes:
+    decompressor = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=_LZMA_FILTERS)
+    restored = decompressor.decompress(data, original_length)
+    # O LZMA2 termina com um marcador: sem ele após o tamanho original, o payload é maior que o anunciado
+    if not decompressor.eof:
+        raise ValueError(f"Payload comprimido excede {original_length} bytes")
+    return restored
+
+# {nome: (compressão, descompressão limitada ao tamanho original)}
+CODECS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes, int], bytes]]] = {
+    'zlib': (_zlib_compress, _zlib_decompress),
+    'lzma': (_lzma_compress, _lzma_decompress),
+}
+
+def available() -> List[str]:
+    """Codecs suportados nesta instalação"""
+    return list(CODECS)
+
+def compress(codec: str, data) -> bytes:
+    """Comprime um payload; devolve-o sem compressão se o resultado não for menor"""
+    data = bytes(data)
+    compressed = CODECS[codec][0](data)
+    return compressed if len(compressed) < len(data) else data
+
+def decompress(codec: str, data, original_length: int) -> bytes:
+    """Restaura um payload; payloads do tamanho original foram armazenados sem compressão"""
+    if len(data) == original_length:
+        return data
+    try:
+        restored = CODECS[codec][1](bytes(data), original_length)
+    except (zlib.error, lzma.LZMAError) as e:
+        raise ValueError(f"Payload comprimido inválido: {e}")
+    if len(restored) != original_length:
+        raise ValueError(f"Payload descomprimido com {len(restored)} bytes, esperados {original_length}")
+    return restored
+
+def negotiate(requested: str = None):
+    """Codec de uma transferência a partir do solicitado pelo cliente (None sem compressão)"""
+    if not config.COMPRESSION_ENABLED or requested not in CODECS:
+        return None
+    return requested
@@ -10,15 +10,116 @@ DEFAULT_PORT = 8888        # Porta padrão para o servidor
 DEFAULT_TIMEOUT = 5.0      # Timeout padrão em segundos
 
 # Configurações do Protocolo
-MAX_PAYLOAD_SIZE = 1024    # Tamanho máximo do payload por segmento (bytes)
-HEADER_SIZE = 20           # Tamanho do cabeçalho em bytes
+MAX_PAYLOAD_SIZE = 1024    # Payload padrão por segmento, usado quando o cliente não negocia (bytes)
+HEADER_SIZE = 27           # Tamanho do cabeçalho em bytes (prefixo 5 + número 4 + MD5 16 + tamanho 2)
 MAX_FILENAME_LENGTH = 255  # Tamanho máximo do nome do arquivo
 
+# Configurações do Tamanho de Segmento Negociado
+MIN_SEGMENT_SIZE = 512     # Menor payload aceito na negociação
+MAX_SEGMENT_SIZE = 65000   # Maior payload aceito (datagrama IPv4 máximo: 65507 bytes)
+PROBE_SIZES = (1024, 1452, 2048, 4096, 8192, 16384, 32768, 65000)  # Tamanhos testados pela sondagem
+PROBE_TIMEOUT = 0.2        # Espera pela resposta de cada sonda (segundos)
+PROBE_ATTEMPTS = 3         # Sondas sem resposta antes de considerar o tamanho perdido
+SOCKET_RECV_BUFFER = 4 * 1024 * 1024  # SO_RCVBUF pedido pelo cliente (o sistema pode limitar)
+
 # Configurações de Performance
 SEGMENT_DELAY = 0.01      # Delay entre segmentos (segundos)
 MAX_RETRANSMISSION_WAIT = 10.0  # Tempo máximo para aguardar retransmissão
 BUFFER_SIZE = 4096         # Tamanho do buffer de recepção
 
+# Configurações de Pacing (token bucket)
+PACING_RATE = None         # Taxa alvo de envio (None usa SEGMENT_DELAY como fallback)
+PACING_UNIT = 'bytes'      # Unidade da taxa: 'bytes' (bytes/s) ou 'packets' (pacotes/s)
+PACING_BURST = 32          # Rajada máxima do token bucket (em segmentos)
+
+# Configurações do Handshake (FILE_INFO/READY)
+HANDSHAKE_TIMEOUT = 0.25   # Espera inicial pelo FILE_INFO ou READY antes de repetir (segundos)
+HANDSHAKE_MAX_BACKOFF = 1.0  # Maior espera entre repetições (o intervalo dobra a cada uma)
+HANDSHAKE_ATTEMPTS = 6     # FILE_INFOs enviados sem READY antes de abandonar a transferência
+
+# Configurações de Fluxos Paralelos (cliente)
+CLIENT_STREAMS = 1         # Fluxos simultâneos por arquivo, cada um com um intervalo de segmentos
+
+# Configurações de Retomada de Downloads (cliente)
+RESUME_ENABLED = True      # Mantém o .part e o journal de transferências interrompidas
+RESUME_CHECKPOINT_INTERVAL = 2.0  # Intervalo entre gravações do journal durante a recepção (segundos)
+RESUME_MAX_RANGES = 64     # Intervalos faltantes enviados no READY (os menores vãos são unidos)
+
+# Configurações de Sincronização Delta (cliente com cópia antiga do arquivo)
+DELTA_DATAGRAM_SIZE = 1400  # Tamanho máximo de cada DELTA_SUMS (evita fragmentação IP)
+DELTA_WINDOW = 32          # DELTA_SUMS sem resposta em voo ao mesmo tempo
+
+# Configurações de Janela Deslizante (selective repeat)
+DEFAULT_MODE = 'stream'    # Modo solicitado pelo cliente: 'stream' ou 'sr' (opcional, com --mode sr)
+SR_WINDOW_SIZE = 64        # Janela de envio padrão (segmentos)
+SR_MAX_WINDOW = 1024       # Maior janela aceita pelo servidor
+SR_RETRANSMIT_TIMEOUT = 0.2  # Temporizador de retransmissão inicial, antes das amostras de RTT dos ACKs (segundos)
+SR_ACK_EVERY = 2           # Cliente confirma a cada N segmentos recebidos em ordem
+SR_ACK_DELAY = 0.01        # Maior atraso de um ACK pendente no cliente (abaixo de RTT_MIN_RTO)
+SR_IDLE_TIMEOUT = 10.0     # Servidor abandona a transferência após este tempo sem ACKs
+
+# Configurações de Estimativa de RTT (RFC 6298, cliente e servidor)
+RTT_INITIAL_RTO = 0.25     # RTO antes da primeira amostra (o RFC sugere 1s; em LAN atrasaria o handshake)
+RTT_MIN_RTO = 0.05         # Menor RTO (o RFC sugere 1s; acima do atraso de ACK do cliente)
+RTT_MAX_RTO = 5.0          # Maior RTO, mesmo com backoff
+RTT_GRANULARITY = 0.001    # Granularidade do relógio (G do RFC 6298)
+RTT_GAP_FACTOR = 4         # Intervalos médios entre segmentos somados ao RTO antes de considerar o fluxo parado
+
+# Configurações de Controle de Congestionamento (servidor)
+CONGESTION_CONTROL = 'aimd'  # Modo sr: 'aimd' (NewReno), 'bbr' (baseado em atraso) ou 'none' (só o pacing fixo)
+CONGESTION_INITIAL_WINDOW = 10  # Janela inicial (segmentos em voo)
+CONGESTION_MIN_WINDOW = 4  # Menor janela após perdas (com menos, a retransmissão rápida não dispara)
+
+# Configurações de Correção de Erros (FEC Reed-Solomon por bloco de segmentos)
+FEC_DATA_SEGMENTS = 16     # K padrão: segmentos de dados por bloco (cliente com --fec sem valor)
+FEC_PARITY_SEGMENTS = 2    # M padrão: paridades por bloco (perdas reconstruídas sem retransmissão)
+FEC_MAX_DATA = 64          # Maior K aceito pelo servidor
+FEC_MAX_PARITY = 16        # Maior M aceito pelo servidor (K + M <= 255 no GF(256))
+FEC_ADAPTIVE = True        # Cliente pede mais ou menos paridade conforme a perda observada
+FEC_TARGET_FAILURE = 0.01  # Probabilidade aceitável de um bloco ter mais perdas que paridades
+FEC_MAX_OPEN_BLOCKS = 64   # Blocos com paridades guardadas à espera de segmentos no cliente
+
+# Configurações de Compressão por Segmento (negociada no GET/FILE_INFO)
+COMPRESSION_ENABLED = True  # Servidor aceita pedidos de compressão ('zlib' ou 'lzma')
+COMPRESSION_ZLIB_LEVEL = 6  # Nível do deflate (1 mais rápido, 9 menor)
+COMPRESSION_LZMA_PRESET = 1  # Preset do LZMA2 (0 a 9); acima de 1 custa várias vezes mais CPU por segmento pequeno
+
+# Configurações de Distribuição Multicast (um envio por arquivo para todos os receptores do grupo)
+MULTICAST_GROUP = None     # 'grupo:porta' do servidor, ex.: '239.255.42.99:9999' (None desativa; --multicast)
+MULTICAST_INTERFACE = None  # IP da interface do grupo (None: o host do servidor ou a rota padrão do sistema)
+MULTICAST_TTL = 1          # Saltos dos datagramas do grupo (1 = apenas a rede local)
+MULTICAST_LOOP = True      # Entrega também aos receptores do próprio host (ex.: testes em loopback)
+MULTICAST_JOIN_WINDOW = 0.5  # Espera após o primeiro READY para outros receptores entrarem no canal (segundos)
+
+# Configurações de Processos (servidor)
+SERVER_PROCESSES = 1       # Processos escutando a mesma porta com SO_REUSEPORT (--workers)
+
+# Configurações dos Pools de Workers (servidor)
+TRANSFER_WORKERS = 16      # Threads para envios de arquivos inteiros (GET)
+TRANSFER_QUEUE_DEPTH = 16  # GETs aguardando um worker livre
+CONTROL_WORKERS = 4        # Threads para requisições curtas (NACK, RETRANSMIT, PROBE)
+CONTROL_QUEUE_DEPTH = 256  # Requisições curtas aguardando um worker livre
+WORKER_QUEUE_POLICY = 'drop'  # Fila de controle cheia: 'drop' descarta, 'block' segura a leitura do socket
+
+# Configurações de Sessões de Transferência (servidor)
+SESSION_IDLE_TIMEOUT = 60.0  # Transferências sem ACK/NACK por este tempo são descartadas
+SESSION_LINGER = 10.0      # Transferências concluídas aguardam NACKs por este tempo sem atividade
+SESSION_JANITOR_INTERVAL = 5.0  # Intervalo da limpeza periódica de transferências ociosas
+MAX_SESSIONS = 4096        # Transferências simultâneas por processo do servidor
+MAX_SESSIONS_PER_HOST = 64  # Transferências simultâneas de um mesmo IP de cliente
+
+# Configurações do Cache de Segmentos (servidor)
+SEGMENT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Orçamento total do cache LRU
+SEGMENT_CACHE_MAX_ENTRY_BYTES = 64 * 1024 * 1024  # Arquivos maiores são lidos do disco
+
+# Configurações do Índice de Checksums (servidor)
+CHECKSUM_INDEX_DIR = '.udp_index'  # Diretório dos índices persistidos por arquivo
+
+# Configurações de Recuperação por NACK
+NACK_MAX_RANGES = 128      # Intervalos por datagrama NACK (8 bytes cada)
+NACK_MAX_ROUNDS = 20       # Máximo de rodadas de NACK por transferência
+NACK_MAX_STALLED = 3       # Rodadas seguidas sem progresso antes de desistir
+
 # Configurações de Simulação de Perda
 DEFAULT_LOSS_PROBABILITY = 0.1  # Probabilidade padrão de perda (10%)
 
@@ -32,7 +133,8 @@ MAX_FILE_SIZE = 1024 * 1024 * 100  # Tamanho máximo de arquivo (100MB)
 
 # Configurações de Segurança
 ENABLE_CHECKSUM = True     # Habilita verificação de checksum
-CHECKSUM_ALGORITHM = 'md5' # Algoritmo de checksum a ser usado
+CHECKSUM_ALGORITHM = 'md5' # Algoritmo padrão: 'md5', 'crc32', 'blake2b', 'none' (ou 'xxh64' com o pacote xxhash)
+BLAKE2B_DIGEST_SIZE = 16   # Tamanho do digest BLAKE2b no cabeçalho (bytes)
 
 # Configurações de Debug
 DEBUG_MODE = False         # Modo debug (mais logs detalhados)
@@ -52,12 +154,103 @@ def validate_config():
     if HEADER_SIZE <= 0:
         errors.append("Tamanho do cabeçalho deve ser positivo")
     
+    # Pior caso do cabeçalho: prefixo 5 + número 4 + digest de 64 bytes + tamanho 2
+    if not 0 < MIN_SEGMENT_SIZE <= MAX_PAYLOAD_SIZE <= MAX_SEGMENT_SIZE <= 65507 - 75:
+        errors.append("Tamanhos de segmento devem respeitar MIN <= padrão <= MAX <= 65432")
+    
     if DEFAULT_TIMEOUT <= 0:
         errors.append("Timeout deve ser positivo")
     
     if DEFAULT_LOSS_PROBABILITY < 0 or DEFAULT_LOSS_PROBABILITY > 1:
         errors.append("Probabilidade de perda deve estar entre 0 e 1")
     
+    if PACING_UNIT not in ('bytes', 'packets'):
+        errors.append("Unidade de pacing deve ser 'bytes' ou 'packets'")
+    
+    if PACING_BURST <= 0:
+        errors.append("Rajada de pacing deve ser positiva")
+    
+    if DEFAULT_MODE not in ('sr', 'stream'):
+        errors.append("Modo padrão deve ser 'sr' ou 'stream'")
+    
+    if not 0 < HANDSHAKE_TIMEOUT <= HANDSHAKE_MAX_BACKOFF or HANDSHAKE_ATTEMPTS <= 0:
+        errors.append("Handshake precisa de esperas positivas (inicial <= máxima) e ao menos uma tentativa")
+    
+    if not 0 < CLIENT_STREAMS <= MAX_SESSIONS_PER_HOST:
+        errors.append("CLIENT_STREAMS deve estar entre 1 e MAX_SESSIONS_PER_HOST")
+    
+    # Cada intervalo 'inicio:quantidade,' ocupa até 22 caracteres no READY
+    if RESUME_CHECKPOINT_INTERVAL <= 0 or not 0 < RESUME_MAX_RANGES * 22 + 256 <= BUFFER_SIZE:
+        errors.append("Retomada precisa de intervalo positivo e de um READY que caiba no buffer do servidor")
+    
+    # O DELTA_SUMS precisa caber no buffer do servidor com ao menos um digest de 64 bytes
+    if not 11 + 64 <= DELTA_DATAGRAM_SIZE <= BUFFER_SIZE or DELTA_WINDOW <= 0:
+        errors.append("DELTA_SUMS deve caber no buffer do servidor e a janela delta deve ser positiva")
+    
+    if SR_WINDOW_SIZE <= 0 or SR_WINDOW_SIZE > SR_MAX_WINDOW:
+        errors.append("Janela deve ser positiva e no máximo SR_MAX_WINDOW")
+    
+    if SR_RETRANSMIT_TIMEOUT <= 0:
+        errors.append("Temporizador de retransmissão deve ser positivo")
+    
+    if SERVER_PROCESSES <= 0:
+        errors.append("Número de processos do servidor deve ser positivo")
+    
+    if min(TRANSFER_WORKERS, CONTROL_WORKERS) <= 0 or min(TRANSFER_QUEUE_DEPTH, CONTROL_QUEUE_DEPTH) < 0:
+        errors.append("Pools de workers precisam de ao menos uma thread e fila não negativa")
+    
+    if WORKER_QUEUE_POLICY not in ('drop', 'block'):
+        errors.append("Política de fila deve ser 'drop' ou 'block'")
+    
+    if not 0 < RTT_MIN_RTO <= RTT_INITIAL_RTO <= RTT_MAX_RTO or RTT_GRANULARITY <= 0:
+        errors.append("RTOs devem respeitar 0 < MIN <= INICIAL <= MAX e a granularidade deve ser positiva")
+    
+    if not 0 < SR_ACK_DELAY < RTT_MIN_RTO:
+        errors.append("SR_ACK_DELAY deve ser positivo e menor que RTT_MIN_RTO")
+    
+    if CONGESTION_CONTROL not in ('aimd', 'bbr', 'none'):
+        errors.append("Controle de congestionamento deve ser 'aimd', 'bbr' ou 'none'")
+    
+    if not 0 < CONGESTION_MIN_WINDOW <= CONGESTION_INITIAL_WINDOW <= SR_MAX_WINDOW:
+        errors.append("Janelas de congestionamento devem respeitar 0 < MIN <= INICIAL <= SR_MAX_WINDOW")
+    
+    if not (0 < FEC_DATA_SEGMENTS <= FEC_MAX_DATA and 0 <= FEC_PARITY_SEGMENTS <= FEC_MAX_PARITY
+            and FEC_MAX_DATA + FEC_MAX_PARITY <= 255):
+        errors.append("FEC deve respeitar 0 < K <= FEC_MAX_DATA, 0 <= M <= FEC_MAX_PARITY e K + M <= 255")
+    
+    if not 0 < FEC_TARGET_FAILURE < 1 or FEC_MAX_OPEN_BLOCKS <= 0:
+        errors.append("FEC_TARGET_FAILURE deve estar em (0, 1) e FEC_MAX_OPEN_BLOCKS ser positivo")
+    
+    if not 0 <= COMPRESSION_ZLIB_LEVEL <= 9 or not 0 <= COMPRESSION_LZMA_PRESET <= 9:
+        errors.append("Nível do zlib e preset do LZMA devem estar entre 0 e 9")
+    
+    if not 0 < MULTICAST_TTL <= 255 or not 0 <= MULTICAST_JOIN_WINDOW < DEFAULT_TIMEOUT:
+        errors.append("MULTICAST_TTL deve estar entre 1 e 255 e a janela de entrada ser menor que o timeout")
+    
+    if SESSION_IDLE_TIMEOUT < SR_IDLE_TIMEOUT:
+        errors.append("SESSION_IDLE_TIMEOUT deve ser pelo menos SR_IDLE_TIMEOUT")
+    
+    if not 0 < SESSION_LINGER <= SESSION_IDLE_TIMEOUT:
+        errors.append("SESSION_LINGER deve ser positivo e no máximo SESSION_IDLE_TIMEOUT")
+    
+    if SESSION_JANITOR_INTERVAL <= 0:
+        errors.append("Intervalo de limpeza de sessões deve ser positivo")
+    
+    if not 0 < MAX_SESSIONS_PER_HOST <= MAX_SESSIONS:
+        errors.append("Limites de sessões devem respeitar 0 < MAX_SESSIONS_PER_HOST <= MAX_SESSIONS")
+    
+    if SEGMENT_CACHE_MAX_BYTES < 0 or SEGMENT_CACHE_MAX_ENTRY_BYTES < 0:
+        errors.append("Orçamento do cache de segmentos não pode ser negativo")
+    
+    if NACK_MAX_RANGES <= 0 or NACK_MAX_RANGES * 8 + 64 > BUFFER_SIZE:
+        errors.append("NACK_MAX_RANGES deve ser positivo e caber no buffer de recepção")
+    
+    if CHECKSUM_ALGORITHM not in ('md5', 'crc32', 'blake2b', 'none', 'xxh64'):
+        errors.append("Algoritmo de checksum desconhecido")
+    
+    if not 1 <= BLAKE2B_DIGEST_SIZE <= 64:
+        errors.append("Digest BLAKE2b deve ter entre 1 e 64 bytes")
+    
     if MAX_FILE_SIZE <= 0:
         errors.append("Tamanho máximo de arquivo deve ser positivo")
     
@@ -74,19 +267,112 @@ def get_config_summary():
         'protocol': {
             'max_payload_size': MAX_PAYLOAD_SIZE,
             'header_size': HEADER_SIZE,
-            'max_filename_length': MAX_FILENAME_LENGTH
+            'max_filename_length': MAX_FILENAME_LENGTH,
+            'min_segment_size': MIN_SEGMENT_SIZE,
+            'max_segment_size': MAX_SEGMENT_SIZE,
+            'probe_sizes': PROBE_SIZES
         },
         'performance': {
             'segment_delay': SEGMENT_DELAY,
             'max_retransmission_wait': MAX_RETRANSMISSION_WAIT,
-            'buffer_size': BUFFER_SIZE
+            'buffer_size': BUFFER_SIZE,
+            'pacing_rate': PACING_RATE,
+            'pacing_unit': PACING_UNIT,
+            'pacing_burst': PACING_BURST
+        },
+        'handshake': {
+            'timeout': HANDSHAKE_TIMEOUT,
+            'max_backoff': HANDSHAKE_MAX_BACKOFF,
+            'attempts': HANDSHAKE_ATTEMPTS
+        },
+        'streams': {
+            'client_streams': CLIENT_STREAMS
+        },
+        'resume': {
+            'enabled': RESUME_ENABLED,
+            'checkpoint_interval': RESUME_CHECKPOINT_INTERVAL,
+            'max_ranges': RESUME_MAX_RANGES
+        },
+        'delta': {
+            'datagram_size': DELTA_DATAGRAM_SIZE,
+            'window': DELTA_WINDOW
+        },
+        'selective_repeat': {
+            'default_mode': DEFAULT_MODE,
+            'window_size': SR_WINDOW_SIZE,
+            'max_window': SR_MAX_WINDOW,
+            'retransmit_timeout': SR_RETRANSMIT_TIMEOUT,
+            'ack_every': SR_ACK_EVERY,
+            'ack_delay': SR_ACK_DELAY,
+            'idle_timeout': SR_IDLE_TIMEOUT
+        },
+        'rtt': {
+            'initial_rto': RTT_INITIAL_RTO,
+            'min_rto': RTT_MIN_RTO,
+            'max_rto': RTT_MAX_RTO,
+            'granularity': RTT_GRANULARITY,
+            'gap_factor': RTT_GAP_FACTOR
+        },
+        'congestion': {
+            'control': CONGESTION_CONTROL,
+            'initial_window': CONGESTION_INITIAL_WINDOW,
+            'min_window': CONGESTION_MIN_WINDOW
+        },
+        'fec': {
+            'data_segments': FEC_DATA_SEGMENTS,
+            'parity_segments': FEC_PARITY_SEGMENTS,
+            'max_data': FEC_MAX_DATA,
+            'max_parity': FEC_MAX_PARITY,
+            'adaptive': FEC_ADAPTIVE,
+            'target_failure': FEC_TARGET_FAILURE,
+            'max_open_blocks': FEC_MAX_OPEN_BLOCKS
+        },
+        'compression': {
+            'enabled': COMPRESSION_ENABLED,
+            'zlib_level': COMPRESSION_ZLIB_LEVEL,
+            'lzma_preset': COMPRESSION_LZMA_PRESET
+        },
+        'multicast': {
+            'group': MULTICAST_GROUP,
+            'interface': MULTICAST_INTERFACE,
+            'ttl': MULTICAST_TTL,
+            'loop': MULTICAST_LOOP,
+            'join_window': MULTICAST_JOIN_WINDOW
+        },
+        'workers': {
+            'server_processes': SERVER_PROCESSES,
+            'transfer_workers': TRANSFER_WORKERS,
+            'transfer_queue_depth': TRANSFER_QUEUE_DEPTH,
+            'control_workers': CONTROL_WORKERS,
+            'control_queue_depth': CONTROL_QUEUE_DEPTH,
+            'queue_policy': WORKER_QUEUE_POLICY
+        },
+        'sessions': {
+            'idle_timeout': SESSION_IDLE_TIMEOUT,
+            'linger': SESSION_LINGER,
+            'janitor_interval': SESSION_JANITOR_INTERVAL,
+            'max_sessions': MAX_SESSIONS,
+            'max_sessions_per_host': MAX_SESSIONS_PER_HOST
+        },
+        'segment_cache': {
+            'max_bytes': SEGMENT_CACHE_MAX_BYTES,
+            'max_entry_bytes': SEGMENT_CACHE_MAX_ENTRY_BYTES
+        },
+        'checksum_index': {
+            'directory': CHECKSUM_INDEX_DIR
+        },
+        'nack': {
+            'max_ranges': NACK_MAX_RANGES,
+            'max_rounds': NACK_MAX_ROUNDS,
+            'max_stalled': NACK_MAX_STALLED
         },
         'simulation': {
             'default_loss_probability': DEFAULT_LOSS_PROBABILITY
         },
         'security': {
             'enable_checksum': ENABLE_CHECKSUM,
-            'checksum_algorithm': CHECKSUM_ALGORITHM
+            'checksum_algorithm': CHECKSUM_ALGORITHM,
+            'blake2b_digest_size': BLAKE2B_DIGEST_SIZE
         }
     }
 
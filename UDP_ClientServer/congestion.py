@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Controle de Congestionamento do Servidor UDP
+Controladores que ajustam a janela (segmentos em voo) e a taxa de envio a partir dos ACKs,
+das amostras de RTT e das perdas informadas pelo cliente
+"""
+
+import collections
+import threading
+import time
+from typing import Optional
+
+import config
+from pacing import Pacer
+
+class CongestionController:
+    """Janela e taxa fixas (sem controle de congestionamento); base dos demais controladores"""
+
+    name = 'none'
+    RTT_ALPHA = 0.125  # Peso de cada amostra no RTT suavizado
+
+    def __init__(self, segment_size: int, max_window: int = config.SR_MAX_WINDOW):
+        self.segment_size = segment_size
+        self.max_window = max_window
+        self.cwnd = float(max_window)  # Janela de congestionamento (segmentos)
+        self.pacing_rate = None  # Taxa de envio (bytes/s); None não limita
+        self.srtt = None
+        self.min_rtt = None
+        self.delivery_rate = None  # Última taxa de entrega medida (bytes/s)
+        self.recovery_start = float('-inf')  # Última redução: perdas de segmentos anteriores são o mesmo evento
+        self.pacer = Pacer(None, 'bytes')  # Aplica pacing_rate; o pacer configurado no servidor continua como teto
+        self.lock = threading.Lock()
+
+    @property
+    def window(self) -> int:
+        """Segmentos que podem estar em voo"""
+        return max(config.CONGESTION_MIN_WINDOW, min(self.max_window, int(self.cwnd)))
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Taxa de envio atual em bytes/s (None sem limite)"""
+        return self.pacing_rate
+
+    def on_ack(self, acked: int, rtt: Optional[float] = None, delivery_rate: Optional[float] = None):
+        """Segmentos confirmados, com o RTT e a taxa de entrega medidos pelo ACK (se houver)"""
+        with self.lock:
+            if rtt is not None:
+                self.srtt = rtt if self.srtt is None else self.srtt + self.RTT_ALPHA * (rtt - self.srtt)
+            if delivery_rate is not None:
+                self.delivery_rate = delivery_rate
+            self._on_ack(acked, rtt, delivery_rate)
+            self._update_pacer()
+
+    def on_loss(self, sent_time: Optional[float] = None):
+        """Perda detectada; uma por evento: segmentos enviados antes da última redução não contam de novo"""
+        with self.lock:
+            if not self._new_event(sent_time):
+                return
+            self._on_loss()
+            self._update_pacer()
+
+    def on_timeout(self, sent_time: Optional[float] = None):
+        """Temporizador de retransmissão expirado (perda grave ou caminho congestionado)"""
+        with self.lock:
+            if not self._new_event(sent_time):
+                return
+            self._on_timeout()
+            self._update_pacer()
+
+    def _new_event(self, sent_time: Optional[float]) -> bool:
+        """Inicia um novo evento de congestionamento se o segmento foi enviado depois da última redução"""
+        if sent_time is not None and sent_time <= self.recovery_start:
+            return False
+        self.recovery_start = time.monotonic()
+        return True
+
+    def _update_pacer(self):
+        """Repassa a taxa atual ao pacer"""
+        self.pacer.set_rate(self.pacing_rate)
+
+    def _on_ack(self, acked: int, rtt: Optional[float], delivery_rate: Optional[float]):
+        pass
+
+    def _on_loss(self):
+        pass
+
+    def _on_timeout(self):
+        pass
+
+    def describe(self) -> str:
+        """Estado legível do controlador"""
+        rate = f"{self.pacing_rate / 1024:.0f} KB/s" if self.pacing_rate else "sem limite"
+        rtt = f"{self.srtt * 1000:.1f} ms" if self.srtt is not None else "?"
+        return f"{self.name}: janela {self.window}, taxa {rate}, srtt {rtt}"
+
+class AIMDController(CongestionController):
+    """Estilo NewReno: slow start, aumento aditivo de um segmento por RTT e redução multiplicativa nas perdas"""
+
+    name = 'aimd'
+    BETA = 0.5  # Fator de redução da janela em uma perda
+    SLOW_START_GAIN = 2.0  # Pacing acima de janela/RTT para a janela poder dobrar a cada RTT
+    AVOIDANCE_GAIN = 1.25
+
+    def __init__(self, segment_size: int, max_window: int = config.SR_MAX_WINDOW):
+        super().__init__(segment_size, max_window)
+        self.cwnd = float(min(config.CONGESTION_INITIAL_WINDOW, max_window))
+        self.ssthresh = float(max_window)
+
+    @property
+    def slow_start(self) -> bool:
+        """Indica se a janela ainda cresce exponencialmente"""
+        return self.cwnd < self.ssthresh
+
+    def _on_ack(self, acked: int, rtt: Optional[float], delivery_rate: Optional[float]):
+        if self.slow_start:
+            self.cwnd = min(self.cwnd + acked, self.max_window)
+        else:
+            self.cwnd = min(self.cwnd + acked / self.cwnd, self.max_window)
+        if self.srtt:
+            gain = self.SLOW_START_GAIN if self.slow_start else self.AVOIDANCE_GAIN
+            self.pacing_rate = gain * self.cwnd * self.segment_size / self.srtt
+
+    def _on_loss(self):
+        self.ssthresh = max(config.CONGESTION_MIN_WINDOW, self.cwnd * self.BETA)
+        self.cwnd = self.ssthresh
+        if self.srtt:
+            self.pacing_rate = self.AVOIDANCE_GAIN * self.cwnd * self.segment_size / self.srtt
+
+    def _on_timeout(self):
+        self.ssthresh = max(config.CONGESTION_MIN_WINDOW, self.cwnd * self.BETA)
+        self.cwnd = config.CONGESTION_MIN_WINDOW
+        if self.pacing_rate:
+            self.pacing_rate *= self.BETA
+
+class BBRController(CongestionController):
+    """Baseado em atraso (estilo BBR): mede banda máxima e RTT mínimo e envia perto do seu produto
+
+    Simplificações: uma rodada termina quando uma janela inteira é confirmada, não há fase
+    PROBE_RTT (o RTT mínimo expira e é substituído pela amostra seguinte) e perdas isoladas
+    não reduzem a taxa.
+    """
+
+    name = 'bbr'
+    STARTUP_GAIN = 2.885  # 2/ln(2): dobra a taxa a cada rodada
+    CWND_GAIN = 2.0
+    PROBE_GAINS = (1.25, 0.75, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0)
+    BANDWIDTH_ROUNDS = 10  # Rodadas cobertas pelo filtro de banda máxima
+    MIN_RTT_WINDOW = 10.0  # Validade do RTT mínimo (segundos)
+    FULL_BANDWIDTH_GROWTH = 1.25  # Crescimento mínimo por rodada para continuar no startup
+    FULL_BANDWIDTH_ROUNDS = 3
+
+    def __init__(self, segment_size: int, max_window: int = config.SR_MAX_WINDOW):
+        super().__init__(segment_size, max_window)
+        self.cwnd = float(min(config.CONGESTION_INITIAL_WINDOW, max_window))
+        self.state = 'startup'
+        self.pacing_gain = self.STARTUP_GAIN
+        self.cwnd_gain = self.STARTUP_GAIN
+        # Maior taxa de entrega de cada rodada: contadas em ACKs, não em tempo, amostras
+        # ruins de uma pausa (temporizador, caminho ocioso) não apagam a banda medida antes
+        self.bandwidth_rounds = collections.deque(maxlen=self.BANDWIDTH_ROUNDS)
+        self.round_bandwidth = 0.0
+        self.round_delivered = 0
+        self.min_rtt_stamp = 0.0
+        self.full_bandwidth = 0.0
+        self.full_bandwidth_rounds = 0
+        self.cycle_index = 0
+
+    @property
+    def bottleneck_bandwidth(self) -> float:
+        """Maior taxa de entrega das últimas rodadas (bytes/s)"""
+        return max(self.round_bandwidth, max(self.bandwidth_rounds, default=0.0))
+
+    def _on_ack(self, acked: int, rtt: Optional[float], delivery_rate: Optional[float]):
+        now = time.monotonic()
+        if rtt is not None and (self.min_rtt is None or rtt <= self.min_rtt
+                                or now - self.min_rtt_stamp > self.MIN_RTT_WINDOW):
+            self.min_rtt, self.min_rtt_stamp = rtt, now
+
+        if delivery_rate is not None:
+            self.round_bandwidth = max(self.round_bandwidth, delivery_rate)
+
+        self.round_delivered += acked
+        if acked and self.round_delivered >= self.cwnd:
+            self.bandwidth_rounds.append(self.round_bandwidth)
+            self.round_bandwidth = 0.0
+            self.round_delivered = 0
+            self._next_round()
+
+        bandwidth = self.bottleneck_bandwidth
+        if not bandwidth:
+            self.cwnd = min(self.cwnd + acked, self.max_window)
+            return
+
+        self.pacing_rate = self.pacing_gain * bandwidth
+        if self.min_rtt:
+            # Além do BDP, folga para ACKs atrasados e para a retransmissão rápida em RTTs muito curtos
+            target = self.cwnd_gain * bandwidth * self.min_rtt / self.segment_size + config.CONGESTION_MIN_WINDOW
+            # No startup a janela cresce com os ACKs até o alvo, como no slow start
+            if self.state == 'startup':
+                self.cwnd = min(self.cwnd + acked, max(target, config.CONGESTION_INITIAL_WINDOW))
+            else:
+                self.cwnd = target
+            self.cwnd = min(max(self.cwnd, config.CONGESTION_MIN_WINDOW), self.max_window)
+
+    def _next_round(self):
+        """Avança a máquina de estados uma rodada"""
+        if self.state == 'startup':
+            bandwidth = self.bottleneck_bandwidth
+            if bandwidth >= self.full_bandwidth * self.FULL_BANDWIDTH_GROWTH:
+                self.full_bandwidth, self.full_bandwidth_rounds = bandwidth, 0
+            else:
+                self.full_bandwidth_rounds += 1
+                if self.full_bandwidth_rounds >= self.FULL_BANDWIDTH_ROUNDS:
+                    # Banda parou de crescer: esvazia a fila criada no startup
+                    self.state = 'drain'
+                    self.pacing_gain, self.cwnd_gain = 1 / self.STARTUP_GAIN, self.STARTUP_GAIN
+        elif self.state == 'drain':
+            self.state = 'probe_bw'
+            self.cycle_index = 0
+            self.pacing_gain, self.cwnd_gain = self.PROBE_GAINS[0], self.CWND_GAIN
+        else:
+            self.cycle_index = (self.cycle_index + 1) % len(self.PROBE_GAINS)
+            self.pacing_gain = self.PROBE_GAINS[self.cycle_index]
+
+    def _on_timeout(self):
+        # O modelo continua válido; a janela volta a crescer a partir do mínimo com os próximos ACKs
+        self.cwnd = config.CONGESTION_MIN_WINDOW
+
+    def describe(self) -> str:
+        return f"{super().describe()}, fase {self.state}"
+
+CONTROLLERS = {controller.name: controller for controller in (CongestionController, AIMDController, BBRController)}
+
+def create_controller(name: str, segment_size: int, max_window: int = config.SR_MAX_WINDOW) -> CongestionController:
+    """Cria o controlador de congestionamento 'name' ('aimd', 'bbr' ou 'none')"""
+    try:
+        return CONTROLLERS[name](segment_size, max_window)
+    except KeyError:
+        raise ValueError(f"Controle de congestionamento desconhecido: {name}")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Correção de Erros Antecipada (FEC) por Blocos de Segmentos
+Código Reed-Solomon sistemático sobre GF(256) com matriz de Cauchy: para cada bloco de K segmentos
+o servidor envia M paridades, e o cliente reconstrói até M perdas do bloco sem pedir retransmissão
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import config
+
+# Tabelas de exponencial e logaritmo do GF(256) com o polinômio x^8 + x^4 + x^3 + x^2 + 1
+GF_POLYNOMIAL = 0x11D
+GF_EXP = [0] * 512
+GF_LOG = [0] * 256
+_value = 1
+for _power in range(255):
+    GF_EXP[_power] = _value
+    GF_LOG[_value] = _power
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= GF_POLYNOMIAL
+for _power in range(255, 512):
+    GF_EXP[_power] = GF_EXP[_power - 255]
+
+MAX_BLOCK = 255  # K + M: os pontos da matriz de Cauchy precisam ser distintos no GF(256)
+
+def gf_mul(a: int, b: int) -> int:
+    """Produto no GF(256)"""
+    if a == 0 or b == 0:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+def gf_inv(a: int) -> int:
+    """Inverso multiplicativo no GF(256) (a != 0)"""
+    return GF_EXP[255 - GF_LOG[a]]
+
+@lru_cache(maxsize=None)
+def mul_table(coefficient: int) -> bytes:
+    """Tabela para bytes.translate: multiplica todos os bytes de um bloco pelo coeficiente"""
+    return bytes(gf_mul(coefficient, value) for value in range(256))
+
+def coefficient(k: int, row: int, column: int) -> int:
+    """Elemento da matriz de Cauchy 1 / (x_linha + y_coluna), com x = K + linha e y = coluna"""
+    return gf_inv((k + row) ^ column)
+
+def _scaled(data: bytes, factor: int) -> int:
+    """Bloco multiplicado pelo fator no GF(256), como inteiro (soma no GF(256) = XOR)"""
+    if factor != 1:
+        data = data.translate(mul_table(factor))
+    return int.from_bytes(data, 'big')
+
+def _padded(payload, size: int) -> bytes:
+    """Payload completado com zeros até o tamanho do bloco (o último segmento é menor)"""
+    return bytes(payload).ljust(size, b'\0')
+
+def encode(payloads: Sequence, k: int, m: int) -> List[bytes]:
+    """M paridades dos payloads de um bloco (menos de K no último bloco: os demais valem zero)"""
+    size = max(len(payload) for payload in payloads)
+    padded = [_padded(payload, size) for payload in payloads]
+    return [_xor_all(_scaled(data, coefficient(k, row, column)) for column, data in enumerate(padded))
+            .to_bytes(size, 'big') for row in range(m)]
+
+def _xor_all(values) -> int:
+    """XOR de uma sequência de inteiros"""
+    result = 0
+    for value in values:
+        result ^= value
+    return result
+
+def invert(matrix: List[List[int]]) -> List[List[int]]:
+    """Inversa de uma matriz quadrada no GF(256) por Gauss-Jordan (submatrizes de Cauchy são inversíveis)"""
+    size = len(matrix)
+    rows = [list(row) + [int(i == j) for j in range(size)] for i, row in enumerate(matrix)]
+    for column in range(size):
+        pivot = next(i for i in range(column, size) if rows[i][column])
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        inverse = gf_inv(rows[column][column])
+        rows[column] = [gf_mul(value, inverse) for value in rows[column]]
+        for i in range(size):
+            factor = rows[i][column]
+            if i != column and factor:
+                rows[i] = [value ^ gf_mul(factor, pivot_value) for value, pivot_value in zip(rows[i], rows[column])]
+    return [row[size:] for row in rows]
+
+def decode(k: int, known: Dict[int, bytes], parity: Dict[int, bytes], missing: Sequence[int]) -> Dict[int, bytes]:
+    """Reconstrói os payloads das colunas perdidas a partir das conhecidas e de pelo menos len(missing) paridades
+
+    Colunas são posições no bloco (0..K-1); as ausentes de 'known' e de 'missing' (além do fim do
+    arquivo) valem zero. Os payloads reconstruídos têm o tamanho das paridades, com o enchimento.
+    """
+    if len(missing) > len(parity):
+        raise ValueError(f"{len(missing)} perdas com apenas {len(parity)} paridades")
+    if not missing:
+        return {}
+    rows = sorted(parity)[:len(missing)]
+    size = len(parity[rows[0]])
+
+    # Síndromes: cada paridade menos a contribuição das colunas conhecidas
+    padded = {column: _padded(data, size) for column, data in known.items()}
+    syndromes = []
+    for row in rows:
+        value = int.from_bytes(parity[row], 'big')
+        for column, data in padded.items():
+            value ^= _scaled(data, coefficient(k, row, column))
+        syndromes.append(value.to_bytes(size, 'big'))
+
+    # Resolve o sistema das colunas perdidas com a inversa da submatriz de Cauchy
+    inverse = invert([[coefficient(k, row, column) for column in missing] for row in rows])
+    return {column: _xor_all(_scaled(syndrome, factor) for syndrome, factor in zip(syndromes, inverse[i]))
+            .to_bytes(size, 'big') for i, column in enumerate(missing)}
+
+def parity_for_loss(k: int, loss: float, target: float = config.FEC_TARGET_FAILURE,
+                    max_parity: int = config.FEC_MAX_PARITY) -> int:
+    """Menor M em que a chance de um bloco perder mais de M dos K + M datagramas fica abaixo do alvo"""
+    max_parity = min(max_parity, MAX_BLOCK - k)
+    if loss <= 0:
+        return 0
+    loss = min(loss, 1.0)
+    for m in range(max_parity + 1):
+        n = k + m
+        # C(n, lost) calculado incrementalmente: math.comb só existe a partir do Python 3.8
+        recoverable, combinations = 0.0, 1
+        for lost in range(m + 1):
+            recoverable += combinations * loss ** lost * (1 - loss) ** (n - lost)
+            combinations = combinations * (n - lost) // (lost + 1)
+        if 1 - recoverable <= target:
+            return m
+    return max_parity
+
+def parse_code(value: str) -> Tuple[int, int]:
+    """Interpreta 'K:M' (segmentos de dados e de paridade por bloco)"""
+    k, separator, m = value.partition(':')
+    if not separator or int(k) <= 0 or int(m) < 0:
+        raise ValueError(f"Código FEC inválido: {value}")
+    return int(k), int(m)
+
+class BlockTracker:
+    """Blocos de K segmentos (alinhados a 'base') cujo primeiro envio terminou, para o servidor enviar as paridades"""
+
+    def __init__(self, k: int, base: int, end: int):
+        self.k = k
+        self.base = base
+        self.end = end  # Fim (exclusivo) dos segmentos desta transferência
+        self.pending = None  # Bloco com segmentos enviados e paridades ainda não
+
+    def block_of(self, segment_number: int) -> int:
+        """Primeiro segmento do bloco que contém o segmento"""
+        return segment_number - (segment_number - self.base) % self.k
+
+    def sent(self, segment_number: int) -> List[int]:
+        """Registra o primeiro envio de um segmento; retorna os blocos que ficaram completos"""
+        block = self.block_of(segment_number)
+        finished = []
+        # Intervalos com vãos (retomada): o bloco anterior termina quando o envio passa para outro
+        if self.pending is not None and self.pending != block:
+            finished.append(self.pending)
+        self.pending = block
+        if segment_number + 1 >= min(block + self.k, self.end):
+            finished.append(block)
+            self.pending = None
+        return finished
+
+class BlockDecoder:
+    """Paridades recebidas pelo cliente e perda observada por bloco, que define o M pedido ao servidor"""
+
+    LOSS_ALPHA = 0.125  # Peso de cada bloco na perda suavizada
+
+    def __init__(self, k: int, m: int, base: int, max_blocks: int = config.FEC_MAX_OPEN_BLOCKS):
+        self.k = k
+        self.m = m  # M usado pelo servidor (informado em cada paridade)
+        self.minimum = m  # M negociado: a adaptação só pede mais paridades que ele
+        self.base = base
+        self.max_blocks = max_blocks
+        self.parity = OrderedDict()  # {primeiro segmento do bloco: {linha: paridade}}
+        self.recovered: Dict[int, int] = {}  # {bloco: segmentos reconstruídos}
+        self.loss = 0.0  # Fração de segmentos perdida, suavizada
+        self.current_block = None  # Bloco dos segmentos novos mais recentes
+
+    def block_of(self, segment_number: int) -> int:
+        """Primeiro segmento do bloco que contém o segmento"""
+        return segment_number - (segment_number - self.base) % self.k
+
+    def add_parity(self, first: int, m: int, row: int, payload: bytes):
+        """Guarda uma paridade; os blocos mais antigos são descartados acima do limite"""
+        self.m = m
+        self.parity.setdefault(first, {})[row] = payload
+        self.parity.move_to_end(first)
+        while len(self.parity) > self.max_blocks:
+            self.parity.popitem(last=False)
+
+    def discard(self, first: int):
+        """Esquece as paridades de um bloco completo"""
+        self.parity.pop(first, None)
+
+    def advance(self, segment_number: int) -> Optional[int]:
+        """Registra um segmento recebido; retorna o bloco anterior se os segmentos novos passaram para outro"""
+        block = self.block_of(segment_number)
+        if self.current_block is None or block > self.current_block:
+            previous, self.current_block = self.current_block, block
+            return previous
+        return None
+
+    def record_loss(self, expected: int, lost: int):
+        """Incorpora as perdas de um bloco terminado (inclusive as reconstruídas) à perda suavizada"""
+        if expected > 0:
+            self.loss += self.LOSS_ALPHA * (lost / expected - self.loss)
+
+    def recommended_parity(self) -> int:
+        """Paridades por bloco adequadas à perda observada, nunca abaixo do M negociado"""
+        return max(self.minimum, parity_for_loss(self.k, self.loss))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Envio de Segmentos Zero-Copy a partir de Arquivos Mapeados em Memória
+Fatias de memoryview do mmap são enviadas com sendmsg, sem copiar o payload em Python
+"""
+
+import mmap
+import os
+import socket
+from typing import Tuple
+
+import compression
+import protocol
+from checksum_index import ChecksumIndex
+
+# sendmsg (scatter/gather) não existe em todas as plataformas, ex.: Windows
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+class MappedSegments:
+    """Segmentos de um arquivo servidos diretamente de um mmap"""
+
+    def __init__(self, filename: str, segment_size: int, index: ChecksumIndex):
+        self.filename = filename
+        self.segment_size = segment_size
+        self.index = index  # Digests pré-calculados: nenhum hash no caminho de envio
+        self.file = open(filename, 'rb')
+        self.file_size = os.fstat(self.file.fileno()).st_size
+        self.num_segments = (self.file_size + segment_size - 1) // segment_size
+
+        # mmap não aceita arquivos vazios
+        self.mmap = None
+        if self.file_size > 0:
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self.mmap, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                self.mmap.madvise(mmap.MADV_SEQUENTIAL)
+        self.view = memoryview(self.mmap) if self.mmap is not None else memoryview(b'')
+
+        # Cabeçalho reutilizado a cada envio (preenchido com pack_into)
+        self.header_struct = protocol.segment_header(index.digest_size)
+        self.header = bytearray(self.header_struct.size)
+
+    def __len__(self) -> int:
+        return self.num_segments
+
+    def payload_bounds(self, segment_number: int) -> Tuple[int, int]:
+        """Intervalo de bytes do arquivo coberto pelo segmento"""
+        start = segment_number * self.segment_size
+        return start, min(start + self.segment_size, self.file_size)
+
+    def check_size(self):
+        """Falha só esta transferência se o arquivo encolheu: ler o mmap além do fim derruba o processo (SIGBUS)"""
+        if os.fstat(self.file.fileno()).st_size < self.file_size:
+            raise OSError(f"Arquivo {self.filename} truncado durante o envio")
+
+    def payload(self, segment_number: int) -> memoryview:
+        """Dados do segmento (fatia do mmap, sem cópia)"""
+        self.check_size()
+        start, end = self.payload_bounds(segment_number)
+        return self.view[start:end]
+
+    def segment_length(self, segment_number: int) -> int:
+        """Tamanho do datagrama do segmento"""
+        start, end = self.payload_bounds(segment_number)
+        return protocol.SEGMENT_PREFIX.size + len(self.header) + end - start
+
+    def send(self, sock: socket.socket, segment_number: int, address: Tuple[str, int], prefix: bytes) -> int:
+        """Envia o segmento com scatter/gather: [prefixo, cabeçalho, fatia do mmap]"""
+        self.check_size()
+        start, end = self.payload_bounds(segment_number)
+        with self.view[start:end] as payload:
+            self.header_struct.pack_into(self.header, 0, segment_number, self.index.digest(segment_number),
+                                         end - start)
+            if HAS_SENDMSG:
+                return sock.sendmsg([prefix, self.header, payload], [], 0, address)
+            return sock.sendto(b''.join((prefix, self.header, payload)), address)
+
+    def close(self):
+        """Libera o mapeamento e o arquivo"""
+        self.view.release()
+        if self.mmap is not None:
+            self.mmap.close()
+        self.file.close()
+
+class CompressedSegments:
+    """Segmentos de um arquivo mapeado comprimidos no envio (arquivos maiores que o cache)"""
+
+    def __init__(self, mapped: MappedSegments, codec: str):
+        self.mapped = mapped
+        self.codec = codec
+        self.header_struct = protocol.segment_header(mapped.index.digest_size, True)
+        self.last = (None, b'')  # Último segmento montado: o pacing pede o tamanho antes do envio
+
+    def __len__(self) -> int:
+        return len(self.mapped)
+
+    def segment(self, segment_number: int) -> bytes:
+        """Cabeçalho e payload comprimido do segmento (sem o prefixo)"""
+        if self.last[0] != segment_number:
+            with self.mapped.payload(segment_number) as payload:
+                data = compression.compress(self.codec, payload)
+                header = self.header_struct.pack(segment_number, self.mapped.index.digest(segment_number),
+                                                 len(data), len(payload))
+            self.last = (segment_number, header + data)
+        return self.last[1]
+
+    def payload(self, segment_number: int) -> memoryview:
+        """Dados originais do segmento"""
+        return self.mapped.payload(segment_number)
+
+    def segment_length(self, segment_number: int) -> int:
+        """Tamanho do datagrama do segmento"""
+        return protocol.SEGMENT_PREFIX.size + len(self.segment(segment_number))
+
+    def send(self, sock: socket.socket, segment_number: int, address: Tuple[str, int], prefix: bytes) -> int:
+        """Envia o segmento comprimido precedido do prefixo da transferência"""
+        segment = self.segment(segment_number)
+        if HAS_SENDMSG:
+            return sock.sendmsg([prefix, segment], [], 0, address)
+        return sock.sendto(prefix + segment, address)
+
+    def close(self):
+        """Libera o arquivo mapeado"""
+        self.mapped.close()
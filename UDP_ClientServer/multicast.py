@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Distribuição Multicast de Arquivos Populares
+O servidor envia cada arquivo uma única vez a um grupo multicast; os receptores entram no grupo,
+coletam os segmentos e recuperam as perdas por NACK unicast, na própria transferência
+"""
+
+import ipaddress
+import socket
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import config
+from sessions import TransferSession
+
+def parse_group(value: str) -> Tuple[str, int]:
+    """Interpreta 'grupo:porta' exigindo um endereço IPv4 multicast"""
+    host, separator, port = value.rpartition(':')
+    if not separator or not ipaddress.IPv4Address(host).is_multicast or not 0 < int(port) < 65536:
+        raise ValueError(f"Grupo multicast inválido: {value}")
+    return host, int(port)
+
+def format_group(group: Tuple[str, int]) -> str:
+    """Grupo no formato 'grupo:porta' usado no FILE_INFO"""
+    return f"{group[0]}:{group[1]}"
+
+def configure_sender(sock: socket.socket, interface: Optional[str] = None, ttl: int = config.MULTICAST_TTL,
+                     loop: bool = config.MULTICAST_LOOP):
+    """Prepara um socket para enviar ao grupo pela interface indicada (None usa a rota padrão)"""
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, int(loop))
+    if interface:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+
+def open_receiver(group: Tuple[str, int], interface: str = '0.0.0.0',
+                  recv_buffer: int = config.SOCKET_RECV_BUFFER) -> socket.socket:
+    """Socket inscrito no grupo; vários receptores do mesmo host compartilham a porta"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
+        except OSError:
+            pass
+        sock.bind(('', group[1]))
+        membership = struct.pack('4s4s', socket.inet_aton(group[0]), socket.inet_aton(interface))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def local_interface(remote_host: str) -> str:
+    """IP local pelo qual o servidor é alcançado: o grupo é recebido na mesma interface"""
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # connect em UDP só escolhe a rota, sem enviar nada
+        probe.connect((remote_host, 9))
+        return probe.getsockname()[0]
+    except OSError:
+        return '0.0.0.0'
+    finally:
+        probe.close()
+
+class Channel:
+    """Envio de um arquivo ao grupo e os receptores inscritos, cada um com a sua transferência unicast"""
+
+    def __init__(self, key: Tuple, session: TransferSession):
+        self.key = key
+        self.session = session  # Transferência do grupo: client_address é o endereço multicast
+        self.receivers: List[TransferSession] = []
+        self.started = False
+        self.finished = False
+
+class ChannelTable:
+    """Canais abertos por arquivo e opções de segmentação; novos receptores entram no canal em andamento"""
+
+    def __init__(self):
+        self.channels: Dict[Tuple, Channel] = {}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.channels)
+
+    def find(self, key: Tuple) -> Optional[Channel]:
+        """Canal ainda não terminado com as mesmas opções"""
+        with self.lock:
+            return self.channels.get(key)
+
+    def add(self, channel: Channel) -> Channel:
+        """Registra um canal; se outro com as mesmas opções surgiu antes, retorna o existente"""
+        with self.lock:
+            return self.channels.setdefault(channel.key, channel)
+
+    def join(self, channel: Channel, session: TransferSession) -> bool:
+        """Inscreve um receptor; True se ele for o primeiro e deve conduzir o envio ao grupo
+
+        Enquanto o canal envia, a transferência do receptor não expira: seus NACKs só chegam depois.
+        """
+        with self.lock:
+            if channel.finished:
+                return False
+            channel.receivers.append(session)
+            session.sending = True
+            starter = not channel.started
+            channel.started = True
+            return starter
+
+    def close(self, channel: Channel) -> List[TransferSession]:
+        """Encerra o canal; as transferências dos receptores passam a contar a ociosidade"""
+        with self.lock:
+            channel.finished = True
+            if self.channels.get(channel.key) is channel:
+                del self.channels[channel.key]
+            for session in channel.receivers:
+                session.sending = False
+                session.touch()
+            return list(channel.receivers)
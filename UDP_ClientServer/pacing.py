@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Controle de Taxa de Envio (Pacing) para o Servidor UDP
+Implementa um token bucket que limita o envio em bytes/s ou pacotes/s
+"""
+
+import time
+import threading
+from typing import Optional
+
+import config
+
+class Pacer:
+    """Token bucket que espaça o envio de segmentos"""
+
+    UNITS = ('bytes', 'packets')
+
+    def __init__(self, rate: Optional[float] = None, unit: str = 'bytes', burst: Optional[float] = None):
+        if unit not in self.UNITS:
+            raise ValueError(f"Unidade de taxa inválida: {unit}")
+
+        self.unit = unit
+        self.rate = rate if rate and rate > 0 else None
+        self.burst = burst if burst and burst > 0 else self.default_burst(unit)
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def default_burst(unit: str) -> float:
+        """Rajada padrão equivalente a PACING_BURST segmentos"""
+        if unit == 'bytes':
+            return config.PACING_BURST * config.MAX_PAYLOAD_SIZE
+        return config.PACING_BURST
+
+    @classmethod
+    def from_settings(cls, rate: Optional[float] = None, unit: str = 'bytes',
+                      burst: Optional[float] = None) -> 'Pacer':
+        """Cria um pacer a partir das opções do servidor
+
+        rate=None usa PACING_RATE de config.py e, na ausência dele, SEGMENT_DELAY
+        como fallback (um pacote a cada SEGMENT_DELAY segundos). rate=0 desativa o pacing.
+        """
+        if rate is None and config.PACING_RATE is not None:
+            rate, unit = config.PACING_RATE, config.PACING_UNIT
+        if rate is None and config.SEGMENT_DELAY > 0:
+            rate, unit = 1.0 / config.SEGMENT_DELAY, 'packets'
+            if burst is None:
+                burst = 1
+        return cls(rate, unit, burst)
+
+    @property
+    def unlimited(self) -> bool:
+        """Indica se o pacing está desativado"""
+        return self.rate is None
+
+    def set_rate(self, rate: Optional[float]):
+        """Altera a taxa alvo mantendo os tokens acumulados"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = rate if rate and rate > 0 else None
+
+    def _refill(self, now: float):
+        """Repõe tokens proporcionalmente ao tempo decorrido"""
+        if self.rate is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def delay(self, size: int) -> float:
+        """Consome tokens para um pacote e retorna quanto aguardar antes de enviá-lo"""
+        if self.rate is None:
+            return 0.0
+
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= size if self.unit == 'bytes' else 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def wait(self, size: int):
+        """Bloqueia até que o pacote possa ser enviado"""
+        delay = self.delay(size)
+        if delay > 0:
+            time.sleep(delay)
+
+    def describe(self) -> str:
+        """Descrição legível da configuração de pacing"""
+        if self.rate is None:
+            return "sem pacing"
+        unit = "bytes/s" if self.unit == 'bytes' else "pacotes/s"
+        return f"{self.rate:.0f} {unit} (rajada: {self.burst:.0f})"
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Servidor UDP Multiprocesso com SO_REUSEPORT
+N processos escutam a mesma porta e o kernel distribui os fluxos de clientes entre eles
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+from typing import Dict, List, Type
+import logging
+
+logger = logging.getLogger(__name__)
+
+HAS_REUSEPORT = hasattr(socket, 'SO_REUSEPORT')
+
+def run_worker(worker_id: int, server_class: Type, server_kwargs: Dict):
+    """Processo filho: cria seu próprio servidor (socket, pools e caches) e atende até ser parado"""
+    # terminate() do pai vira KeyboardInterrupt, para o servidor encerrar os pools e logar estatísticas
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    server = server_class(reuse_port=True, **server_kwargs)
+    logger.info(f"Worker {worker_id} iniciado (pid {os.getpid()})")
+    try:
+        server.start()
+    except KeyboardInterrupt:
+        server.stop()
+
+class ServerProcessGroup:
+    """Inicia e supervisiona os processos do servidor que compartilham a porta"""
+
+    def __init__(self, server_class: Type, workers: int, **server_kwargs):
+        if not HAS_REUSEPORT:
+            raise RuntimeError("SO_REUSEPORT não suportado nesta plataforma")
+        if workers <= 0:
+            raise ValueError("Número de workers deve ser positivo")
+
+        self.server_class = server_class
+        self.workers = workers
+        self.server_kwargs = server_kwargs
+        self.processes: List[multiprocessing.Process] = []
+
+    def start(self):
+        """Inicia os workers e aguarda todos terminarem"""
+        for worker_id in range(self.workers):
+            process = multiprocessing.Process(target=run_worker, name=f"udp-worker-{worker_id}",
+                                              args=(worker_id, self.server_class, self.server_kwargs))
+            process.start()
+            self.processes.append(process)
+
+        logger.info(f"{self.workers} processos escutando {self.server_kwargs.get('host')}:"
+                    f"{self.server_kwargs.get('port')} com SO_REUSEPORT")
+        for process in self.processes:
+            process.join()
+
+    def stop(self):
+        """Para todos os workers ainda vivos"""
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join()
+        logger.info("Todos os workers parados")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Definições Compartilhadas do Protocolo UDP
+Mensagens binárias de controle e negociação de opções em GET/FILE_INFO
+"""
+
+import struct
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Mensagens binárias começam com um byte >= 0xF8, que nunca aparece em UTF-8
+# válido; assim servidor e cliente as distinguem das mensagens de texto
+BINARY_MESSAGE_MIN = 0xF8
+MSG_DATA = 0xFF  # Segmento de dados
+MSG_NACK = 0xFE  # Lista de intervalos de segmentos perdidos
+MSG_ACK = 0xFD  # Confirmação cumulativa + bitmap seletivo (SACK)
+MSG_FEC = 0xFC  # Paridade Reed-Solomon de um bloco de segmentos
+MSG_PROBE = 0xFB  # Resposta a uma sondagem de tamanho de datagrama
+MSG_DELTA_SUMS = 0xFA  # Digests de segmentos da cópia local do cliente (sincronização delta)
+MSG_DELTA_MATCH = 0xF9  # Bitmap dos digests do DELTA_SUMS iguais aos do servidor
+
+# Segmento de dados: [tipo(1)][transfer_id(4)][segment_number(4)][checksum(N)][data_length(2)][data]
+# O prefixo [tipo][transfer_id] é fixo por transferência; o restante do cabeçalho não
+# depende do cliente e pode ser pré-montado e compartilhado entre transferências.
+# N depende do algoritmo de checksum negociado (16 para MD5, 4 para CRC32, 0 sem checksum).
+# Com compressão negociada: [...][data_length(2)][original_length(2)][data], data_length é o tamanho
+# comprimido e o checksum é o dos dados originais; data_length == original_length indica payload sem compressão
+SEGMENT_PREFIX = struct.Struct('!BI')
+
+@lru_cache(maxsize=None)
+def segment_header(digest_size: int, compressed: bool = False) -> struct.Struct:
+    """Estrutura do cabeçalho de dados (após o prefixo) para um tamanho de checksum"""
+    return struct.Struct(f'!I{digest_size}sHH' if compressed else f'!I{digest_size}sH')
+
+# Paridade FEC: [tipo(1)][transfer_id(4)][primeiro_segmento(4)][M(1)][linha(1)][checksum(N)][paridade]
+# Do mesmo tamanho de um segmento de dados completo; K é fixo na transferência (negociado no GET/FILE_INFO)
+FEC_HEADER = struct.Struct('!BIIBB')
+
+# Sondagem: cliente envia 'PROBE tamanho'; servidor responde com um datagrama de exatamente
+# esse tamanho: [tipo(1)][tamanho(4)][enchimento]
+PROBE_HEADER = struct.Struct('!BI')
+MAX_DATAGRAM_SIZE = 65507  # Maior payload UDP sobre IPv4
+
+# ACK: [tipo(1)][transfer_id(4)][cumulativo(4)][tamanho_bitmap(2)][bitmap]
+ACK_HEADER = struct.Struct('!BIIH')
+
+# NACK: [tipo(1)][transfer_id(4)][num_intervalos(2)][(inicio(4), quantidade(4)) ...]
+NACK_HEADER = struct.Struct('!BIH')
+NACK_RANGE = struct.Struct('!II')
+
+# DELTA_SUMS: [tipo(1)][transfer_id(4)][primeiro_segmento(4)][quantidade(2)][digests (quantidade x N)]
+# DELTA_MATCH: [tipo(1)][transfer_id(4)][primeiro_segmento(4)][quantidade(2)][bitmap]
+DELTA_HEADER = struct.Struct('!BIIH')
+
+# Modos de transferência negociados no GET/FILE_INFO
+MODE_STREAM = 'stream'  # Envio contínuo, recuperação de perdas ao final
+MODE_SR = 'sr'          # Janela deslizante com selective repeat
+
+def is_binary_message(data: bytes) -> bool:
+    """Indica se o datagrama é uma mensagem binária do protocolo"""
+    return len(data) > 0 and data[0] >= BINARY_MESSAGE_MIN
+
+def parse_options(tokens: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    """Separa os tokens 'chave=valor' do final de uma mensagem de texto"""
+    options = {}
+    while tokens and '=' in tokens[-1]:
+        key, value = tokens.pop().split('=', 1)
+        options[key] = value
+    return tokens, options
+
+def format_options(options: Dict) -> str:
+    """Formata opções como tokens 'chave=valor' separados por espaço"""
+    return ' '.join(f"{key}={value}" for key, value in options.items())
+
+def parse_get_request(request: str) -> Tuple[str, Dict[str, str]]:
+    """Interpreta 'GET filename [chave=valor ...]'"""
+    tokens, options = parse_options(request[4:].split(' '))
+    return ' '.join(tokens), options
+
+def datagram_size(segment_size: int, digest_size: int, compressed: bool = False) -> int:
+    """Tamanho do datagrama de um segmento completo com este payload e checksum"""
+    return SEGMENT_PREFIX.size + segment_header(digest_size, compressed).size + segment_size
+
+def pack_probe(size: int) -> bytes:
+    """Monta a resposta de sondagem com exatamente 'size' bytes"""
+    return PROBE_HEADER.pack(MSG_PROBE, size).ljust(size, b'\0')
+
+def pack_ack(transfer_id: int, cumulative: int, bitmap: bytes) -> bytes:
+    """Monta um ACK: todos os segmentos < cumulative recebidos; bit i = segmento cumulative+1+i"""
+    return ACK_HEADER.pack(MSG_ACK, transfer_id, cumulative, len(bitmap)) + bitmap
+
+def unpack_ack(data: bytes) -> Tuple[int, int, bytes]:
+    """Extrai (transfer_id, cumulativo, bitmap) de um ACK"""
+    _, transfer_id, cumulative, bitmap_length = ACK_HEADER.unpack_from(data)
+    bitmap = data[ACK_HEADER.size:ACK_HEADER.size + bitmap_length]
+    return transfer_id, cumulative, bitmap
+
+def segment_ranges(segment_numbers: Iterable[int]) -> List[Tuple[int, int]]:
+    """Compacta números de segmento ordenados em intervalos (inicio, quantidade)"""
+    ranges = []
+    for segment_number in segment_numbers:
+        if ranges and ranges[-1][0] + ranges[-1][1] == segment_number:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([segment_number, 1])
+    return [(start, count) for start, count in ranges]
+
+def parse_span(value: str, total: int) -> Tuple[int, int]:
+    """Interpreta 'inicio-fim' (fim exclusivo), 'inicio-' (até o fim) ou '-n' (últimos n) em [0, total)"""
+    first, separator, last = value.partition('-')
+    if not separator or not (first or last):
+        raise ValueError(f"Intervalo inválido: {value}")
+    if not first:
+        # Sufixo: os últimos n (ex.: o final de um log que só cresce)
+        if int(last) < 0:
+            raise ValueError(f"Intervalo inválido: {value}")
+        return max(0, total - int(last)), total
+    start = int(first)
+    end = total if not last else min(int(last), total)
+    if start < 0 or start > total or end < start:
+        raise ValueError(f"Intervalo fora do arquivo: {value}")
+    return start, end
+
+def byte_range_segments(offset: int, length: int, segment_size: int) -> Tuple[int, int]:
+    """Segmentos [primeiro, fim) que cobrem os bytes [offset, offset + length)"""
+    first = offset // segment_size
+    return first, max(first, (offset + length + segment_size - 1) // segment_size)
+
+def iter_ranges(ranges: Iterable[Tuple[int, int]]) -> Iterator[int]:
+    """Números de segmento dos intervalos (inicio, quantidade), em ordem"""
+    for start, count in ranges:
+        yield from range(start, start + count)
+
+def clamp_ranges(ranges: Iterable[Tuple[int, int]], lower: int, upper: int) -> List[Tuple[int, int]]:
+    """Intervalos (inicio, quantidade) cortados a [lower, upper), ordenados e sem sobreposição"""
+    spans = sorted((max(start, lower), min(start + count, upper)) for start, count in ranges)
+    merged = []
+    for start, end in spans:
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end - start) for start, end in merged]
+
+def coalesce_ranges(ranges: List[Tuple[int, int]], limit: int) -> List[Tuple[int, int]]:
+    """Reduz intervalos (inicio, quantidade) ordenados a no máximo 'limit', unindo os menores vãos"""
+    excess = len(ranges) - max(1, limit)
+    if excess <= 0:
+        return list(ranges)
+    
+    # Fecha os menores vãos entre vizinhos: seus segmentos são reenviados à toa, mas são poucos
+    gaps = sorted(range(len(ranges) - 1), key=lambda i: ranges[i + 1][0] - ranges[i][0] - ranges[i][1])
+    closed = set(gaps[:excess])
+    merged = [list(ranges[0])]
+    for index in range(1, len(ranges)):
+        start, count = ranges[index]
+        if index - 1 in closed:
+            merged[-1][1] = start + count - merged[-1][0]
+        else:
+            merged.append([start, count])
+    return [(start, count) for start, count in merged]
+
+def format_ranges(ranges: List[Tuple[int, int]]) -> str:
+    """Formata intervalos (inicio, quantidade) como 'inicio:quantidade,...' para a opção ranges="""
+    return ','.join(f"{start}:{count}" for start, count in ranges)
+
+def parse_ranges(value: str) -> List[Tuple[int, int]]:
+    """Interpreta a opção ranges= em intervalos (inicio, quantidade) ordenados"""
+    ranges = []
+    for item in value.split(','):
+        start, count = item.split(':')
+        if int(start) < 0 or int(count) <= 0:
+            raise ValueError(f"Intervalo inválido: {item}")
+        ranges.append((int(start), int(count)))
+    return sorted(ranges)
+
+def pack_delta_sums(transfer_id: int, first_segment: int, digests: bytes, digest_size: int) -> bytes:
+    """Monta um DELTA_SUMS com os digests dos segmentos consecutivos a partir de first_segment"""
+    return DELTA_HEADER.pack(MSG_DELTA_SUMS, transfer_id, first_segment, len(digests) // digest_size) + digests
+
+def pack_delta_match(transfer_id: int, first_segment: int, count: int, bitmap: bytes) -> bytes:
+    """Monta um DELTA_MATCH: bit i = segmento first_segment + i igual no cliente e no servidor"""
+    return DELTA_HEADER.pack(MSG_DELTA_MATCH, transfer_id, first_segment, count) + bitmap
+
+def unpack_delta(data: bytes) -> Tuple[int, int, int, bytes]:
+    """Extrai (transfer_id, primeiro segmento, quantidade, corpo) de um DELTA_SUMS ou DELTA_MATCH"""
+    _, transfer_id, first_segment, count = DELTA_HEADER.unpack_from(data)
+    return transfer_id, first_segment, count, data[DELTA_HEADER.size:]
+
+def pack_fec(transfer_id: int, first_segment: int, m: int, row: int, checksum: bytes, parity: bytes) -> bytes:
+    """Monta a paridade 'row' das M do bloco que começa em first_segment"""
+    return FEC_HEADER.pack(MSG_FEC, transfer_id, first_segment, m, row) + checksum + parity
+
+def unpack_fec(data: bytes, digest_size: int) -> Tuple[int, int, int, int, bytes, memoryview]:
+    """Extrai (transfer_id, primeiro segmento, M, linha, checksum, paridade) de uma paridade FEC"""
+    _, transfer_id, first_segment, m, row = FEC_HEADER.unpack_from(data)
+    checksum_end = FEC_HEADER.size + digest_size
+    return transfer_id, first_segment, m, row, bytes(data[FEC_HEADER.size:checksum_end]), memoryview(data)[checksum_end:]
+
+def pack_nack(transfer_id: int, ranges: List[Tuple[int, int]]) -> bytes:
+    """Monta um NACK com os intervalos de segmentos perdidos"""
+    parts = [NACK_HEADER.pack(MSG_NACK, transfer_id, len(ranges))]
+    parts.extend(NACK_RANGE.pack(start, count) for start, count in ranges)
+    return b''.join(parts)
+
+def unpack_nack(data: bytes) -> Tuple[int, List[Tuple[int, int]]]:
+    """Extrai (transfer_id, intervalos) de um NACK"""
+    _, transfer_id, count = NACK_HEADER.unpack_from(data)
+    ranges = [NACK_RANGE.unpack_from(data, NACK_HEADER.size + i * NACK_RANGE.size) for i in range(count)]
+    return transfer_id, ranges
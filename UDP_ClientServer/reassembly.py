@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Remontagem do Arquivo Recebido Direto no Disco
+Cada segmento verificado é gravado no seu deslocamento de um arquivo .part pré-alocado
+(o arquivo inteiro ou um trecho de bytes dele), com um journal ao lado que permite
+retomar transferências interrompidas
+"""
+
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import config
+import protocol
+from segment_bitmap import SegmentBitmap
+
+HAS_PWRITE = hasattr(os, 'pwrite')
+
+# Journal: [magic(8)][tamanho(8)][offset(8)][length(8)][tamanho_segmento(4)][algoritmo(16)]
+#          [tamanho_digest(1)][digest do arquivo inteiro][bitmap dos segmentos já gravados no .part]
+JOURNAL_MAGIC = b'UDPJRN02'
+JOURNAL_HEADER = struct.Struct('!8sQQQI16sB')
+
+class ResumeJournal:
+    """Identidade do arquivo (tamanho, trecho, segmento, checksum e digest do servidor) e segmentos já gravados"""
+
+    SUFFIX = '.journal'
+
+    def __init__(self, file_size: int, segment_size: int, algorithm: str, digest: bytes,
+                 offset: int = 0, length: int = None, bits: bytes = b''):
+        self.file_size = file_size
+        self.segment_size = segment_size
+        self.algorithm = algorithm
+        self.digest = digest
+        self.offset = offset
+        self.length = file_size - offset if length is None else length
+        self.bits = bits
+
+    def matches(self, other: 'ResumeJournal') -> bool:
+        """Indica se os dois journals descrevem o mesmo trecho da mesma versão do arquivo, com os mesmos segmentos"""
+        return (self.file_size == other.file_size and self.segment_size == other.segment_size
+                and self.algorithm == other.algorithm and self.digest == other.digest
+                and self.offset == other.offset and self.length == other.length)
+
+    def to_bytes(self) -> bytes:
+        """Serializa o journal"""
+        header = JOURNAL_HEADER.pack(JOURNAL_MAGIC, self.file_size, self.offset, self.length, self.segment_size,
+                                     self.algorithm.encode('ascii'), len(self.digest))
+        return header + self.digest + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional['ResumeJournal']:
+        """Lê um journal serializado; None se estiver corrompido"""
+        if len(data) < JOURNAL_HEADER.size:
+            return None
+        magic, file_size, offset, length, segment_size, algorithm, digest_size = JOURNAL_HEADER.unpack_from(data)
+        if magic != JOURNAL_MAGIC or not segment_size:
+            return None
+        first, end = protocol.byte_range_segments(offset, length, segment_size)
+        if len(data) != JOURNAL_HEADER.size + digest_size + (end - first + 7) // 8:
+            return None
+
+        start = JOURNAL_HEADER.size
+        return cls(file_size, segment_size, algorithm.rstrip(b'\0').decode('ascii'),
+                   data[start:start + digest_size], offset, length, data[start + digest_size:])
+
+    @classmethod
+    def load(cls, path: str) -> Optional['ResumeJournal']:
+        """Carrega o journal do arquivo de saída 'path', se existir"""
+        try:
+            with open(path + FileAssembler.PART_SUFFIX + cls.SUFFIX, 'rb') as journal:
+                return cls.from_bytes(journal.read())
+        except OSError:
+            return None
+
+class FileAssembler:
+    """Arquivo de saída parcial compartilhado pelos fluxos de uma transferência"""
+
+    PART_SUFFIX = '.part'
+
+    def __init__(self, path: str, file_size: int, segment_size: int, algorithm: str = None, digest: str = None,
+                 offset: int = 0, length: int = None):
+        self.path = path
+        self.part_path = path + self.PART_SUFFIX
+        self.file_size = file_size
+        self.segment_size = segment_size
+
+        # Trecho [offset, offset + length) do arquivo gravado na saída (o arquivo inteiro por padrão);
+        # os segmentos mantêm a numeração do arquivo, e os das pontas são recortados
+        self.offset = offset
+        self.length = file_size - offset if length is None else length
+        self.first_segment, self.end_segment = protocol.byte_range_segments(offset, self.length, segment_size)
+        self.num_segments = self.end_segment - self.first_segment
+
+        # Um bit por segmento recebido (bit i = segmento first_segment + i); os dados vão direto para o disco
+        self.received = SegmentBitmap(self.num_segments)
+        self.lock = threading.Lock()  # Posição do arquivo sem pwrite e segmentos em gravação
+        self.writing = set()  # Índices no bitmap de segmentos marcados cuja gravação ainda não terminou
+        self.edges: Dict[int, bytes] = {}  # Segmentos das pontas recortados na saída, inteiros para o FEC
+
+        # Sem o digest do servidor não há como saber se o .part é da mesma versão do arquivo
+        self.journal = None
+        self.journal_path = self.part_path + ResumeJournal.SUFFIX
+        self.checkpoint_lock = threading.Lock()
+        self.last_checkpoint = time.monotonic()
+        self.resumed = 0  # Segmentos recuperados de uma transferência anterior
+        if digest:
+            self.journal = ResumeJournal(file_size, segment_size, algorithm, bytes.fromhex(digest),
+                                         offset, self.length)
+
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        saved = self.load_journal()
+        if saved is None:
+            # Journal de outra versão do arquivo não vale para o .part recriado
+            flags |= os.O_TRUNC
+            self.remove_journal()
+        self.fd = os.open(self.part_path, flags, 0o644)
+        if saved is not None:
+            self.received = SegmentBitmap.from_bytes(self.num_segments, saved.bits)
+            self.resumed = self.received.count
+        else:
+            self.preallocate()
+
+    @property
+    def resumable(self) -> bool:
+        """Indica se o .part pode ser mantido para uma retomada futura"""
+        return self.journal is not None
+
+    def load_journal(self) -> Optional[ResumeJournal]:
+        """Journal salvo de uma transferência anterior do mesmo arquivo; None para começar do zero"""
+        if self.journal is None:
+            return None
+        saved = ResumeJournal.load(self.path)
+        try:
+            part_size = os.path.getsize(self.part_path)
+        except OSError:
+            return None
+        if saved is None or not saved.matches(self.journal) or part_size != self.length:
+            return None
+        return saved
+
+    def preallocate(self):
+        """Reserva o tamanho final do arquivo (esparso se o sistema não suportar fallocate)"""
+        try:
+            if hasattr(os, 'posix_fallocate') and self.length > 0:
+                os.posix_fallocate(self.fd, 0, self.length)
+                return
+        except OSError:
+            pass
+        os.ftruncate(self.fd, self.length)
+
+    @property
+    def complete(self) -> bool:
+        """Indica se todos os segmentos foram gravados"""
+        return self.received.complete
+
+    @property
+    def count(self) -> int:
+        """Número de segmentos gravados"""
+        return self.received.count
+
+    def segment_length(self, segment_number: int) -> int:
+        """Tamanho esperado dos dados de um segmento (o último pode ser menor)"""
+        return min(self.segment_size, self.file_size - segment_number * self.segment_size)
+
+    def has(self, segment_number: int) -> bool:
+        """Indica se um segmento já foi gravado"""
+        return self.received.has(segment_number - self.first_segment)
+
+    def missing(self, start: int = None, end: int = None) -> List[int]:
+        """Segmentos ainda não gravados no intervalo [start, end)"""
+        return list(protocol.iter_ranges(self.missing_ranges(start, end)))
+
+    def missing_ranges(self, start: int = None, end: int = None) -> List[Tuple[int, int]]:
+        """Intervalos (inicio, quantidade) ainda não gravados em [start, end) (todo o trecho por padrão)"""
+        start = self.first_segment if start is None else max(start, self.first_segment)
+        end = self.end_segment if end is None else min(end, self.end_segment)
+        return [(first + self.first_segment, count) for first, count
+                in self.received.iter_missing(start - self.first_segment, end - self.first_segment)]
+
+    def window(self, start: int, count: int) -> bytes:
+        """Bitmap dos segmentos [start, start + count) para o ACK (bit i = segmento start + i)"""
+        return self.received.window(start - self.first_segment, count)
+
+    def write(self, segment_number: int, data) -> bool:
+        """Grava um segmento no seu deslocamento; False se ele já tinha sido gravado"""
+        if (not self.first_segment <= segment_number < self.end_segment
+                or len(data) != self.segment_length(segment_number)):
+            raise ValueError(f"Segmento {segment_number} com {len(data)} bytes não pertence ao arquivo")
+        index = segment_number - self.first_segment
+
+        # Só a parte do segmento dentro do trecho pedido vai para a saída
+        segment_start = segment_number * self.segment_size
+        low = max(segment_start, self.offset)
+        high = min(segment_start + len(data), self.offset + self.length)
+
+        # Registrado como em gravação antes de marcado, para o journal nunca contar um segmento incompleto
+        with self.lock:
+            self.writing.add(index)
+        try:
+            # Reserva o segmento antes de gravar, para que fluxos paralelos não o contem duas vezes
+            if not self.received.mark(index):
+                return False
+            try:
+                self._pwrite(memoryview(data)[low - segment_start:high - segment_start], low - self.offset)
+            except OSError:
+                self.received.unmark(index)
+                raise
+            if high - low != len(data):
+                self.edges[segment_number] = bytes(data)
+            return True
+        finally:
+            with self.lock:
+                self.writing.discard(index)
+
+    def read(self, segment_number: int) -> Optional[bytes]:
+        """Dados de um segmento já gravado por inteiro (None se faltar ou só parte dele estiver na saída)"""
+        if segment_number in self.edges:
+            return self.edges[segment_number]
+        index = segment_number - self.first_segment
+        with self.lock:
+            if not self.received.has(index) or index in self.writing:
+                return None
+        segment_start = segment_number * self.segment_size
+        length = self.segment_length(segment_number)
+        if segment_start < self.offset or segment_start + length > self.offset + self.length:
+            return None
+        return self._pread(length, segment_start - self.offset)
+
+    def _pread(self, length: int, offset: int) -> bytes:
+        """Lê bytes de um deslocamento sem mover a posição compartilhada do arquivo"""
+        if HAS_PWRITE:
+            return os.pread(self.fd, length, offset)
+        with self.lock:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            return os.read(self.fd, length)
+
+    def _pwrite(self, data, offset: int):
+        """Grava todos os bytes no deslocamento sem mover a posição compartilhada do arquivo"""
+        view = memoryview(data)
+        while view:
+            if HAS_PWRITE:
+                written = os.pwrite(self.fd, view, offset)
+            else:
+                # Windows: sem pwrite, posição e escrita precisam ser atômicas
+                with self.lock:
+                    os.lseek(self.fd, offset, os.SEEK_SET)
+                    written = os.write(self.fd, view)
+            view = view[written:]
+            offset += written
+
+    def maybe_checkpoint(self):
+        """Grava o journal se o intervalo de checkpoint já passou (chamado a cada segmento)"""
+        if self.journal is not None and time.monotonic() - self.last_checkpoint >= config.RESUME_CHECKPOINT_INTERVAL:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Persiste os segmentos já gravados: fsync do .part antes do journal que os declara"""
+        if self.journal is None or self.fd is None or not self.checkpoint_lock.acquire(blocking=False):
+            return
+        try:
+            with self.lock:
+                bits = self.received.snapshot()
+                writing = list(self.writing)
+            for index in writing:
+                bits[index >> 3] &= ~(0x80 >> (index & 7)) & 0xFF
+
+            os.fsync(self.fd)
+            self.journal.bits = bits
+            self.save_journal()
+            self.last_checkpoint = time.monotonic()
+        except OSError:
+            # Sem journal a transferência continua; apenas não poderá ser retomada deste ponto
+            pass
+        finally:
+            self.checkpoint_lock.release()
+
+    def save_journal(self):
+        """Substitui o journal de forma atômica, para uma queda nunca deixar um journal parcial"""
+        directory = os.path.dirname(os.path.abspath(self.journal_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(self.journal.to_bytes())
+            os.replace(temp_path, self.journal_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def suspend(self) -> bool:
+        """Fecha uma transferência não concluída mantendo .part e journal; False se não for retomável"""
+        if self.journal is None:
+            self.discard()
+            return False
+        self.checkpoint()
+        self.close()
+        if not os.path.exists(self.journal_path):
+            self.discard()
+            return False
+        return True
+
+    def finish(self) -> str:
+        """Conclui o arquivo: grava em disco e renomeia o .part para o nome final"""
+        os.fsync(self.fd)
+        self.close()
+        os.replace(self.part_path, self.path)
+        self.remove_journal()
+        return self.path
+
+    def discard(self):
+        """Fecha e remove o arquivo parcial de uma transferência não concluída"""
+        self.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+        self.remove_journal()
+
+    def remove_journal(self):
+        """Remove o journal, que não descreve mais nenhum .part"""
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def close(self):
+        """Fecha o descritor do arquivo parcial"""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
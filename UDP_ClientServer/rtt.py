@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Estimativa de RTT e Temporizador de Retransmissão
+SRTT/RTTVAR e RTO no estilo do RFC 6298, com backoff exponencial e algoritmo de Karn
+(amostras só de mensagens enviadas uma única vez)
+"""
+
+import threading
+from typing import Optional
+
+import config
+
+class RTTEstimator:
+    """RTT suavizado, variação e RTO de uma sessão"""
+
+    ALPHA = 1 / 8  # Peso de cada amostra no SRTT
+    BETA = 1 / 4   # Peso de cada amostra no RTTVAR
+    K = 4          # RTO = SRTT + K * RTTVAR
+
+    def __init__(self, initial_rto: float = config.RTT_INITIAL_RTO, min_rto: float = config.RTT_MIN_RTO,
+                 max_rto: float = config.RTT_MAX_RTO):
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+        self.base_rto = min(max(initial_rto, min_rto), max_rto)  # RTO sem backoff
+        self.backoffs = 0  # Expirações seguidas sem nova amostra
+        self.lock = threading.Lock()
+
+    @property
+    def rto(self) -> float:
+        """Temporizador atual, já com o backoff exponencial"""
+        return min(self.base_rto * (2 ** self.backoffs), self.max_rto)
+
+    def sample(self, rtt: float):
+        """Incorpora uma medida de RTT (de uma mensagem não retransmitida) e zera o backoff"""
+        if rtt < 0:
+            return
+        with self.lock:
+            if self.srtt is None:
+                self.srtt, self.rttvar = rtt, rtt / 2
+            else:
+                self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+            rto = self.srtt + max(config.RTT_GRANULARITY, self.K * self.rttvar)
+            self.base_rto = min(max(rto, self.min_rto), self.max_rto)
+            self.backoffs = 0
+
+    def backoff(self):
+        """Dobra o RTO após uma expiração (até max_rto)"""
+        with self.lock:
+            if self.base_rto * (2 ** self.backoffs) < self.max_rto:
+                self.backoffs += 1
+
+    def describe(self) -> str:
+        """Estado legível do estimador"""
+        if self.srtt is None:
+            return f"sem amostras, RTO {self.rto * 1000:.0f} ms"
+        return f"SRTT {self.srtt * 1000:.1f} ms, RTTVAR {self.rttvar * 1000:.1f} ms, RTO {self.rto * 1000:.0f} ms"
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Bitmap de Segmentos Recebidos
+Um bit por segmento, com contagem mantida a cada marcação e busca de intervalos faltantes em C (re/int)
+"""
+
+import re
+import threading
+from typing import Iterator, List, Tuple
+
+# Bytes com ao menos um segmento faltando (0xFF = oito segmentos recebidos)
+_INCOMPLETE_BYTES = re.compile(rb'[^\xff]+')
+
+class SegmentBitmap:
+    """Conjunto de segmentos recebidos em [0, size), bit mais significativo primeiro"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.bits = bytearray((size + 7) // 8)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_bytes(cls, size: int, bits: bytes) -> 'SegmentBitmap':
+        """Restaura um bitmap salvo por snapshot(); bits além de 'size' são ignorados"""
+        bitmap = cls(size)
+        bitmap.bits[:] = bits[:len(bitmap.bits)].ljust(len(bitmap.bits), b'\0')
+        if size & 7:
+            bitmap.bits[-1] &= (0xFF << (8 - (size & 7))) & 0xFF
+        # bin().count em vez de int.bit_count, que só existe a partir do Python 3.10
+        bitmap.count = bin(int.from_bytes(bitmap.bits, 'big')).count('1')
+        return bitmap
+
+    def snapshot(self) -> bytearray:
+        """Cópia consistente dos bits, para persistir enquanto outros fluxos marcam segmentos"""
+        with self.lock:
+            return bytearray(self.bits)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, segment_number: int) -> bool:
+        return self.has(segment_number)
+
+    @property
+    def complete(self) -> bool:
+        """Indica se todos os segmentos foram marcados"""
+        return self.count == self.size
+
+    def has(self, segment_number: int) -> bool:
+        """Indica se um segmento foi marcado (False fora do intervalo)"""
+        if not 0 <= segment_number < self.size:
+            return False
+        return bool(self.bits[segment_number >> 3] & (0x80 >> (segment_number & 7)))
+
+    def mark(self, segment_number: int) -> bool:
+        """Marca um segmento; False se ele já estava marcado"""
+        if not 0 <= segment_number < self.size:
+            raise IndexError(f"Segmento {segment_number} fora do bitmap de {self.size}")
+        mask = 0x80 >> (segment_number & 7)
+        with self.lock:
+            if self.bits[segment_number >> 3] & mask:
+                return False
+            self.bits[segment_number >> 3] |= mask
+            self.count += 1
+            return True
+
+    def unmark(self, segment_number: int):
+        """Desfaz a marcação de um segmento (ex.: falha ao gravá-lo)"""
+        mask = 0x80 >> (segment_number & 7)
+        with self.lock:
+            if self.bits[segment_number >> 3] & mask:
+                self.bits[segment_number >> 3] &= ~mask
+                self.count -= 1
+
+    def first_missing(self, start: int = 0) -> int:
+        """Menor segmento não marcado a partir de 'start' (size se não houver)"""
+        for first, _ in self.iter_missing(start):
+            return first
+        return self.size
+
+    def iter_missing(self, start: int = 0, end: int = None) -> Iterator[Tuple[int, int]]:
+        """Intervalos (inicio, quantidade) não marcados em [start, end), em ordem"""
+        end = self.size if end is None else min(end, self.size)
+        if start >= end:
+            return
+
+        run_start = None
+        run_end = None
+        # Bytes completos (0xFF) são pulados pelo re sem passar pelo Python
+        for match in _INCOMPLETE_BYTES.finditer(self.bits, start >> 3, (end + 7) >> 3):
+            for byte_index in range(match.start(), match.end()):
+                byte = self.bits[byte_index]
+                base = byte_index << 3
+                for bit in range(8):
+                    segment_number = base + bit
+                    if byte & (0x80 >> bit) or not start <= segment_number < end:
+                        continue
+                    if run_end == segment_number:
+                        run_end += 1
+                        continue
+                    if run_start is not None:
+                        yield run_start, run_end - run_start
+                    run_start, run_end = segment_number, segment_number + 1
+        if run_start is not None:
+            yield run_start, run_end - run_start
+
+    def missing_ranges(self, start: int = 0, end: int = None) -> List[Tuple[int, int]]:
+        """Lista de intervalos (inicio, quantidade) não marcados em [start, end)"""
+        return list(self.iter_missing(start, end))
+
+    def missing_count(self, start: int = 0, end: int = None) -> int:
+        """Número de segmentos não marcados em [start, end)"""
+        end = self.size if end is None else min(end, self.size)
+        if start == 0 and end == self.size:
+            return self.size - self.count
+        return sum(count for _, count in self.iter_missing(start, end))
+
+    def window(self, start: int, count: int) -> bytes:
+        """Bits dos segmentos [start, start + count) como bytes (bit i = segmento start + i)"""
+        if count <= 0:
+            return b''
+        num_bytes = (count + 7) // 8
+        first = start >> 3
+        shift = start & 7
+
+        # Um byte extra cobre o desalinhamento; a conversão para int faz o deslocamento em C
+        chunk = bytes(self.bits[first:first + num_bytes + 1]).ljust(num_bytes + 1, b'\0')
+        value = int.from_bytes(chunk, 'big') << shift
+        value = (value >> 8) & ((1 << (num_bytes * 8)) - 1)
+        value &= ~((1 << (num_bytes * 8 - count)) - 1)
+        return value.to_bytes(num_bytes, 'big')
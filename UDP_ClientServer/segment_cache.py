@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Cache de Segmentos Pré-montados para o Servidor UDP
+Cache LRU thread-safe com orçamento de memória, compartilhado entre transferências
+"""
+
+import os
+import socket
+import struct
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import compression
+import config
+import protocol
+from mapped_file import HAS_SENDMSG
+
+class CachedSegments:
+    """Segmentos pré-montados, com a mesma interface de envio de MappedSegments"""
+
+    def __init__(self, segments: List[bytes], header_size: int, codec: str = None):
+        self.segments = segments
+        self.header_size = header_size  # Cabeçalho de dados antes do payload em cada segmento
+        self.codec = codec  # Payloads comprimidos; o tamanho original fecha o cabeçalho
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def payload(self, segment_number: int):
+        """Dados originais do segmento, sem o cabeçalho"""
+        segment = self.segments[segment_number]
+        data = memoryview(segment)[self.header_size:]
+        if self.codec is None:
+            return data
+        original_length, = struct.unpack_from('!H', segment, self.header_size - 2)
+        return compression.decompress(self.codec, data, original_length)
+
+    def segment_length(self, segment_number: int) -> int:
+        """Tamanho do datagrama do segmento"""
+        return protocol.SEGMENT_PREFIX.size + len(self.segments[segment_number])
+
+    def send(self, sock: socket.socket, segment_number: int, address: Tuple[str, int], prefix: bytes) -> int:
+        """Envia o segmento pré-montado precedido do prefixo da transferência"""
+        if HAS_SENDMSG:
+            return sock.sendmsg([prefix, self.segments[segment_number]], [], 0, address)
+        return sock.sendto(prefix + self.segments[segment_number], address)
+
+    def close(self):
+        """Nada a liberar: os segmentos pertencem ao cache"""
+
+class SegmentCache:
+    """Cache LRU de segmentos (cabeçalho sem prefixo + payload) limitado em bytes"""
+
+    def __init__(self, max_bytes: int = config.SEGMENT_CACHE_MAX_BYTES,
+                 max_entry_bytes: int = config.SEGMENT_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.entries = OrderedDict()  # {chave: (segmentos, tamanho em bytes)}
+        self.current_bytes = 0
+        self.lock = threading.Lock()
+        self.build_locks = {}  # {chave: Lock} evita montar o mesmo arquivo em paralelo
+
+        # Contadores de desempenho
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(path: str, segment_size: int, *variant: Hashable) -> Tuple:
+        """Chave do cache: (caminho, mtime, tamanho, tamanho do segmento, ...)"""
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, segment_size) + variant
+
+    def get(self, key: Tuple) -> Optional[List[bytes]]:
+        """Retorna os segmentos em cache, atualizando a ordem LRU"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Tuple, segments: List[bytes]) -> bool:
+        """Armazena os segmentos de um arquivo; retorna False se excederem o orçamento"""
+        size = sum(len(segment) for segment in segments)
+        if size > self.max_entry_bytes:
+            return False
+
+        with self.lock:
+            # Versões antigas do mesmo arquivo nunca mais serão usadas
+            for stale_key in [k for k in self.entries if k[0] == key[0] and k != key]:
+                self._remove(stale_key)
+
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (segments, size)
+            self.current_bytes += size
+
+            # Remove as entradas menos usadas até caber no orçamento
+            while self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self.entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+        return True
+
+    def _remove(self, key: Tuple):
+        """Remove uma entrada (chamado com o lock adquirido)"""
+        _, size = self.entries.pop(key)
+        self.current_bytes -= size
+
+    def get_or_build(self, key: Tuple, size_hint: int, builder: Callable[[], List[bytes]]) -> Optional[List[bytes]]:
+        """Retorna os segmentos em cache ou os monta; None se o arquivo não cabe no cache"""
+        segments = self.get(key)
+        if segments is not None:
+            return segments
+
+        if size_hint > self.max_entry_bytes:
+            return None
+
+        with self.lock:
+            build_lock = self.build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            # Outra thread pode ter montado o arquivo enquanto aguardávamos
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry is not None:
+                return entry[0]
+
+            try:
+                segments = builder()
+                self.put(key, segments)
+                return segments
+            finally:
+                with self.lock:
+                    self.build_locks.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Resumo dos contadores do cache"""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Janela Deslizante Selective Repeat para o Servidor UDP
+Mantém a janela de envio, os temporizadores por segmento (RTO adaptativo) e o processamento de ACKs,
+alimentando o controle de congestionamento com RTT, taxa de entrega e perdas
+"""
+
+import time
+import threading
+from typing import List, Optional, Tuple
+
+from congestion import CongestionController
+from rtt import RTTEstimator
+
+class SelectiveRepeatSender:
+    """Estado do emissor selective repeat de uma transferência"""
+
+    MAX_BACKOFF = 4  # Expoente máximo do backoff dos temporizadores
+    DUP_THRESHOLD = 3  # Segmentos confirmados acima de um buraco para considerá-lo perdido
+
+    def __init__(self, num_segments: int, window: int, rto: float,
+                 ranges: Optional[List[Tuple[int, int]]] = None, controller: Optional[CongestionController] = None):
+        self.num_segments = num_segments
+        self.window = window  # Janela do receptor (span a partir de base)
+        self.rtt = RTTEstimator(initial_rto=rto)  # RTO adaptativo a partir das amostras dos ACKs
+        self.controller = controller  # Limita os segmentos em voo (janela de congestionamento)
+
+        # Intervalos (inicio, quantidade) pedidos; o cliente já tem os segmentos fora deles
+        if ranges is None:
+            self.acked = bytearray(num_segments)
+        else:
+            self.acked = bytearray(b'\x01') * num_segments
+            for first, count in ranges:
+                self.acked[first:first + count] = bytes(len(self.acked[first:first + count]))
+        self.base = self._next_unacked(0)  # Menor segmento ainda não confirmado
+        self.next_segment = self.base      # Próximo segmento nunca enviado
+        self.deadlines = {}    # {segmento: instante de expiração do temporizador}
+        self.retries = {}      # {segmento: número de retransmissões}
+        self.highest_acked = -1  # Maior segmento confirmado pelo bitmap
+        self.sent_at = {}      # {segmento: (instante do envio, entregues até então, instante da última entrega)}
+        self.lost = set()      # Segmentos em voo dados como perdidos, ainda não retransmitidos
+        self.delivered = 0     # Segmentos confirmados desde o início (para a taxa de entrega)
+        self.delivered_time = time.monotonic()
+        self._sample = None    # (estado no envio, retransmitido) do segmento mais recente confirmado pelo ACK
+        self.last_activity = time.monotonic()
+        self.condition = threading.Condition()
+
+    def _next_unacked(self, position: int) -> int:
+        """Primeiro segmento a partir de 'position' ainda não confirmado (num_segments se não houver)"""
+        position = self.acked.find(0, position)
+        return self.num_segments if position < 0 else position
+
+    @property
+    def done(self) -> bool:
+        """Indica se todos os segmentos foram confirmados"""
+        return self.base >= self.num_segments
+
+    def can_send(self) -> bool:
+        """Indica se a janela permite enviar um segmento novo"""
+        with self.condition:
+            if self.next_segment >= self.num_segments or self.next_segment >= self.base + self.window:
+                return False
+            return self.controller is None or self.in_flight < self.controller.window
+
+    @property
+    def in_flight(self) -> int:
+        """Segmentos enviados ainda não confirmados nem dados como perdidos"""
+        return len(self.deadlines) - len(self.lost)
+
+    def mark_sent(self, segment_number: int):
+        """Arma o temporizador do segmento recém-enviado"""
+        with self.condition:
+            if segment_number == self.next_segment:
+                self.next_segment = self._next_unacked(segment_number + 1)
+            else:
+                self.retries[segment_number] = self.retries.get(segment_number, 0) + 1
+            now = time.monotonic()
+            backoff = 2 ** min(self.retries.get(segment_number, 0), self.MAX_BACKOFF)
+            self.deadlines[segment_number] = now + self.rto * backoff
+            self.sent_at[segment_number] = (now, self.delivered, self.delivered_time)
+            self.lost.discard(segment_number)
+
+    def expired(self) -> List[int]:
+        """Segmentos em voo cujo temporizador expirou"""
+        now = time.monotonic()
+        with self.condition:
+            expired = sorted(seq for seq, deadline in self.deadlines.items() if deadline <= now)
+            timed_out = [seq for seq in expired if seq not in self.lost]
+            if timed_out and self.controller is not None:
+                self.controller.on_timeout(max(self.sent_at[seq][0] for seq in timed_out))
+            return expired
+
+    def next_timeout(self) -> float:
+        """Tempo até a expiração do próximo temporizador"""
+        with self.condition:
+            if not self.deadlines:
+                return self.rto
+            return max(0.0, min(self.deadlines.values()) - time.monotonic())
+
+    def _mark_acked(self, segment_number: int) -> bool:
+        """Marca um segmento como confirmado; retorna True se era novo"""
+        if self.acked[segment_number]:
+            return False
+        self.acked[segment_number] = 1
+        self.deadlines.pop(segment_number, None)
+        self.lost.discard(segment_number)
+
+        # A amostra vem do segmento enviado mais recentemente entre os confirmados (RTT só sem retransmissão)
+        sent = self.sent_at.pop(segment_number, None)
+        retransmitted = self.retries.pop(segment_number, None) is not None
+        if sent is not None and (self._sample is None or sent[0] > self._sample[0][0]):
+            self._sample = (sent, retransmitted)
+        return True
+
+    @property
+    def rto(self) -> float:
+        """Temporizador de retransmissão atual (sem o backoff de cada segmento)"""
+        return self.rtt.rto
+
+    def _report_ack(self, newly_acked: int):
+        """Atualiza o RTO e repassa ao controle de congestionamento os confirmados, o RTT e a taxa de entrega"""
+        now = time.monotonic()
+        self.delivered += newly_acked
+        self.delivered_time = now
+        if self._sample is None:
+            return
+
+        (sent_time, delivered, delivered_time), retransmitted = self._sample
+        rtt = None if retransmitted else now - sent_time
+        if rtt is not None:
+            self.rtt.sample(rtt)
+        if self.controller is None:
+            return
+        # Taxa de entrega: segmentos confirmados desde o envio dividido pelo tempo entre as confirmações
+        interval = now - delivered_time
+        delivery_rate = None
+        if interval > 0:
+            delivery_rate = (self.delivered - delivered) * self.controller.segment_size / interval
+        self.controller.on_ack(newly_acked, rtt, delivery_rate)
+
+    def on_ack(self, cumulative: int, bitmap: bytes) -> int:
+        """Processa um ACK cumulativo + bitmap; retorna quantos segmentos foram confirmados"""
+        with self.condition:
+            newly_acked = 0
+            self._sample = None
+            cumulative = min(cumulative, self.next_segment)
+
+            for segment_number in range(self.base, cumulative):
+                newly_acked += self._mark_acked(segment_number)
+
+            for index, byte in enumerate(bitmap):
+                if not byte:
+                    continue
+                for bit in range(8):
+                    if byte & (0x80 >> bit):
+                        segment_number = cumulative + 1 + index * 8 + bit
+                        if segment_number < self.next_segment:
+                            newly_acked += self._mark_acked(segment_number)
+                            self.highest_acked = max(self.highest_acked, segment_number)
+
+            # Retransmissão rápida: buracos abaixo de segmentos já confirmados
+            # são dados como perdidos sem esperar o temporizador (apenas na 1ª transmissão)
+            threshold = self.highest_acked - self.DUP_THRESHOLD
+            now = time.monotonic()
+            for segment_number in self.deadlines:
+                if (segment_number <= threshold and segment_number not in self.retries
+                        and segment_number not in self.lost):
+                    self.deadlines[segment_number] = now
+                    self.lost.add(segment_number)
+                    if self.controller is not None:
+                        self.controller.on_loss(self.sent_at[segment_number][0])
+
+            if newly_acked:
+                self._report_ack(newly_acked)
+            self.base = self._next_unacked(self.base)
+
+            self.last_activity = time.monotonic()
+            self.condition.notify_all()
+            return newly_acked
+
+    def wait(self, timeout: float):
+        """Aguarda um ACK ou a expiração de um temporizador"""
+        with self.condition:
+            if not self.done:
+                self.condition.wait(timeout)
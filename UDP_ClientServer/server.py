@@ -5,93 +5,212 @@ Implementa protocolo customizado sobre UDP com segmentação, checksum e retrans
 """
 
 import socket
-import struct
-import hashlib
 import os
 import time
 import threading
 import uuid
-from typing import Dict, List, Tuple
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
 import logging
 
+import checksums
+import compression
+import config
+import fec
+import multicast
+import protocol
+from checksum_index import ChecksumIndex, ChecksumIndexStore
+from congestion import CONTROLLERS, CongestionController, create_controller
+from pacing import Pacer
+from mapped_file import CompressedSegments, MappedSegments
+from segment_cache import CachedSegments, SegmentCache
+from selective_repeat import SelectiveRepeatSender
+from sessions import SessionLimitError, SessionTable, TransferSession
+from worker_pool import BoundedExecutor
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class UDPServer:
-    def __init__(self, host: str = '0.0.0.0', port: int = 8888, buffer_size: int = 1024):
+    def __init__(self, host: str = '0.0.0.0', port: int = 8888, buffer_size: int = 1024,
+                 rate: float = None, rate_unit: str = 'bytes', burst: float = None,
+                 cache_size: int = config.SEGMENT_CACHE_MAX_BYTES, index_dir: str = config.CHECKSUM_INDEX_DIR,
+                 max_segment_size: int = config.MAX_SEGMENT_SIZE, transfer_workers: int = config.TRANSFER_WORKERS,
+                 control_workers: int = config.CONTROL_WORKERS, queue_policy: str = config.WORKER_QUEUE_POLICY,
+                 reuse_port: bool = False, max_sessions: int = config.MAX_SESSIONS,
+                 congestion: str = config.CONGESTION_CONTROL, multicast_group: Optional[Tuple[str, int]] = None,
+                 multicast_interface: Optional[str] = config.MULTICAST_INTERFACE):
         self.host = host
         self.port = port
         self.buffer_size = buffer_size
+        self.reuse_port = reuse_port  # Outros processos escutam a mesma porta (--workers)
         self.socket = None
         self.running = False
-        self.file_cache = {}  # Cache para arquivos já lidos
-        self.segment_cache = {}  # Cache para segmentos de arquivos
+        self.segment_cache = SegmentCache(cache_size)  # Segmentos pré-montados, compartilhados entre clientes
+        self.checksum_index = ChecksumIndexStore(index_dir)  # Digests pré-calculados por arquivo
         
         # Constantes do protocolo
-        self.MAX_PAYLOAD_SIZE = 1024  # Tamanho máximo do payload por segmento
-        self.HEADER_SIZE = 24  # Tamanho do cabeçalho em bytes (4+16+2+2 = 24)
+        self.MAX_PAYLOAD_SIZE = config.MAX_PAYLOAD_SIZE  # Payload padrão quando o cliente não negocia
+        self.max_segment_size = max_segment_size  # Maior payload aceito na negociação
+        self.HEADER_SIZE = 27  # Tamanho do cabeçalho com MD5 (1+4+4+16+2 = 27); varia com o checksum negociado
+        
+        # Configuração de pacing (None usa config.py, 0 desativa)
+        self.rate = rate
+        self.rate_unit = rate_unit
+        self.burst = burst
+        self.congestion = congestion  # Controlador de congestionamento de cada transferência
+        
+        # Distribuição multicast: arquivos pedidos com multicast=1 são enviados uma vez ao grupo
+        self.multicast_group = multicast_group
+        self.multicast_interface = multicast_interface
+        self.channels = multicast.ChannelTable()
+        
+        # Transferências em andamento, indexadas pelo transfer_id informado no FILE_INFO e
+        # limitadas em número; o janitor descarta as ociosas periodicamente
+        self.sessions = SessionTable(max_sessions=max_sessions,
+                                     max_per_host=min(config.MAX_SESSIONS_PER_HOST, max_sessions))
+        self.janitor_stop = threading.Event()
+        
+        # Envios de arquivos inteiros e requisições curtas usam pools separados, para que
+        # retransmissões nunca esperem atrás de transferências longas. GETs nunca bloqueiam a leitura:
+        # a mesma thread lê os ACKs e READYs de todas as transferências em andamento
+        self.transfer_workers = transfer_workers
+        self.control_workers = control_workers
+        self.create_pools(queue_policy)
+        
+    def create_pools(self, queue_policy: str):
+        """Cria os pools de workers de transferências e de requisições curtas"""
+        self.transfer_pool = BoundedExecutor('transfer', self.transfer_workers, config.TRANSFER_QUEUE_DEPTH, 'drop')
+        self.control_pool = BoundedExecutor('control', self.control_workers, config.CONTROL_QUEUE_DEPTH, queue_policy)
         
     def start(self):
         """Inicia o servidor UDP"""
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.socket.bind((self.host, self.port))
+            self.socket = self.create_socket()
             self.running = True
             
             logger.info(f"Servidor UDP iniciado em {self.host}:{self.port}")
-            logger.info(f"Tamanho máximo do payload: {self.MAX_PAYLOAD_SIZE} bytes")
+            logger.info(f"Tamanho do payload: {self.MAX_PAYLOAD_SIZE} bytes (negociável até {self.max_segment_size})")
             logger.info(f"Tamanho do cabeçalho: {self.HEADER_SIZE} bytes")
+            logger.info(f"Checksums disponíveis: {', '.join(checksums.available())}")
+            logger.info(f"Pacing: {self.create_pacer().describe()}")
+            logger.info(f"Controle de congestionamento: {self.congestion}")
+            logger.info(f"Workers: {self.transfer_workers} de transferência, {self.control_workers} de controle")
+            logger.info(f"Sessões: até {self.sessions.max_sessions} simultâneas, "
+                        f"{self.sessions.max_per_host} por cliente")
+            if self.multicast_group is not None:
+                logger.info(f"Multicast: grupo {multicast.format_group(self.multicast_group)}")
             
+            threading.Thread(target=self.run_janitor, name='janitor', daemon=True).start()
             self.listen()
             
         except Exception as e:
             logger.error(f"Erro ao iniciar servidor: {e}")
             self.stop()
     
+    def create_socket(self) -> socket.socket:
+        """Cria o socket do servidor; com reuse_port o kernel divide os clientes entre os processos"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.host, self.port))
+        if self.multicast_group is not None:
+            # Sem interface configurada, o grupo sai pela do host em que o servidor escuta
+            interface = self.multicast_interface
+            if interface is None and self.host not in ('', '0.0.0.0'):
+                interface = socket.gethostbyname(self.host)
+            multicast.configure_sender(sock, interface)
+        return sock
+    
     def stop(self):
         """Para o servidor"""
         self.running = False
+        self.janitor_stop.set()
         if self.socket:
             self.socket.close()
+        self.transfer_pool.shutdown()
+        self.control_pool.shutdown()
+        logger.info(f"Cache de segmentos: {self.segment_cache.stats()}")
+        logger.info(f"Pools de workers: transferência {self.transfer_pool.stats()}, controle {self.control_pool.stats()}")
         logger.info("Servidor parado")
     
+    def run_janitor(self):
+        """Descarta periodicamente transferências ociosas até o servidor parar"""
+        while not self.janitor_stop.wait(config.SESSION_JANITOR_INTERVAL):
+            self.purge_sessions()
+    
+    def purge_sessions(self):
+        """Remove transferências sem atividade da tabela de sessões"""
+        purged = self.sessions.purge_idle()
+        if purged:
+            logger.info(f"{purged} transferência(s) ociosa(s) descartada(s), {len(self.sessions)} ativa(s)")
+    
     def listen(self):
         """Loop principal de escuta do servidor"""
         while self.running:
             try:
                 data, client_address = self.socket.recvfrom(4096)
-                logger.info(f"Requisição recebida de {client_address} na porta {self.port}")
+                if not protocol.is_binary_message(data):
+                    logger.info(f"Requisição recebida de {client_address} na porta {self.port}")
                 
-                # Processa requisição em thread separada
-                thread = threading.Thread(
-                    target=self.handle_request,
-                    args=(data, client_address)
-                )
-                thread.daemon = True
-                thread.start()
+                # Processa requisição em um dos pools de workers
+                self.dispatch(data, client_address)
                 
             except Exception as e:
                 if self.running:
                     logger.error(f"Erro ao receber dados: {e}")
     
+    def dispatch(self, data: bytes, client_address: Tuple[str, int]):
+        """Encaminha um datagrama: ACKs na hora, GETs ao pool de transferências, o resto ao de controle"""
+        # ACKs e READYs só acordam um emissor: mais barato tratar aqui do que enfileirar
+        if (protocol.is_binary_message(data) and data[0] == protocol.MSG_ACK) or data.startswith(b'READY '):
+            self.handle_request(data, client_address)
+            return
+        
+        if data.startswith(b'GET '):
+            if not self.transfer_pool.submit(self.handle_request, data, client_address):
+                self.send_error(client_address, "Servidor ocupado, tente novamente mais tarde")
+            return
+        
+        # NACKs descartados são repetidos pelo cliente na próxima rodada
+        if not self.control_pool.submit(self.handle_request, data, client_address):
+            logger.debug(f"Fila de controle cheia, requisição de {client_address} descartada")
+    
     def handle_request(self, data: bytes, client_address: Tuple[str, int]):
         """Processa uma requisição do cliente"""
         try:
+            # Mensagens binárias de controle
+            if protocol.is_binary_message(data):
+                if data[0] == protocol.MSG_ACK:
+                    self.handle_ack(data, client_address)
+                elif data[0] == protocol.MSG_NACK:
+                    self.handle_nack(data, client_address)
+                elif data[0] == protocol.MSG_DELTA_SUMS:
+                    self.handle_delta_sums(data, client_address)
+                return
+            
             # Decodifica a requisição
             request = data.decode('utf-8').strip()
             logger.info(f"Requisição de {client_address} na porta {self.port}: {request}")
             
             if request.startswith('GET '):
-                filename = request[4:]  # Remove 'GET ' do início
-                self.handle_file_request(filename, client_address)
+                # Formato: GET filename [bytes=I-F | segments=I-F] [chave=valor ...]
+                filename, options = protocol.parse_get_request(request)
+                self.handle_file_request(filename, client_address, options)
+            elif request.startswith('READY '):
+                # Formato: READY transfer=ID [window=N] segment_size=N start=N end=N [ranges=I:Q,...]
+                self.handle_ready(request, client_address)
+            elif request.startswith('PROBE '):
+                # Formato: PROBE tamanho_do_datagrama
+                self.handle_probe(int(request.split(' ')[1]), client_address)
             elif request.startswith('RETRANSMIT '):
-                # Formato: RETRANSMIT filename segment_number
-                parts = request.split(' ')
-                if len(parts) >= 3:
-                    filename = parts[1]
-                    segment_number = int(parts[2])
-                    self.handle_retransmit_request(filename, segment_number, client_address)
+                retransmit = self.parse_retransmit(request, client_address)
+                if retransmit is not None:
+                    self.handle_retransmit_request(*retransmit)
+            elif request.startswith('FEC '):
+                # Formato: FEC transfer=ID parity=M
+                self.handle_fec(request, client_address)
             else:
                 self.send_error(client_address, "Formato de requisição inválido")
                 
@@ -99,112 +218,595 @@ class UDPServer:
             logger.error(f"Erro ao processar requisição: {e}")
             self.send_error(client_address, f"Erro interno: {str(e)}")
     
-    def handle_file_request(self, filename: str, client_address: Tuple[str, int]):
+    def handle_file_request(self, filename: str, client_address: Tuple[str, int], options: Dict[str, str] = None):
         """Processa requisição de arquivo"""
         try:
-            # Verifica se arquivo existe
-            if not os.path.exists(filename):
-                self.send_error(client_address, f"Arquivo não encontrado: {filename}")
+            transfer = self.start_transfer(filename, client_address, options or {})
+            if transfer is None:
                 return
+            session, num_segments, negotiated = transfer
             
-            # Obtém informações do arquivo
-            file_size = os.path.getsize(filename)
-            logger.info(f"Arquivo solicitado na porta {self.port}: {filename} ({file_size} bytes)")
-            
-            # Calcula número de segmentos
-            num_segments = (file_size + self.MAX_PAYLOAD_SIZE - 1) // self.MAX_PAYLOAD_SIZE
-            
-            # Envia informações do arquivo
-            file_info = f"FILE_INFO {filename} {file_size} {num_segments}"
-            self.socket.sendto(file_info.encode('utf-8'), client_address)
+            # Aguarda o READY do cliente, repetindo o FILE_INFO se ele ou o READY se perderem
+            if not self.await_ready(session):
+                return
+            accepted = self.apply_ready(session, negotiated, num_segments)
+            if accepted is None:
+                return
+            window, ranges = accepted
             
-            # Aguarda confirmação
-            time.sleep(0.1)
+            # Receptor multicast: os segmentos chegam pelo grupo e esta transferência só atende NACKs
+            if session.channel is not None:
+                self.serve_channel(session)
+                return
             
-            # Envia segmentos do arquivo
-            self.send_file_segments(filename, client_address)
+            # Envia segmentos do arquivo; a sessão não expira durante o envio
+            session.sending = True
+            try:
+                if negotiated.get('mode') == protocol.MODE_SR:
+                    self.send_file_segments_sr(session, num_segments, window, ranges)
+                else:
+                    self.send_file_segments(session, ranges)
+            finally:
+                # NACKs do modo stream chegam após o fim: a transferência os aguarda por SESSION_LINGER
+                session.sending = False
+                self.sessions.finish(session.transfer_id)
             
         except Exception as e:
             logger.error(f"Erro ao processar arquivo {filename}: {e}")
             self.send_error(client_address, f"Erro ao processar arquivo: {str(e)}")
     
-    def send_file_segments(self, filename: str, client_address: Tuple[str, int]):
-        """Envia todos os segmentos do arquivo"""
+    def start_transfer(self, filename: str, client_address: Tuple[str, int],
+                       options: Dict[str, str]) -> Optional[Tuple[TransferSession, int, Dict]]:
+        """Negocia e registra uma transferência e envia o FILE_INFO; None se o arquivo não existir"""
+        # Verifica se arquivo existe
+        if not os.path.exists(filename):
+            self.send_error(client_address, f"Arquivo não encontrado: {filename}")
+            return None
+        
+        # GET repetido pelo cliente durante o handshake: a transferência pendente já repete o FILE_INFO
+        pending = self.sessions.find(client_address, filename)
+        if pending is not None and not pending.ready.is_set():
+            logger.debug(f"GET repetido de {client_address} para {filename} ignorado")
+            return None
+        
+        # Obtém informações do arquivo
+        file_size = os.path.getsize(filename)
+        logger.info(f"Arquivo solicitado na porta {self.port}: {filename} ({file_size} bytes)")
+        
+        logger.debug(f"Cache de segmentos: {self.segment_cache.stats()}")
+        
+        # Negocia o modo de transferência, o checksum e o tamanho do segmento
+        negotiated = self.negotiate_options(options)
+        algorithm = negotiated['checksum']
+        segment_size = negotiated['segment_size']
+        
+        # Calcula número de segmentos
+        num_segments = (file_size + segment_size - 1) // segment_size
+        
+        # Leitura parcial: trecho em bytes ou segmentos, servido com a mesma segmentação e checksums
+        try:
+            byte_range = self.negotiate_range(options, file_size, segment_size)
+        except ValueError as e:
+            self.send_error(client_address, str(e))
+            return None
+        if byte_range is not None:
+            negotiated['offset'], negotiated['length'] = byte_range
+        
+        # Registra a transferência; segmentos, ACKs e NACKs carregam apenas o seu ID
+        try:
+            session = self.sessions.create(filename, client_address, algorithm, segment_size)
+        except SessionLimitError as e:
+            logger.warning(f"Transferência de {filename} recusada para {client_address}: {e}")
+            self.send_error(client_address, str(e))
+            return None
+        negotiated['transfer'] = session.transfer_id
+        session.first_segment, session.end_segment = 0, num_segments
+        if byte_range is not None:
+            session.first_segment, session.end_segment = protocol.byte_range_segments(*byte_range, segment_size)
+        if 'fec' in negotiated:
+            # Blocos FEC alinhados ao trecho concedido, que o cliente também conhece
+            session.fec_data, session.fec_parity = fec.parse_code(negotiated['fec'])
+            session.fec_base, session.fec_end = session.first_segment, session.end_segment
+        session.compression = negotiated.get('compression')
+        
+        # Multicast: o arquivo inteiro vai uma única vez ao grupo, compartilhado com os outros receptores
+        if options.get('multicast') and byte_range is None and negotiated.get('mode') != protocol.MODE_SR:
+            session.channel = self.open_channel(session)
+            if session.channel is not None:
+                negotiated['group'] = multicast.format_group(self.multicast_group)
+                negotiated['channel'] = session.channel.session.transfer_id
+        
+        # Digest do arquivo inteiro para verificação fim a fim (calculado uma única vez)
+        index = self.checksum_index.get(filename, segment_size, algorithm)
+        if index.file_digest:
+            negotiated['digest'] = index.file_digest.hex()
+            # Sincronização delta compara os digests por segmento do índice com os da cópia do cliente
+            if options.get('delta'):
+                negotiated['delta'] = 1
+        
+        # Envia informações do arquivo
+        file_info = f"FILE_INFO {filename} {file_size} {num_segments} {protocol.format_options(negotiated)}"
+        session.file_info = file_info.encode('utf-8')
+        self.send_datagram(session.file_info, client_address)
+        return session, num_segments, negotiated
+    
+    def open_channel(self, session: TransferSession) -> Optional[multicast.Channel]:
+        """Canal multicast em andamento com as opções da transferência, ou um novo; None sem multicast"""
+        if self.multicast_group is None:
+            return None
+        key = (session.filename, session.segment_size, session.algorithm, session.compression,
+               session.fec_data, session.fec_parity)
+        channel = self.channels.find(key)
+        if channel is not None:
+            if self.sessions.get(channel.session.transfer_id) is not None:
+                return channel
+            # Nenhum receptor confirmou a tempo e a transferência do grupo expirou
+            self.channels.close(channel)
+        
         try:
-            with open(filename, 'rb') as file:
-                segment_number = 0
-                
-                while True:
-                    # Lê dados do arquivo
-                    data = file.read(self.MAX_PAYLOAD_SIZE)
-                    if not data:
-                        break
-                    
-                    # Cria segmento com cabeçalho
-                    segment = self.create_segment(segment_number, data, filename)
-                    
-                    # Envia segmento
-                    self.socket.sendto(segment, client_address)
+            group = self.sessions.create(session.filename, self.multicast_group, session.algorithm,
+                                         session.segment_size)
+        except SessionLimitError as e:
+            logger.warning(f"Canal multicast de {session.filename} não aberto: {e}")
+            return None
+        group.compression = session.compression
+        group.first_segment, group.end_segment = session.first_segment, session.end_segment
+        group.fec_data, group.fec_parity = session.fec_data, session.fec_parity
+        group.fec_base, group.fec_end = session.fec_base, session.fec_end
+        channel = self.channels.add(multicast.Channel(key, group))
+        if channel.session is not group:
+            # Outro GET abriu o mesmo canal ao mesmo tempo
+            self.sessions.remove(group.transfer_id)
+        return channel
+    
+    def serve_channel(self, session: TransferSession):
+        """Inscreve o receptor no canal; o primeiro a confirmar envia o arquivo ao grupo"""
+        channel = session.channel
+        if not self.channels.join(channel, session):
+            if channel.finished:
+                # Canal encerrado antes do READY: os segmentos virão só por NACK
+                self.sessions.finish(session.transfer_id)
+            return
+        # Outros receptores ainda podem estar entrando no grupo
+        time.sleep(config.MULTICAST_JOIN_WINDOW)
+        channel.session.sending = True
+        try:
+            self.send_file_segments(channel.session)
+        finally:
+            self.close_channel(channel)
+    
+    def close_channel(self, channel: multicast.Channel):
+        """Encerra um canal e descarta a transferência do grupo"""
+        receivers = self.channels.close(channel)
+        for receiver in receivers:
+            self.sessions.finish(receiver.transfer_id)
+        self.sessions.remove(channel.session.transfer_id)
+        logger.info(f"Canal multicast {channel.session.transfer_id} de {channel.session.filename} encerrado: "
+                    f"{len(receivers)} receptor(es) atendido(s) com um único envio")
+    
+    def await_ready(self, session: TransferSession) -> bool:
+        """Aguarda o READY repetindo o FILE_INFO com backoff; False se o cliente não responder"""
+        timeout = config.HANDSHAKE_TIMEOUT
+        attempt = 0
+        while attempt < config.HANDSHAKE_ATTEMPTS:
+            if session.ready.wait(timeout):
+                return True
+            # Cliente ainda enviando DELTA_SUMS: o FILE_INFO chegou e o READY virá depois da comparação
+            if time.monotonic() - session.last_delta < timeout:
+                continue
+            attempt += 1
+            if attempt < config.HANDSHAKE_ATTEMPTS:
+                self.send_datagram(session.file_info, session.client_address)
+                timeout = min(timeout * 2, config.HANDSHAKE_MAX_BACKOFF)
+        
+        self.abandon_handshake(session)
+        return False
+    
+    def abandon_handshake(self, session: TransferSession):
+        """Descarta uma transferência cujo FILE_INFO nunca foi confirmado"""
+        logger.warning(f"{session.client_address} não confirmou o FILE_INFO de {session.filename}, transferência abandonada")
+        self.sessions.remove(session.transfer_id)
+    
+    def handle_delta_sums(self, data: bytes, client_address: Tuple[str, int]):
+        """Compara os digests da cópia local do cliente com os do índice e responde com um DELTA_MATCH"""
+        transfer_id, first_segment, count, digests = protocol.unpack_delta(data)
+        session = self.sessions.get(transfer_id, client_address)
+        if session is None:
+            self.send_error(client_address, f"Transferência {transfer_id} desconhecida")
+            return
+        session.last_delta = time.monotonic()
+        
+        index = self.checksum_index.get(session.filename, session.segment_size, session.algorithm)
+        digest_size = index.digest_size
+        if not digest_size or len(digests) != count * digest_size:
+            self.send_error(client_address, "DELTA_SUMS inválido")
+            return
+        
+        # Mesmo digest no mesmo segmento: o cliente já tem esses bytes e o segmento não precisa ser enviado
+        bitmap = bytearray((count + 7) // 8)
+        for offset in range(min(count, index.num_segments - first_segment)):
+            segment_number = first_segment + offset
+            if index.digest(segment_number) == digests[offset * digest_size:(offset + 1) * digest_size]:
+                bitmap[offset >> 3] |= 0x80 >> (offset & 7)
+        self.send_datagram(protocol.pack_delta_match(transfer_id, first_segment, count, bytes(bitmap)),
+                           client_address)
+    
+    def handle_ready(self, request: str, client_address: Tuple[str, int]) -> Optional[TransferSession]:
+        """Registra o READY de uma transferência pendente; READYs repetidos são ignorados"""
+        _, options = protocol.parse_options(request.split(' '))
+        session = self.sessions.get(int(options.get('transfer', 0)), client_address)
+        if session is None or session.ready.is_set():
+            return None
+        session.ready_options = options
+        session.ready.set()
+        return session
+    
+    def apply_ready(self, session: TransferSession, negotiated: Dict,
+                    num_segments: int) -> Optional[Tuple[int, List[Tuple[int, int]]]]:
+        """Valida o READY e retorna (janela, intervalos a enviar); None se contradizer o FILE_INFO"""
+        ready = session.ready_options
+        if int(ready.get('segment_size', session.segment_size)) != session.segment_size:
+            self.send_error(session.client_address, "Tamanho de segmento do READY difere do FILE_INFO")
+            self.sessions.remove(session.transfer_id)
+            return None
+        
+        # O cliente pode reduzir a janela oferecida, nunca aumentá-la
+        window = int(negotiated.get('window', config.SR_WINDOW_SIZE))
+        window = max(1, min(window, int(ready.get('window', window))))
+        # Intervalo [start, end) de segmentos: clientes com vários fluxos pedem uma parte do arquivo a cada um,
+        # sempre dentro do trecho concedido no FILE_INFO
+        lower, upper = 0, num_segments
+        if 'offset' in negotiated:
+            lower, upper = protocol.byte_range_segments(negotiated['offset'], negotiated['length'],
+                                                        session.segment_size)
+        end = max(lower, min(int(ready.get('end', upper)), upper))
+        start = max(lower, min(int(ready.get('start', lower)), end))
+        if 'ranges' not in ready:
+            return window, [(start, end - start)] if end > start else []
+        
+        # Downloads retomados pedem só os intervalos (inicio, quantidade) que faltam no journal do cliente
+        ranges = []
+        for first, count in protocol.parse_ranges(ready['ranges']):
+            first, last = max(first, start), min(first + count, end)
+            if last > first:
+                ranges.append((first, last - first))
+        return window, protocol.coalesce_ranges(ranges, config.RESUME_MAX_RANGES)
+    
+    def negotiate_options(self, options: Dict[str, str]) -> Dict[str, str]:
+        """Define as opções da transferência a partir das solicitadas pelo cliente"""
+        negotiated = {'checksum': checksums.negotiate(options.get('checksum'))}
+        
+        try:
+            segment_size = int(options.get('segment_size', self.MAX_PAYLOAD_SIZE))
+        except ValueError:
+            segment_size = self.MAX_PAYLOAD_SIZE
+        negotiated['segment_size'] = max(config.MIN_SEGMENT_SIZE, min(segment_size, self.max_segment_size))
+        
+        if options.get('mode') == protocol.MODE_SR:
+            try:
+                window = int(options.get('window', config.SR_WINDOW_SIZE))
+            except ValueError:
+                window = config.SR_WINDOW_SIZE
+            negotiated['mode'] = protocol.MODE_SR
+            negotiated['window'] = max(1, min(window, config.SR_MAX_WINDOW))
+        
+        # Compressão por segmento; codecs desconhecidos ou desativados seguem sem compressão
+        codec = compression.negotiate(options.get('compression'))
+        if codec is not None:
+            negotiated['compression'] = codec
+        
+        # FEC: K segmentos de dados e M paridades por bloco, limitados pelo servidor
+        if 'fec' in options:
+            try:
+                k, m = fec.parse_code(options['fec'])
+            except ValueError:
+                pass
+            else:
+                k = min(k, config.FEC_MAX_DATA)
+                negotiated['fec'] = f"{k}:{min(m, config.FEC_MAX_PARITY, fec.MAX_BLOCK - k)}"
+        
+        return negotiated
+    
+    def negotiate_range(self, options: Dict[str, str], file_size: int,
+                        segment_size: int) -> Optional[Tuple[int, int]]:
+        """Trecho (offset, length) em bytes pedido com bytes= ou segments=; None para o arquivo inteiro"""
+        if 'bytes' in options:
+            start, end = protocol.parse_span(options['bytes'], file_size)
+        elif 'segments' in options:
+            num_segments = (file_size + segment_size - 1) // segment_size
+            first, last = protocol.parse_span(options['segments'], num_segments)
+            start, end = min(first * segment_size, file_size), min(last * segment_size, file_size)
+        else:
+            return None
+        return start, end - start
+    
+    def create_pacer(self) -> Pacer:
+        """Cria o controle de taxa usado por uma transferência"""
+        return Pacer.from_settings(self.rate, self.rate_unit, self.burst)
+    
+    def create_controller(self, session: TransferSession) -> CongestionController:
+        """Cria o controle de congestionamento de uma transferência"""
+        return create_controller(self.congestion, session.segment_size)
+    
+    def get_cached_segments(self, filename: str, index: ChecksumIndex, codec: str = None) -> Optional[List[bytes]]:
+        """Segmentos pré-montados (e comprimidos com o codec) do arquivo, ou None se ele exceder o orçamento do cache"""
+        size_hint = index.file_size + index.num_segments * protocol.segment_header(index.digest_size, bool(codec)).size
+        
+        # Cada codec tem sua entrada: os segmentos são comprimidos uma vez e servidos a todos os clientes
+        key = SegmentCache.make_key(filename, index.segment_size, index.algorithm, codec)
+        return self.segment_cache.get_or_build(key, size_hint, lambda: self.build_segments(filename, index, codec))
+    
+    def build_segments(self, filename: str, index: ChecksumIndex, codec: str = None) -> List[bytes]:
+        """Lê o arquivo inteiro e monta todos os seus segmentos com os digests do índice"""
+        segments = []
+        with open(filename, 'rb') as file:
+            while True:
+                data = file.read(index.segment_size)
+                if not data:
+                    break
+                segment_number = len(segments)
+                segments.append(self.create_segment(segment_number, data, index.algorithm,
+                                                    index.digest(segment_number), codec))
+        return segments
+    
+    def load_segments(self, filename: str, algorithm: str, segment_size: int, codec: str = None):
+        """Segmentos do arquivo: do cache ou, se não couberem, de um mmap zero-copy (fechar após o uso)"""
+        index = self.checksum_index.get(filename, segment_size, algorithm)
+        cached = self.get_cached_segments(filename, index, codec)
+        if cached is not None:
+            return CachedSegments(cached, protocol.segment_header(index.digest_size, bool(codec)).size, codec)
+        mapped = MappedSegments(filename, segment_size, index)
+        # Fora do cache, a compressão acontece a cada envio
+        return CompressedSegments(mapped, codec) if codec else mapped
+    
+    @contextmanager
+    def open_segments(self, filename: str, algorithm: str, segment_size: int, codec: str = None):
+        """Fornece os segmentos do arquivo, liberando-os ao final"""
+        segments = self.load_segments(filename, algorithm, segment_size, codec)
+        try:
+            yield segments
+        finally:
+            segments.close()
+    
+    def send_datagram(self, data: bytes, client_address: Tuple[str, int]):
+        """Envia uma mensagem de controle ao cliente"""
+        self.socket.sendto(data, client_address)
+    
+    def handle_probe(self, size: int, client_address: Tuple[str, int]):
+        """Responde a uma sondagem com um datagrama do tamanho pedido"""
+        if not protocol.PROBE_HEADER.size <= size <= protocol.MAX_DATAGRAM_SIZE:
+            self.send_error(client_address, f"Tamanho de sondagem inválido: {size}")
+            return
+        self.send_datagram(protocol.pack_probe(size), client_address)
+    
+    def send_end_transmission(self, session: TransferSession):
+        """Envia o sinal de fim de transmissão de uma transferência"""
+        end_message = f"END_TRANSMISSION {session.filename} transfer={session.transfer_id}"
+        self.send_datagram(end_message.encode('utf-8'), session.client_address)
+    
+    def send_file_segments(self, session: TransferSession, ranges: List[Tuple[int, int]] = None):
+        """Envia os intervalos (inicio, quantidade) de segmentos pedidos (o arquivo inteiro se None)"""
+        filename, client_address = session.filename, session.client_address
+        try:
+            # Sem controle de congestionamento: sem ACKs durante o envio, o modo stream não tem retorno
+            # sobre perdas até o fim da transmissão, e só o pacing configurado limita a taxa
+            pacer = self.create_pacer()
+            
+            with self.open_segments(filename, session.algorithm, session.segment_size, session.compression) as segments:
+                ranges = ranges if ranges is not None else [(0, len(segments))]
+                blocks = self.create_block_tracker(session, ranges)
+                for segment_number in protocol.iter_ranges(ranges):
+                    # Envia segmento respeitando a taxa alvo e a do controle de congestionamento
+                    self.send_segment_at(segments, segment_number, session, pacer)
                     logger.debug(f"Segmento {segment_number} enviado para {client_address} na porta {self.port}")
-                    
-                    segment_number += 1
-                    time.sleep(0.01)  # Pequena pausa para não sobrecarregar
+                    if blocks is not None:
+                        self.send_parity(segments, blocks.sent(segment_number), session, pacer)
                 
                 # Envia sinal de fim de transmissão
-                end_message = f"END_TRANSMISSION {filename}"
-                self.socket.sendto(end_message.encode('utf-8'), client_address)
+                self.send_end_transmission(session)
                 logger.info(f"Transmissão do arquivo {filename} concluída na porta {self.port}")
                 
         except Exception as e:
             logger.error(f"Erro ao enviar segmentos do arquivo {filename}: {e}")
     
-    def create_segment(self, segment_number: int, data: bytes, filename: str) -> bytes:
-        """Cria um segmento com cabeçalho customizado"""
-        # Cabeçalho: [segment_number(4)][checksum(16)][filename_length(2)][data_length(2)]
-        filename_bytes = filename.encode('utf-8')
-        filename_length = len(filename_bytes)
+    def send_file_segments_sr(self, session: TransferSession, num_segments: int, window: int,
+                              ranges: List[Tuple[int, int]] = None):
+        """Envia os intervalos pedidos (o arquivo inteiro se None) com janela deslizante e retransmissão seletiva"""
+        filename, client_address = session.filename, session.client_address
+        session.congestion = self.create_controller(session)
+        sender = SelectiveRepeatSender(num_segments, window, config.SR_RETRANSMIT_TIMEOUT, ranges, session.congestion)
+        session.sender = sender
+        blocks = self.create_block_tracker(session, ranges if ranges is not None else [(0, num_segments)])
+        
+        try:
+            pacer = self.create_pacer()
+            retransmissions = 0
+            
+            with self.open_segments(filename, session.algorithm, session.segment_size, session.compression) as segments:
+                while not sender.done:
+                    if time.monotonic() - sender.last_activity > config.SR_IDLE_TIMEOUT:
+                        logger.warning(f"Sem ACKs de {client_address}, abandonando transferência de {filename}")
+                        return
+                    
+                    # Retransmite segmentos com temporizador expirado
+                    for segment_number in sender.expired():
+                        self.send_segment_at(segments, segment_number, session, pacer)
+                        sender.mark_sent(segment_number)
+                        retransmissions += 1
+                    
+                    # Envia um segmento novo se a janela permitir
+                    if sender.can_send():
+                        segment_number = sender.next_segment
+                        self.send_segment_at(segments, segment_number, session, pacer)
+                        sender.mark_sent(segment_number)
+                        if blocks is not None:
+                            # Paridades logo após o bloco: perdas reconstruídas antes do RTO não são retransmitidas
+                            self.send_parity(segments, blocks.sent(segment_number), session, pacer)
+                        continue
+                    
+                    # Janela cheia: aguarda ACK ou expiração de temporizador
+                    sender.wait(sender.next_timeout())
+            
+            # Envia sinal de fim de transmissão
+            self.send_end_transmission(session)
+            logger.info(f"Transmissão selective repeat de {filename} concluída ({retransmissions} retransmissões, "
+                        f"{session.congestion.describe()})")
+            
+        except Exception as e:
+            logger.error(f"Erro ao enviar segmentos do arquivo {filename}: {e}")
+        finally:
+            session.sender = None
+    
+    def send_segment_at(self, segments, segment_number: int, session: TransferSession, pacer: Pacer) -> bool:
+        """Envia um segmento específico; retorna False se o número for inválido"""
+        if not 0 <= segment_number < len(segments):
+            return False
+        
+        size = segments.segment_length(segment_number)
+        pacer.wait(size)
+        if session.congestion is not None:
+            session.congestion.pacer.wait(size)
+        segments.send(self.socket, segment_number, session.client_address, session.prefix)
+        return True
+    
+    def create_block_tracker(self, session: TransferSession, ranges: List[Tuple[int, int]]) -> Optional[fec.BlockTracker]:
+        """Acompanha os blocos FEC enviados nos intervalos pedidos; None se a transferência não usa FEC"""
+        if not session.fec_data or not ranges:
+            return None
+        end = min(ranges[-1][0] + ranges[-1][1], session.fec_end)
+        return fec.BlockTracker(session.fec_data, session.fec_base, end)
+    
+    def parity_packets(self, segments, session: TransferSession, first: int) -> List[bytes]:
+        """Paridades FEC do bloco que começa em 'first', com o M atual da sessão"""
+        m = session.fec_parity
+        if m <= 0:
+            return []
+        end = min(first + session.fec_data, session.fec_end, len(segments))
+        parities = fec.encode([segments.payload(n) for n in range(first, end)], session.fec_data, m)
+        return [protocol.pack_fec(session.transfer_id, first, m, row, checksums.digest(session.algorithm, parity), parity)
+                for row, parity in enumerate(parities)]
+    
+    def send_parity(self, segments, blocks: List[int], session: TransferSession, pacer: Pacer):
+        """Envia as paridades dos blocos cujo envio terminou, com o mesmo pacing dos segmentos"""
+        for first in blocks:
+            for packet in self.parity_packets(segments, session, first):
+                pacer.wait(len(packet))
+                if session.congestion is not None:
+                    session.congestion.pacer.wait(len(packet))
+                self.socket.sendto(packet, session.client_address)
+    
+    def handle_fec(self, request: str, client_address: Tuple[str, int]):
+        """Ajusta as paridades por bloco pedidas pelo cliente a partir da perda que ele observa"""
+        _, options = protocol.parse_options(request.split(' '))
+        session = self.sessions.get(int(options.get('transfer', 0)), client_address)
+        if session is None or not session.fec_data:
+            return
+        parity = max(0, min(int(options.get('parity', session.fec_parity)), config.FEC_MAX_PARITY,
+                            fec.MAX_BLOCK - session.fec_data))
+        if parity != session.fec_parity:
+            logger.info(f"FEC da transferência {session.transfer_id}: {session.fec_data}:{parity}")
+            session.fec_parity = parity
+    
+    def handle_ack(self, data: bytes, client_address: Tuple[str, int]):
+        """Processa um ACK cumulativo/seletivo de uma transferência selective repeat"""
+        transfer_id, cumulative, bitmap = protocol.unpack_ack(data)
+        session = self.sessions.get(transfer_id, client_address)
+        sender = session.sender if session is not None else None
+        if sender is None:
+            return
+        
+        sender.on_ack(cumulative, bitmap)
+    
+    def create_segment(self, segment_number: int, data: bytes, algorithm: str = 'md5', checksum: bytes = None,
+                       codec: str = None) -> bytes:
+        """Cria um segmento com cabeçalho customizado (sem o prefixo da transferência)"""
+        # Cabeçalho: [segment_number(4)][checksum(N)][data_length(2)], mais [original_length(2)] com compressão
         data_length = len(data)
         
-        # Calcula checksum MD5 dos dados
-        checksum = hashlib.md5(data).digest()
+        # Calcula o checksum dos dados, se não vier pré-calculado do índice
+        if checksum is None:
+            checksum = checksums.digest(algorithm, data)
         
-        # Monta cabeçalho
-        header = struct.pack('!I16sHH', segment_number, checksum, filename_length, data_length)
+        # Monta cabeçalho; o checksum é sempre o dos dados originais
+        if codec:
+            data = compression.compress(codec, data)
+            header = protocol.segment_header(len(checksum), True).pack(segment_number, checksum, len(data), data_length)
+        else:
+            header = protocol.segment_header(len(checksum)).pack(segment_number, checksum, data_length)
         
         # Monta segmento completo
-        segment = header + filename_bytes + data
+        segment = header + data
         
         return segment
     
-    def handle_retransmit_request(self, filename: str, segment_number: int, client_address: Tuple[str, int]):
-        """Processa requisição de retransmissão de segmento"""
+    def handle_nack(self, data: bytes, client_address: Tuple[str, int]):
+        """Processa um NACK com intervalos de segmentos perdidos"""
+        retransmit = self.parse_nack(data, client_address)
+        if retransmit is not None:
+            self.handle_retransmit_request(*retransmit)
+    
+    def parse_nack(self, data: bytes, client_address: Tuple[str, int]) -> Optional[Tuple[TransferSession, Iterable[int]]]:
+        """Transferência e segmentos pedidos por um NACK; None (com ERROR) se a transferência for desconhecida"""
+        transfer_id, ranges = protocol.unpack_nack(data)
+        session = self.sessions.get(transfer_id, client_address)
+        if session is None:
+            self.send_error(client_address, f"Transferência {transfer_id} desconhecida")
+            return None
+        
+        # Intervalos cortados ao trecho concedido e sem sobreposição: um NACK nunca pede mais que o arquivo
+        ranges = protocol.clamp_ranges(ranges, session.first_segment, session.end_segment)
+        
+        segment_numbers = protocol.iter_ranges(ranges)
+        return session, segment_numbers
+    
+    def parse_retransmit(self, request: str, client_address: Tuple[str, int]) -> Optional[Tuple[TransferSession, List[int]]]:
+        """Interpreta o RETRANSMIT legado: 'RETRANSMIT filename segment_number'"""
+        parts = request.split(' ')
+        if len(parts) < 3:
+            return None
+        
+        filename = parts[1]
+        segment_number = int(parts[2])
+        session = self.sessions.find(client_address, filename)
+        if session is None:
+            self.send_error(client_address, f"Nenhuma transferência de {filename} em andamento")
+            return None
+        return session, [segment_number]
+    
+    def handle_retransmit_request(self, session: TransferSession, segment_numbers: Iterable[int]):
+        """Processa requisição de retransmissão, respondendo com uma rajada de segmentos"""
+        filename, client_address = session.filename, session.client_address
         try:
             if not os.path.exists(filename):
                 self.send_error(client_address, f"Arquivo não encontrado: {filename}")
                 return
             
-            # Lê o segmento específico
-            with open(filename, 'rb') as file:
-                file.seek(segment_number * self.MAX_PAYLOAD_SIZE)
-                data = file.read(self.MAX_PAYLOAD_SIZE)
-                
-                if data:
-                    # Cria e envia segmento
-                    segment = self.create_segment(segment_number, data, filename)
-                    self.socket.sendto(segment, client_address)
-                    logger.info(f"Segmento {segment_number} retransmitido para {client_address} na porta {self.port}")
-                else:
-                    self.send_error(client_address, f"Segmento {segment_number} inválido")
+            pacer = self.create_pacer()
+            retransmitted = 0
+            invalid = []
+            
+            # Reenvia os segmentos solicitados em uma única rajada
+            with self.open_segments(filename, session.algorithm, session.segment_size, session.compression) as segments:
+                for segment_number in segment_numbers:
+                    if self.send_segment_at(segments, segment_number, session, pacer):
+                        retransmitted += 1
+                    else:
+                        invalid.append(segment_number)
+            # No máximo um ERROR por requisição, qualquer que seja o número de segmentos inválidos
+            if invalid:
+                self.send_error(client_address, f"{len(invalid)} segmento(s) inválido(s), a partir de {invalid[0]}")
+            
+            logger.info(f"{retransmitted} segmento(s) retransmitido(s) para {client_address} na porta {self.port}")
                     
         except Exception as e:
-            logger.error(f"Erro ao retransmitir segmento {segment_number}: {e}")
+            logger.error(f"Erro ao retransmitir segmentos de {filename}: {e}")
             self.send_error(client_address, f"Erro ao retransmitir: {str(e)}")
     
     def send_error(self, client_address: Tuple[str, int], error_message: str):
         """Envia mensagem de erro para o cliente"""
         try:
             error_msg = f"ERROR {error_message}"
-            self.socket.sendto(error_msg.encode('utf-8'), client_address)
+            self.send_datagram(error_msg.encode('utf-8'), client_address)
             logger.warning(f"Erro enviado para {client_address} na porta {self.port}: {error_message}")
         except Exception as e:
             logger.error(f"Erro ao enviar mensagem de erro: {e}")
@@ -217,6 +819,33 @@ def main():
     parser.add_argument('--host', default='0.0.0.0', help='Host para escutar (padrão: 0.0.0.0)')
     parser.add_argument('--port', type=int, default=8888, help='Porta para escutar (padrão: 8888)')
     parser.add_argument('--buffer-size', type=int, default=1024, help='Tamanho do buffer (padrão: 1024)')
+    parser.add_argument('--rate', type=float, help='Taxa alvo de envio em bytes/s (padrão: SEGMENT_DELAY de config.py)')
+    parser.add_argument('--packet-rate', type=float, help='Taxa alvo de envio em pacotes/s')
+    parser.add_argument('--burst', type=float, help='Rajada máxima do token bucket, na unidade da taxa')
+    parser.add_argument('--no-pacing', action='store_true', help='Desativa o pacing (ex.: loopback)')
+    parser.add_argument('--congestion', choices=sorted(CONTROLLERS), default=config.CONGESTION_CONTROL,
+                        help='Controle de congestionamento do modo sr: aimd, bbr ou none (padrão: %(default)s)')
+    parser.add_argument('--max-segment-size', type=int, default=config.MAX_SEGMENT_SIZE,
+                        help='Maior payload por segmento aceito na negociação (padrão: %(default)s)')
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads',
+                        help='Modelo de execução: pools de threads ou um event loop asyncio (padrão: %(default)s)')
+    parser.add_argument('--workers', type=int, default=config.SERVER_PROCESSES,
+                        help='Processos escutando a mesma porta com SO_REUSEPORT (padrão: %(default)s)')
+    parser.add_argument('--transfer-workers', type=int, default=config.TRANSFER_WORKERS,
+                        help='Threads para envios de arquivos (padrão: %(default)s)')
+    parser.add_argument('--control-workers', type=int, default=config.CONTROL_WORKERS,
+                        help='Threads para NACKs e outras requisições curtas (padrão: %(default)s)')
+    parser.add_argument('--queue-policy', choices=BoundedExecutor.POLICIES, default=config.WORKER_QUEUE_POLICY,
+                        help='Com a fila de controle cheia: descarta ou bloqueia a leitura (padrão: %(default)s)')
+    parser.add_argument('--max-sessions', type=int, default=config.MAX_SESSIONS,
+                        help='Transferências simultâneas por processo (padrão: %(default)s)')
+    parser.add_argument('--multicast', type=multicast.parse_group, metavar='GRUPO:PORTA',
+                        default=multicast.parse_group(config.MULTICAST_GROUP) if config.MULTICAST_GROUP else None,
+                        help='Grupo para distribuir uma única vez os arquivos pedidos com multicast (ex.: 239.255.42.99:9999)')
+    parser.add_argument('--multicast-interface', default=config.MULTICAST_INTERFACE,
+                        help='IP da interface usada para enviar ao grupo (padrão: a do --host ou a rota padrão)')
+    parser.add_argument('--cache-size', type=float, default=config.SEGMENT_CACHE_MAX_BYTES / (1024 * 1024),
+                        help='Orçamento do cache de segmentos em MB (padrão: %(default).0f)')
     
     args = parser.parse_args()
     
@@ -225,7 +854,37 @@ def main():
         print("Erro: Porta deve ser maior que 1024")
         return
     
-    server = UDPServer(args.host, args.port, args.buffer_size)
+    # Resolve a configuração de pacing
+    rate, rate_unit = args.rate, 'bytes'
+    if args.packet_rate is not None:
+        rate, rate_unit = args.packet_rate, 'packets'
+    if args.no_pacing:
+        rate = 0
+    
+    # O segmento precisa caber em um datagrama
+    max_segment_size = max(config.MIN_SEGMENT_SIZE, min(args.max_segment_size, config.MAX_SEGMENT_SIZE))
+    
+    server_class = UDPServer
+    if args.engine == 'asyncio':
+        from async_server import AsyncUDPServer
+        server_class = AsyncUDPServer
+    
+    server_kwargs = dict(host=args.host, port=args.port, buffer_size=args.buffer_size, rate=rate,
+                         rate_unit=rate_unit, burst=args.burst, cache_size=int(args.cache_size * 1024 * 1024),
+                         max_segment_size=max_segment_size, transfer_workers=args.transfer_workers,
+                         control_workers=args.control_workers, queue_policy=args.queue_policy,
+                         max_sessions=args.max_sessions, congestion=args.congestion,
+                         multicast_group=args.multicast, multicast_interface=args.multicast_interface)
+    
+    if args.workers > 1:
+        # Um processo por núcleo: hashing e empacotamento deixam de disputar o GIL
+        from process_workers import HAS_REUSEPORT, ServerProcessGroup
+        if not HAS_REUSEPORT:
+            print("Erro: --workers requer SO_REUSEPORT, indisponível nesta plataforma")
+            return
+        server = ServerProcessGroup(server_class, args.workers, **server_kwargs)
+    else:
+        server = server_class(**server_kwargs)
     
     try:
         print(f"Servidor UDP iniciando em {args.host}:{args.port}")
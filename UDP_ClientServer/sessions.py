@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tabela de Transferências do Servidor UDP
+Cada transferência recebe um ID de 32 bits, informado no FILE_INFO e carregado por segmentos, ACKs e NACKs
+"""
+
+import secrets
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import config
+import protocol
+
+class TransferSession:
+    """Estado de uma transferência em andamento"""
+
+    def __init__(self, transfer_id: int, filename: str, client_address: Tuple[str, int], algorithm: str,
+                 segment_size: int = config.MAX_PAYLOAD_SIZE):
+        self.transfer_id = transfer_id
+        self.filename = filename
+        self.client_address = client_address
+        self.algorithm = algorithm
+        self.segment_size = segment_size
+        self.prefix = protocol.SEGMENT_PREFIX.pack(protocol.MSG_DATA, transfer_id)  # Igual em todos os segmentos
+        self.sender = None  # SelectiveRepeatSender no modo sr
+        self.congestion = None  # CongestionController do envio (janela e taxa ajustadas pelo retorno do cliente)
+        self.first_segment = 0  # Trecho concedido [first_segment, end_segment): NACKs ficam limitados a ele
+        self.end_segment = 0
+        self.fec_data = 0  # K: segmentos por bloco FEC (0 sem FEC)
+        self.fec_parity = 0  # M: paridades por bloco, ajustável pelo cliente durante o envio
+        self.fec_base = 0  # Blocos alinhados ao primeiro segmento do trecho concedido
+        self.fec_end = 0  # e cortados no seu fim
+        self.compression = None  # Codec dos payloads ('zlib', 'lzma') ou None
+        self.channel = None  # Canal multicast do receptor: esta transferência só atende os seus NACKs
+        self.sending = False  # Envio em andamento: a sessão não expira mesmo sem ACKs (modo stream)
+        self.finished = False  # Envio concluído: só aguarda NACKs e não conta no limite por cliente
+        self.file_info = b''  # FILE_INFO enviado, repetido até o READY do cliente
+        self.ready = threading.Event()  # READY do cliente recebido
+        self.ready_options: Dict[str, str] = {}  # window, segment_size e start informados no READY
+        self.last_delta = 0.0  # Último DELTA_SUMS: o cliente ainda compara digests e o handshake não expira
+        self.last_activity = time.monotonic()
+
+    def touch(self):
+        """Registra atividade do cliente nesta transferência"""
+        self.last_activity = time.monotonic()
+
+class SessionLimitError(RuntimeError):
+    """Limite de transferências simultâneas atingido"""
+
+class SessionTable:
+    """Transferências indexadas pelo ID, descartadas após um período sem atividade"""
+
+    def __init__(self, idle_timeout: float = config.SESSION_IDLE_TIMEOUT, max_sessions: int = config.MAX_SESSIONS,
+                 max_per_host: int = config.MAX_SESSIONS_PER_HOST, linger: float = config.SESSION_LINGER):
+        self.idle_timeout = idle_timeout
+        self.linger = min(linger, idle_timeout)  # Ociosidade tolerada após o fim do envio
+        self.max_sessions = max_sessions
+        self.max_per_host = max_per_host
+        self.sessions = {}  # {transfer_id: TransferSession}
+        self.per_host: Dict[str, int] = {}  # {ip do cliente: transferências ainda não concluídas}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.sessions)
+
+    def create(self, filename: str, client_address: Tuple[str, int], algorithm: str,
+               segment_size: int = config.MAX_PAYLOAD_SIZE) -> TransferSession:
+        """Registra uma nova transferência com um ID aleatório ainda não usado"""
+        host = client_address[0]
+        with self.lock:
+            self._purge_idle()
+            if len(self.sessions) >= self.max_sessions:
+                self._evict_finished()
+            if len(self.sessions) >= self.max_sessions:
+                raise SessionLimitError(f"Servidor ocupado: {self.max_sessions} transferências em andamento")
+            if self.per_host.get(host, 0) >= self.max_per_host:
+                raise SessionLimitError(f"Limite de {self.max_per_host} transferências por cliente atingido")
+
+            # IDs imprevisíveis dificultam ACKs/NACKs forjados por terceiros
+            transfer_id = secrets.randbits(32)
+            while transfer_id == 0 or transfer_id in self.sessions:
+                transfer_id = secrets.randbits(32)
+            session = TransferSession(transfer_id, filename, client_address, algorithm, segment_size)
+            self.sessions[transfer_id] = session
+            self.per_host[host] = self.per_host.get(host, 0) + 1
+            return session
+
+    def get(self, transfer_id: int, client_address: Tuple[str, int] = None) -> Optional[TransferSession]:
+        """Busca uma transferência; se o endereço for informado, ele precisa ser o do cliente dono"""
+        with self.lock:
+            session = self.sessions.get(transfer_id)
+        if session is None or (client_address is not None and session.client_address != client_address):
+            return None
+        session.touch()
+        return session
+
+    def find(self, client_address: Tuple[str, int], filename: str) -> Optional[TransferSession]:
+        """Transferência mais recente de um arquivo para um cliente (RETRANSMIT legado)"""
+        with self.lock:
+            matches = [session for session in self.sessions.values()
+                       if session.client_address == client_address and session.filename == filename]
+        if not matches:
+            return None
+        session = max(matches, key=lambda session: session.last_activity)
+        session.touch()
+        return session
+
+    def finish(self, transfer_id: int):
+        """Marca o fim do envio: a transferência só atende NACKs até SESSION_LINGER sem atividade"""
+        with self.lock:
+            session = self.sessions.get(transfer_id)
+            if session is None or session.finished:
+                return
+            session.finished = True
+            session.touch()
+            self._release_host(session.client_address[0])
+
+    def remove(self, transfer_id: int):
+        """Descarta uma transferência"""
+        with self.lock:
+            self._discard(transfer_id)
+
+    def purge_idle(self) -> int:
+        """Remove transferências sem atividade; retorna quantas foram descartadas"""
+        with self.lock:
+            return self._purge_idle()
+
+    def _purge_idle(self) -> int:
+        """Remove transferências sem atividade (chamado com o lock adquirido)"""
+        now = time.monotonic()
+        idle = [tid for tid, session in self.sessions.items()
+                if not session.sending
+                and now - session.last_activity > (self.linger if session.finished else self.idle_timeout)]
+        for transfer_id in idle:
+            self._discard(transfer_id)
+        return len(idle)
+
+    def _discard(self, transfer_id: int):
+        """Remove uma transferência e sua contagem por cliente (chamado com o lock adquirido)"""
+        session = self.sessions.pop(transfer_id, None)
+        if session is not None and not session.finished:
+            self._release_host(session.client_address[0])
+
+    def _evict_finished(self):
+        """Com a tabela cheia, descarta a transferência concluída há mais tempo (chamado com o lock adquirido)"""
+        finished = [session for session in self.sessions.values() if session.finished and not session.sending]
+        if finished:
+            oldest = min(finished, key=lambda session: session.last_activity)
+            self._discard(oldest.transfer_id)
+
+    def _release_host(self, host: str):
+        """Libera uma vaga do limite por cliente (chamado com o lock adquirido)"""
+        remaining = self.per_host.get(host, 0) - 1
+        if remaining > 0:
+            self.per_host[host] = remaining
+        else:
+            self.per_host.pop(host, None)
@@ -70,7 +70,7 @@ def test_hello_world():
         # Inicia servidor em background
         server_process = subprocess.Popen([
             "python3", "hello_world_udp.py", "server"
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         
         # Aguarda servidor inicializar
         time.sleep(2)
@@ -95,6 +95,979 @@ def test_hello_world():
         print(f"✗ Erro no teste Hello World: {e}")
         return False
 
+def test_pacing():
+    """Testa o token bucket de controle de taxa"""
+    print("\nTestando controle de taxa (pacing)...")
+    
+    try:
+        from pacing import Pacer
+        
+        # Sem pacing nunca deve aguardar
+        unlimited = Pacer(rate=0)
+        if unlimited.delay(1024) != 0:
+            print("✗ Pacer sem taxa deveria enviar imediatamente")
+            return False
+        print("✓ Modo sem pacing não introduz atraso")
+        
+        # 200 pacotes/s com rajada de 10: 50 pacotes levam ~0.2s
+        pacer = Pacer(rate=200, unit='packets', burst=10)
+        start = time.time()
+        for _ in range(50):
+            pacer.wait(1024)
+        elapsed = time.time() - start
+        
+        if 0.15 <= elapsed <= 0.5:
+            print(f"✓ Taxa respeitada: 50 pacotes em {elapsed:.3f}s")
+            return True
+        else:
+            print(f"✗ Taxa fora do esperado: 50 pacotes em {elapsed:.3f}s")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Erro no teste de pacing: {e}")
+        return False
+
+def test_rtt_estimator():
+    """Testa a estimativa de RTT e o RTO adaptativo (RFC 6298)"""
+    print("\nTestando estimativa de RTT...")
+    
+    try:
+        from rtt import RTTEstimator
+        
+        # Primeira amostra: SRTT = R, RTTVAR = R/2, RTO = SRTT + 4*RTTVAR
+        estimator = RTTEstimator(initial_rto=1.0, min_rto=0.001, max_rto=10.0)
+        estimator.sample(0.1)
+        if abs(estimator.rto - 0.3) > 1e-9:
+            print(f"✗ RTO após a primeira amostra deveria ser 300 ms: {estimator.describe()}")
+            return False
+        estimator.sample(0.1)
+        if abs(estimator.srtt - 0.1) > 1e-9 or abs(estimator.rttvar - 0.0375) > 1e-9:
+            print(f"✗ SRTT/RTTVAR incorretos: {estimator.describe()}")
+            return False
+        print(f"✓ {estimator.describe()}")
+        
+        # Backoff exponencial limitado a max_rto; uma nova amostra o desfaz
+        rto = estimator.rto
+        estimator.backoff()
+        estimator.backoff()
+        if abs(estimator.rto - 4 * rto) > 1e-9:
+            print(f"✗ Backoff deveria quadruplicar o RTO: {estimator.describe()}")
+            return False
+        for _ in range(20):
+            estimator.backoff()
+        if estimator.rto != 10.0:
+            print(f"✗ Backoff passou do RTO máximo: {estimator.describe()}")
+            return False
+        estimator.sample(0.1)
+        if estimator.rto > rto:
+            print(f"✗ Amostra nova não desfez o backoff: {estimator.describe()}")
+            return False
+        print("✓ Backoff exponencial limitado e desfeito pela próxima amostra")
+        
+        # Em LAN (RTT de 1 ms) o RTO fica no mínimo configurado, não em segundos
+        lan = RTTEstimator()
+        for _ in range(10):
+            lan.sample(0.001)
+        if lan.rto != lan.min_rto:
+            print(f"✗ RTO em LAN deveria ser o mínimo: {lan.describe()}")
+            return False
+        print(f"✓ LAN: {lan.describe()}")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de RTT: {e}")
+        return False
+
+def test_congestion_control():
+    """Testa os controladores de congestionamento e o limite de segmentos em voo"""
+    print("\nTestando controle de congestionamento...")
+    
+    try:
+        import config
+        from congestion import create_controller
+        from selective_repeat import SelectiveRepeatSender
+        
+        # AIMD: slow start dobra a janela por RTT; uma perda a reduz à metade uma vez por evento
+        aimd = create_controller('aimd', 1024)
+        for _ in range(10):
+            aimd.on_ack(1, rtt=0.01)
+        sent_time = time.monotonic()
+        aimd.on_loss(sent_time)
+        aimd.on_loss(sent_time)
+        if aimd.window != 10 or aimd.rate is None:
+            print(f"✗ AIMD deveria crescer para 20 e cair para 10: {aimd.describe()}")
+            return False
+        aimd.on_timeout()
+        if aimd.window != config.CONGESTION_MIN_WINDOW:
+            print(f"✗ Temporizador expirado deveria levar a janela ao mínimo: {aimd.describe()}")
+            return False
+        print("✓ AIMD: slow start, redução por evento de perda e colapso no timeout")
+        
+        # BBR: taxa = ganho x banda máxima; janela = ganho x BDP (+ folga)
+        bbr = create_controller('bbr', 1000)
+        for _ in range(200):
+            bbr.on_ack(1, rtt=0.01, delivery_rate=100000.0)
+        if bbr.state != 'probe_bw' or not 70000 <= bbr.rate <= 130000 or not 2 <= bbr.window <= 10:
+            print(f"✗ BBR não convergiu para a banda medida: {bbr.describe()}")
+            return False
+        bbr.on_loss(time.monotonic())
+        if not 70000 <= bbr.rate <= 130000:
+            print(f"✗ Perda isolada não deveria reduzir a taxa do BBR: {bbr.describe()}")
+            return False
+        print(f"✓ BBR: {bbr.describe()}")
+        
+        # O emissor selective repeat não passa da janela de congestionamento
+        sender = SelectiveRepeatSender(100, 64, 0.2, controller=create_controller('aimd', 1024))
+        while sender.can_send():
+            sender.mark_sent(sender.next_segment)
+        if sender.in_flight != config.CONGESTION_INITIAL_WINDOW:
+            print(f"✗ Segmentos em voo além da janela inicial: {sender.in_flight}")
+            return False
+        sender.on_ack(4, b'')
+        if not sender.can_send() or sender.controller.window != config.CONGESTION_INITIAL_WINDOW + 4:
+            print(f"✗ ACK não abriu a janela: {sender.controller.describe()}")
+            return False
+        print("✓ Janela de congestionamento limita os segmentos em voo")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de congestionamento: {e}")
+        return False
+
+def test_nack_ranges():
+    """Testa a codificação de NACKs em intervalos"""
+    print("\nTestando codificação de NACK...")
+    
+    try:
+        import protocol
+        
+        missing = [3, 4, 5, 9, 20, 21]
+        ranges = protocol.segment_ranges(missing)
+        if ranges != [(3, 3), (9, 1), (20, 2)]:
+            print(f"✗ Intervalos incorretos: {ranges}")
+            return False
+        print("✓ Segmentos compactados em intervalos")
+        
+        transfer_id, decoded = protocol.unpack_nack(protocol.pack_nack(0xCAFEBABE, ranges))
+        if transfer_id != 0xCAFEBABE or decoded != ranges:
+            print(f"✗ NACK decodificado incorretamente: {transfer_id} {decoded}")
+            return False
+        print("✓ NACK codificado e decodificado corretamente")
+        
+        # Intervalos enormes ou sobrepostos ficam limitados ao trecho concedido
+        clamped = protocol.clamp_ranges([(5, 0xFFFFFFFF), (2, 4), (200, 3)], 1, 100)
+        if clamped != [(2, 98)]:
+            print(f"✗ Intervalos não foram limitados ao trecho: {clamped}")
+            return False
+        
+        from server import UDPServer
+        server = UDPServer('127.0.0.1', 0)
+        session = server.sessions.create("arquivo_pequeno.txt", ("127.0.0.1", 5000), "md5")
+        session.first_segment, session.end_segment = 0, 4
+        _, segment_numbers = server.parse_nack(protocol.pack_nack(session.transfer_id, [(1, 0xFFFFFFFF)]),
+                                               ("127.0.0.1", 5000))
+        if list(segment_numbers) != [1, 2, 3]:
+            print("✗ NACK com quantidade enorme não foi limitado pelo servidor")
+            return False
+        print("✓ NACK malicioso limitado aos segmentos da transferência")
+        return True
+            
+    except Exception as e:
+        print(f"✗ Erro no teste de NACK: {e}")
+        return False
+
+def test_fec_code():
+    """Testa a codificação Reed-Solomon dos blocos FEC e a escolha de M pela perda"""
+    print("\nTestando código FEC...")
+    
+    try:
+        import random
+        import fec
+        
+        # Bloco de 16 segmentos, o último menor, com 4 paridades
+        k, m = 16, 4
+        payloads = [os.urandom(1024) for _ in range(k - 1)] + [os.urandom(300)]
+        parities = fec.encode(payloads, k, m)
+        if len(parities) != m or any(len(parity) != 1024 for parity in parities):
+            print("✗ Paridades com tamanho incorreto")
+            return False
+        
+        # Qualquer combinação de até M perdas é reconstruída com M paridades quaisquer
+        for lost_count in range(m + 1):
+            lost = random.sample(range(k), lost_count)
+            rows = random.sample(range(m), lost_count)
+            known = {column: data for column, data in enumerate(payloads) if column not in lost}
+            recovered = fec.decode(k, known, {row: parities[row] for row in rows}, lost)
+            if any(recovered[column][:len(payloads[column])] != payloads[column] for column in lost):
+                print(f"✗ Reconstrução incorreta com {lost_count} perdas")
+                return False
+        print(f"✓ Até {m} perdas por bloco reconstruídas")
+        
+        # Último bloco com menos de K segmentos: os ausentes valem zero
+        short = [os.urandom(100), os.urandom(60)]
+        recovered = fec.decode(k, {1: short[1]}, {2: fec.encode(short, k, 3)[2]}, [0])
+        if recovered[0] != short[0]:
+            print("✗ Bloco final curto não reconstruído")
+            return False
+        
+        try:
+            fec.decode(k, {}, {0: parities[0]}, [0, 1])
+            print("✗ Mais perdas que paridades deveria falhar")
+            return False
+        except ValueError:
+            pass
+        print("✓ Bloco curto e excesso de perdas tratados")
+        
+        # Sem perda nenhuma paridade; mais perda pede mais paridades
+        if not fec.parity_for_loss(16, 0.0) == 0 < fec.parity_for_loss(16, 0.01) < fec.parity_for_loss(16, 0.1):
+            print("✗ Paridades não acompanham a perda")
+            return False
+        
+        # Blocos completos a cada K segmentos e quando o envio pula um vão
+        tracker = fec.BlockTracker(4, 1, 11)
+        finished = [tracker.sent(n) for n in (1, 2, 3, 4, 5, 7, 9, 10)]
+        if finished != [[], [], [], [1], [], [], [5], [9]]:
+            print(f"✗ Blocos terminados incorretos: {finished}")
+            return False
+        print(f"✓ M adaptado à perda (1%: {fec.parity_for_loss(16, 0.01)}, 10%: {fec.parity_for_loss(16, 0.1)})")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste do código FEC: {e}")
+        return False
+
+def test_segment_cache():
+    """Testa o cache LRU de segmentos com orçamento em bytes"""
+    print("\nTestando cache de segmentos...")
+    
+    try:
+        from segment_cache import SegmentCache
+        
+        cache = SegmentCache(max_bytes=3000, max_entry_bytes=2000)
+        cache.put(('a',), [b'x' * 1000])
+        cache.put(('b',), [b'x' * 1000])
+        cache.get(('a',))  # 'a' passa a ser o mais recente
+        cache.put(('c',), [b'x' * 1500])  # Excede o orçamento e remove 'b'
+        
+        if cache.get(('b',)) is not None or cache.get(('a',)) is None:
+            print("✗ Remoção LRU incorreta")
+            return False
+        print("✓ Entrada menos usada removida ao exceder o orçamento")
+        
+        built = cache.get_or_build(('d',), 5000, lambda: [b'x' * 5000])
+        if built is not None:
+            print("✗ Arquivo maior que o limite por entrada não deveria ser armazenado")
+            return False
+        
+        stats = cache.stats()
+        if stats['hits'] == 2 and stats['evictions'] == 1 and stats['bytes'] <= 3000:
+            print(f"✓ Contadores corretos: {stats}")
+            return True
+        else:
+            print(f"✗ Contadores inesperados: {stats}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Erro no teste do cache: {e}")
+        return False
+
+def test_checksum_index():
+    """Testa o índice persistido de checksums"""
+    print("\nTestando índice de checksums...")
+    
+    import hashlib
+    import tempfile
+    
+    try:
+        from checksum_index import ChecksumIndexStore
+        
+        work_dir = tempfile.mkdtemp()
+        path = os.path.join(work_dir, "dados.bin")
+        data = os.urandom(2500)
+        with open(path, 'wb') as file:
+            file.write(data)
+        
+        store = ChecksumIndexStore(os.path.join(work_dir, "index"))
+        index = store.get(path, 1024)
+        if index.digest(2) != hashlib.md5(data[2048:]).digest() or index.file_digest != hashlib.md5(data).digest():
+            print("✗ Digests calculados incorretamente")
+            return False
+        print("✓ Digests por segmento e do arquivo inteiro corretos")
+        
+        # Um novo store deve carregar o índice do disco sem recalcular
+        loaded = ChecksumIndexStore(os.path.join(work_dir, "index")).load(path, 1024, 'md5')
+        if loaded is None or loaded.digests != index.digests:
+            print("✗ Índice não foi persistido")
+            return False
+        print("✓ Índice persistido e recarregado")
+        
+        # Alterar o arquivo invalida o índice
+        with open(path, 'ab') as file:
+            file.write(b'mais dados')
+        updated = store.get(path, 1024)
+        if updated.num_segments != 3 or updated.file_size != 2510:
+            print("✗ Índice desatualizado após alteração do arquivo")
+            return False
+        print("✓ Índice recalculado após alteração do arquivo")
+        
+        # Arquivo truncado durante o envio falha a transferência em vez de ler o mmap além do fim
+        from mapped_file import MappedSegments
+        
+        segments = MappedSegments(path, 1024, updated)
+        try:
+            os.truncate(path, 1000)
+            segments.payload(2)
+            print("✗ Segmento lido de um arquivo truncado")
+            return False
+        except OSError:
+            print("✓ Truncamento durante o envio detectado")
+            return True
+        finally:
+            segments.close()
+            
+    except Exception as e:
+        print(f"✗ Erro no teste do índice de checksums: {e}")
+        return False
+
+def test_segment_bitmap():
+    """Testa o bitmap de segmentos recebidos"""
+    print("\nTestando bitmap de segmentos...")
+    
+    import random
+    
+    try:
+        import protocol
+        from segment_bitmap import SegmentBitmap
+        
+        size = 1000
+        bitmap = SegmentBitmap(size)
+        received = set(random.sample(range(size), 700))
+        for segment_number in received:
+            bitmap.mark(segment_number)
+        if bitmap.mark(next(iter(received))) or bitmap.count != len(received):
+            print("✗ Contagem incorreta após marcações repetidas")
+            return False
+        
+        # Intervalos faltantes iguais aos calculados com conjuntos
+        expected = protocol.segment_ranges(sorted(set(range(size)) - received))
+        if bitmap.missing_ranges() != expected:
+            print("✗ Intervalos faltantes incorretos")
+            return False
+        expected = protocol.segment_ranges(sorted(set(range(13, 517)) - received))
+        if bitmap.missing_ranges(13, 517) != expected:
+            print("✗ Intervalos faltantes de um trecho incorretos")
+            return False
+        print(f"✓ {bitmap.count} marcados, {len(bitmap.missing_ranges())} intervalos faltantes")
+        
+        # Janela desalinhada usada no bitmap do ACK
+        window = bitmap.window(37, 50)
+        bits = [bool(window[i // 8] & (0x80 >> (i % 8))) for i in range(50)]
+        if bits != [37 + i in received for i in range(50)] or len(window) != 7:
+            print("✗ Janela do bitmap incorreta")
+            return False
+        print("✓ Janela extraída para o ACK")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste do bitmap: {e}")
+        return False
+
+def test_file_assembler():
+    """Testa a remontagem do arquivo direto no disco"""
+    print("\nTestando remontagem em disco...")
+    
+    import tempfile
+    
+    try:
+        from reassembly import FileAssembler
+        
+        path = os.path.join(tempfile.mkdtemp(), "saida.bin")
+        content = os.urandom(2500)
+        assembler = FileAssembler(path, len(content), 1024)
+        
+        # Segmentos fora de ordem e duplicados vão para o deslocamento certo uma única vez
+        for segment_number in (2, 0, 2):
+            assembler.write(segment_number, content[segment_number * 1024:(segment_number + 1) * 1024])
+        if assembler.count != 2 or assembler.missing() != [1] or os.path.exists(path):
+            print(f"✗ Estado incorreto: {assembler.count} gravados, faltando {assembler.missing()}")
+            return False
+        print("✓ Segmentos fora de ordem gravados no arquivo parcial")
+        
+        try:
+            assembler.write(1, b'curto')
+            print("✗ Segmento com tamanho errado foi aceito")
+            return False
+        except ValueError:
+            pass
+        
+        assembler.write(1, content[1024:2048])
+        assembler.finish()
+        with open(path, 'rb') as output:
+            if output.read() != content or os.path.exists(assembler.part_path):
+                print("✗ Arquivo final diferente do original")
+                return False
+        print("✓ Arquivo final íntegro e .part renomeado")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de remontagem: {e}")
+        return False
+
+def test_resume_journal():
+    """Testa a retomada de downloads a partir do .part e do journal"""
+    print("\nTestando retomada de downloads...")
+    
+    import hashlib
+    import tempfile
+    
+    try:
+        import protocol
+        from reassembly import FileAssembler
+        from selective_repeat import SelectiveRepeatSender
+        
+        path = os.path.join(tempfile.mkdtemp(), "saida.bin")
+        content = os.urandom(5000)
+        digest = hashlib.md5(content).hexdigest()
+        assembler = FileAssembler(path, len(content), 1024, 'md5', digest)
+        for segment_number in (0, 3):
+            assembler.write(segment_number, content[segment_number * 1024:(segment_number + 1) * 1024])
+        if not assembler.suspend() or not os.path.exists(assembler.journal_path):
+            print("✗ Download interrompido não manteve o journal")
+            return False
+        
+        # Mesma versão do arquivo: só os segmentos faltantes precisam ser pedidos
+        assembler = FileAssembler(path, len(content), 1024, 'md5', digest)
+        if assembler.resumed != 2 or assembler.missing_ranges() != [(1, 2), (4, 1)]:
+            print(f"✗ Retomada incorreta: {assembler.resumed} segmentos, faltando {assembler.missing_ranges()}")
+            return False
+        for start, count in assembler.missing_ranges():
+            for segment_number in range(start, start + count):
+                assembler.write(segment_number, content[segment_number * 1024:(segment_number + 1) * 1024])
+        assembler.finish()
+        with open(path, 'rb') as output:
+            if output.read() != content or os.path.exists(assembler.journal_path):
+                print("✗ Arquivo retomado diferente do original")
+                return False
+        print("✓ Download retomado a partir dos segmentos do journal")
+        
+        # Outra versão do arquivo (digest diferente) recomeça do zero
+        assembler = FileAssembler(path, len(content), 1024, 'md5', digest)
+        assembler.write(0, content[:1024])
+        assembler.suspend()
+        assembler = FileAssembler(path, len(content), 1024, 'md5', hashlib.md5(b'outro').hexdigest())
+        resumed = assembler.resumed
+        assembler.discard()
+        if resumed:
+            print("✗ Journal de outra versão do arquivo foi reaproveitado")
+            return False
+        print("✓ Journal de outra versão do arquivo descartado")
+        
+        # O READY leva no máximo RESUME_MAX_RANGES intervalos e o servidor envia só eles
+        ranges = protocol.coalesce_ranges([(0, 2), (5, 1), (7, 3), (20, 1)], 2)
+        if ranges != [(0, 10), (20, 1)] or protocol.parse_ranges(protocol.format_ranges(ranges)) != ranges:
+            print(f"✗ Intervalos do READY incorretos: {ranges}")
+            return False
+        sender = SelectiveRepeatSender(30, 32, 0.2, [(3, 2), (20, 1)])
+        sent = []
+        while sender.can_send():
+            sent.append(sender.next_segment)
+            sender.mark_sent(sender.next_segment)
+        if sent != [3, 4, 20]:
+            print(f"✗ Selective repeat enviou segmentos fora dos intervalos: {sent}")
+            return False
+        print("✓ Servidor envia apenas os intervalos faltantes")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de retomada: {e}")
+        return False
+
+def test_byte_ranges():
+    """Testa as leituras parciais em bytes ou segmentos"""
+    print("\nTestando leituras parciais...")
+    
+    import tempfile
+    
+    try:
+        import protocol
+        from reassembly import FileAssembler
+        from server import UDPServer
+        
+        if protocol.parse_span('100-200', 1000) != (100, 200) or protocol.parse_span('-50', 1000) != (950, 1000):
+            print("✗ Intervalos interpretados incorretamente")
+            return False
+        try:
+            protocol.parse_span('300-200', 1000)
+            print("✗ Intervalo invertido foi aceito")
+            return False
+        except ValueError:
+            pass
+        
+        # Trechos em segmentos viram bytes alinhados, cortados no fim do arquivo
+        server = UDPServer('127.0.0.1', 8896)
+        if (server.negotiate_range({'segments': '1-9'}, 2500, 1024) != (1024, 1476)
+                or server.negotiate_range({'bytes': '-100'}, 2500, 1024) != (2400, 100)
+                or server.negotiate_range({}, 2500, 1024) is not None):
+            print("✗ Trecho negociado incorretamente")
+            return False
+        print("✓ Trechos em bytes, segmentos e sufixo negociados")
+        
+        # Segmentos completos chegam com a numeração do arquivo; as pontas são recortadas
+        path = os.path.join(tempfile.mkdtemp(), "trecho.bin")
+        content = os.urandom(5000)
+        assembler = FileAssembler(path, len(content), 1024, offset=1500, length=2000)
+        if (assembler.first_segment, assembler.end_segment) != (1, 4) or assembler.missing() != [1, 2, 3]:
+            print(f"✗ Segmentos do trecho incorretos: {assembler.missing()}")
+            return False
+        for segment_number in (3, 1, 2):
+            assembler.write(segment_number, content[segment_number * 1024:(segment_number + 1) * 1024])
+        assembler.finish()
+        with open(path, 'rb') as output:
+            if output.read() != content[1500:3500]:
+                print("✗ Trecho gravado diferente do original")
+                return False
+        print("✓ Trecho remontado a partir de segmentos inteiros")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de leituras parciais: {e}")
+        return False
+
+def test_checksum_negotiation():
+    """Testa o registro de algoritmos de checksum e o cabeçalho variável"""
+    print("\nTestando negociação de checksum...")
+    
+    import zlib
+    
+    try:
+        import checksums
+        import protocol
+        from server import UDPServer
+        
+        if checksums.negotiate('crc32') != 'crc32' or checksums.negotiate('desconhecido') != 'md5':
+            print("✗ Negociação de algoritmo incorreta")
+            return False
+        if checksums.digest('crc32', b'dados') != zlib.crc32(b'dados').to_bytes(4, 'big'):
+            print("✗ CRC32 calculado incorretamente")
+            return False
+        print("✓ Algoritmos negociados e calculados corretamente")
+        
+        # O cabeçalho encolhe conforme o tamanho do checksum
+        server = UDPServer()
+        for algorithm, header_size in (('md5', 22), ('crc32', 10), ('none', 6)):
+            segment = server.create_segment(7, b'abc', algorithm)
+            header = protocol.segment_header(checksums.digest_size(algorithm))
+            segment_number, checksum, data_length = header.unpack_from(segment)
+            if header.size != header_size or segment_number != 7 or checksum != checksums.digest(algorithm, b'abc'):
+                print(f"✗ Cabeçalho incorreto para {algorithm}")
+                return False
+        print("✓ Cabeçalho com checksum de tamanho variável")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de negociação de checksum: {e}")
+        return False
+
+def test_compression():
+    """Testa os codecs de compressão por segmento e uma transferência comprimida"""
+    print("\nTestando compressão...")
+    
+    import filecmp
+    import re
+    import tempfile
+    
+    try:
+        import compression
+        import protocol
+        from client import UDPClient
+        from reassembly import FileAssembler
+        from server import UDPServer
+        
+        # Texto repetitivo comprime; bytes aleatórios seguem sem compressão ("stored")
+        text = b"O servidor envia segmentos de texto que comprimem bem. " * 20
+        noise = os.urandom(1024)
+        for codec in compression.available():
+            packed = compression.compress(codec, text)
+            if len(packed) >= len(text) or compression.decompress(codec, packed, len(text)) != text:
+                print(f"✗ Codec {codec} não reduziu ou não restaurou o texto")
+                return False
+            if compression.compress(codec, noise) != noise:
+                print(f"✗ Codec {codec} deveria armazenar dados incompressíveis")
+                return False
+        # Payload que se expande além do tamanho anunciado é rejeitado sem ser descomprimido inteiro
+        for codec in compression.available():
+            bomb = compression.compress(codec, bytes(1000000))
+            try:
+                compression.decompress(codec, bomb, 1024)
+                print(f"✗ Codec {codec} aceitou um payload maior que o tamanho original")
+                return False
+            except ValueError:
+                pass
+        if compression.negotiate('rar') is not None:
+            print("✗ Codec desconhecido foi aceito")
+            return False
+        print(f"✓ Codecs {', '.join(compression.available())} com fallback sem compressão")
+        
+        # Cabeçalho com o tamanho original; o cliente restaura o payload antes do checksum
+        body = UDPServer().create_segment(0, text, 'crc32', codec='zlib')
+        client = UDPClient("127.0.0.1", 5000)
+        client.transfer_id, client.codec, client.checksum_algorithm = 7, 'zlib', 'crc32'
+        client.segment_header = protocol.segment_header(4, True)
+        client.assembler = FileAssembler(os.path.join(tempfile.mkdtemp(), "t.txt"), len(text), 2048)
+        try:
+            prefix = protocol.SEGMENT_PREFIX.pack(protocol.MSG_DATA, 7)
+            if client.process_segment(prefix + body) != 0 or client.assembler.read(0) != text:
+                print("✗ Segmento comprimido não foi restaurado")
+                return False
+        finally:
+            client.assembler.discard()
+        print(f"✓ Segmento de {len(text)} bytes enviado com {len(body) - client.segment_header.size} bytes")
+        
+        # Transferência comprimida de um arquivo de texto
+        source = "arquivo_texto_compressao.txt"
+        with open(source, 'wb') as file:
+            file.write(text * 200)
+        output_dir = tempfile.mkdtemp()
+        server_process = subprocess.Popen([
+            "python3", "server.py", "--port", "8899", "--no-pacing"
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            time.sleep(2)
+            result = subprocess.run([
+                "python3", "client.py", "127.0.0.1", "8899", source,
+                "--output-dir", output_dir, "--compress", "zlib"
+            ], capture_output=True, text=True, timeout=60)
+        finally:
+            server_process.terminate()
+            server_process.wait()
+        
+        output_file = os.path.join(output_dir, source)
+        if result.returncode != 0 or not filecmp.cmp(source, output_file, shallow=False):
+            print(f"✗ Falha na transferência comprimida: {result.stderr[-500:]}")
+            return False
+        ratio = re.search(r"Compressão zlib: .*\(([\d.]+)x\)", result.stderr)
+        if not ratio or float(ratio.group(1)) < 2:
+            print(f"✗ Payloads não foram comprimidos: {ratio.group(0) if ratio else 'sem compressão'}")
+            return False
+        print(f"✓ Transferência íntegra com {ratio.group(1)}x menos bytes de payload")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de compressão: {e}")
+        return False
+    finally:
+        if os.path.exists("arquivo_texto_compressao.txt"):
+            os.remove("arquivo_texto_compressao.txt")
+
+def test_transfer_sessions():
+    """Testa o ID de transferência carregado pelos segmentos"""
+    print("\nTestando IDs de transferência...")
+    
+    try:
+        from client import UDPClient
+        from server import UDPServer
+        from sessions import SessionTable
+        
+        table = SessionTable()
+        first = table.create("a.txt", ("127.0.0.1", 5000), 'md5')
+        second = table.create("a.txt", ("127.0.0.1", 5001), 'md5')
+        if first.transfer_id == second.transfer_id or table.get(first.transfer_id) is not first:
+            print("✗ IDs de transferência repetidos ou não encontrados")
+            return False
+        if table.get(first.transfer_id, ("127.0.0.1", 5001)) is not None:
+            print("✗ Transferência aceitou mensagem de outro cliente")
+            return False
+        print("✓ Transferências registradas com IDs distintos")
+        
+        # O cliente aceita apenas segmentos da própria transferência
+        import tempfile
+        from reassembly import FileAssembler
+        
+        body = UDPServer().create_segment(0, b'dados')
+        client = UDPClient("127.0.0.1", 5000)
+        client.transfer_id = first.transfer_id
+        client.assembler = FileAssembler(os.path.join(tempfile.mkdtemp(), "a.txt"), 5, 1024)
+        try:
+            client.process_segment(second.prefix + body)
+            if client.assembler.count:
+                print("✗ Segmento de outra transferência foi aceito")
+                return False
+            if client.process_segment(first.prefix + body) != 0 or not client.assembler.complete:
+                print("✗ Segmento da transferência não foi aceito")
+                return False
+        finally:
+            client.assembler.discard()
+        print("✓ Segmentos demultiplexados pelo ID de transferência")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de IDs de transferência: {e}")
+        return False
+
+def test_session_limits():
+    """Testa limites de sessões e a limpeza de transferências ociosas"""
+    print("\nTestando limites de sessões...")
+    
+    import tempfile
+    
+    try:
+        from sessions import SessionLimitError, SessionTable
+        
+        table = SessionTable(idle_timeout=0.05, max_sessions=3, max_per_host=2)
+        first = table.create("a.txt", ("10.0.0.1", 5000), "md5")
+        table.create("b.txt", ("10.0.0.1", 5001), "md5")
+        try:
+            table.create("c.txt", ("10.0.0.1", 5002), "md5")
+            print("✗ Limite por cliente não aplicado")
+            return False
+        except SessionLimitError:
+            print("✓ Limite por cliente aplicado")
+        
+        table.create("c.txt", ("10.0.0.2", 5000), "md5")
+        try:
+            table.create("d.txt", ("10.0.0.3", 5000), "md5")
+            print("✗ Limite global não aplicado")
+            return False
+        except SessionLimitError:
+            print("✓ Limite global aplicado")
+        
+        # Transferências em envio não expiram; as demais são descartadas pelo janitor
+        first.sending = True
+        time.sleep(0.1)
+        if table.purge_idle() != 2 or table.get(first.transfer_id) is not first:
+            print("✗ Limpeza de sessões ociosas incorreta")
+            return False
+        table.create("e.txt", ("10.0.0.1", 5003), "md5")
+        print(f"✓ Sessões ociosas descartadas, {len(table)} ativa(s)")
+        
+        # Transferências concluídas não contam no limite por cliente e cedem lugar com a tabela cheia
+        table = SessionTable(max_sessions=3, max_per_host=2)
+        for number in range(5):
+            table.finish(table.create("f.txt", ("10.0.0.1", 6000 + number), "md5").transfer_id)
+        if len(table) != 3 or table.per_host:
+            print("✗ Transferências concluídas continuaram ocupando o limite por cliente")
+            return False
+        print("✓ Transferências concluídas liberam o limite por cliente")
+        
+        # Mais GETs seguidos de um mesmo host do que o limite por cliente
+        server_process = subprocess.Popen([
+            "python3", "server.py", "--port", "8887", "--no-pacing", "--max-sessions", "3"
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            time.sleep(2)
+            output_dir = tempfile.mkdtemp()
+            for attempt in range(5):
+                result = subprocess.run([
+                    "python3", "client.py", "127.0.0.1", "8887", "arquivo_pequeno.txt",
+                    "--output-dir", output_dir, "--no-resume"
+                ], capture_output=True, text=True, timeout=60)
+                if result.returncode != 0:
+                    print(f"✗ GET {attempt + 1} recusado: {result.stderr[-300:]}")
+                    return False
+        finally:
+            server_process.terminate()
+            server_process.wait()
+        print("✓ 5 GETs seguidos aceitos com limite de 3 transferências")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de limites de sessões: {e}")
+        return False
+
+def test_segment_size_negotiation():
+    """Testa a negociação do tamanho de segmento e a resposta de sondagem"""
+    print("\nTestando negociação do tamanho de segmento...")
+    
+    try:
+        import config
+        import protocol
+        from server import UDPServer
+        
+        server = UDPServer()
+        sizes = [server.negotiate_options(options)['segment_size']
+                 for options in ({}, {'segment_size': '8192'}, {'segment_size': '999999'}, {'segment_size': '10'})]
+        if sizes != [config.MAX_PAYLOAD_SIZE, 8192, config.MAX_SEGMENT_SIZE, config.MIN_SEGMENT_SIZE]:
+            print(f"✗ Tamanhos negociados incorretos: {sizes}")
+            return False
+        print("✓ Tamanho de segmento limitado ao intervalo aceito")
+        
+        if protocol.datagram_size(config.MAX_SEGMENT_SIZE, 64) > protocol.MAX_DATAGRAM_SIZE:
+            print("✗ Maior segmento não cabe em um datagrama")
+            return False
+        probe = protocol.pack_probe(1500)
+        if len(probe) != 1500 or probe[0] != protocol.MSG_PROBE:
+            print("✗ Resposta de sondagem com tamanho incorreto")
+            return False
+        print("✓ Sondagem responde com o tamanho pedido")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de tamanho de segmento: {e}")
+        return False
+
+def test_worker_pool():
+    """Testa o pool de workers com fila limitada"""
+    print("\nTestando pool de workers...")
+    
+    import threading
+    
+    try:
+        import config
+        from worker_pool import BoundedExecutor
+        
+        release = threading.Event()
+        pool = BoundedExecutor('teste', max_workers=1, queue_depth=1, policy='drop')
+        accepted = [pool.submit(release.wait, 5) for _ in range(4)]
+        if accepted != [True, True, False, False]:
+            print(f"✗ Fila não respeitou o limite: {accepted}")
+            return False
+        print("✓ Tarefas além da fila descartadas")
+        
+        # Vagas são liberadas quando as tarefas terminam
+        release.set()
+        pool.shutdown(wait=True)
+        if pool.stats() != {'submitted': 2, 'dropped': 2}:
+            print(f"✗ Contadores incorretos: {pool.stats()}")
+            return False
+        print(f"✓ Contadores corretos: {pool.stats()}")
+        
+        # Shutdown descarta as tarefas que ainda aguardavam na fila
+        release = threading.Event()
+        ran = []
+        pool = BoundedExecutor('teste', max_workers=1, queue_depth=2)
+        pool.submit(release.wait, 5)
+        pool.submit(ran.append, 1)
+        pool.submit(ran.append, 2)
+        pool.shutdown()
+        release.set()
+        pool.executor.shutdown(wait=True)
+        if ran or pool.pending:
+            print(f"✗ Tarefas enfileiradas executadas após o shutdown: {ran}")
+            return False
+        print("✓ Tarefas enfileiradas canceladas no shutdown")
+        
+        # Com 'block' só a fila de controle segura a leitura; GETs com a fila cheia são recusados na hora
+        from server import UDPServer
+        
+        server = UDPServer('127.0.0.1', 0, transfer_workers=1, queue_policy='block')
+        release = threading.Event()
+        accepted = [server.transfer_pool.submit(release.wait, 5) for _ in range(config.TRANSFER_QUEUE_DEPTH + 2)]
+        release.set()
+        server.transfer_pool.shutdown(wait=True)
+        server.control_pool.shutdown(wait=True)
+        if accepted[-1] or server.control_pool.policy != 'block':
+            print("✗ GET com a fila de transferências cheia bloquearia a leitura do socket")
+            return False
+        print("✓ Política 'block' restrita à fila de controle")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste do pool de workers: {e}")
+        return False
+
+def test_reuse_port():
+    """Testa transferências atendidas por vários processos compartilhando a porta com SO_REUSEPORT"""
+    print("\nTestando SO_REUSEPORT...")
+    
+    import filecmp
+    import signal
+    import tempfile
+    
+    try:
+        from process_workers import HAS_REUSEPORT
+        from server import UDPServer
+        
+        if not HAS_REUSEPORT:
+            print("✓ SO_REUSEPORT indisponível nesta plataforma (teste ignorado)")
+            return True
+        
+        servers = [UDPServer('127.0.0.1', 8893, reuse_port=True) for _ in range(2)]
+        sockets = [server.create_socket() for server in servers]
+        try:
+            print("✓ Dois sockets associados à mesma porta")
+        finally:
+            for sock in sockets:
+                sock.close()
+            for server in servers:
+                server.stop()
+        
+        # Downloads simultâneos distribuídos pelo kernel entre os processos do servidor
+        output_dirs = [tempfile.mkdtemp() for _ in range(4)]
+        server_process = subprocess.Popen([
+            "python3", "server.py", "--port", "8893", "--workers", "2", "--no-pacing"
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            time.sleep(2)
+            clients = [subprocess.Popen([
+                "python3", "client.py", "127.0.0.1", "8893", "arquivo_medio.txt", "--output-dir", output_dir
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for output_dir in output_dirs]
+            returncodes = [client.wait(timeout=60) for client in clients]
+        finally:
+            # Ctrl+C no processo principal encerra também os workers
+            server_process.send_signal(signal.SIGINT)
+            server_process.wait(timeout=30)
+        
+        for returncode, output_dir in zip(returncodes, output_dirs):
+            output_file = os.path.join(output_dir, "arquivo_medio.txt")
+            if returncode != 0 or not filecmp.cmp("arquivo_medio.txt", output_file, shallow=False):
+                print(f"✗ Falha em um download com --workers 2 (código {returncode})")
+                return False
+        print(f"✓ {len(clients)} downloads simultâneos atendidos com --workers 2")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de SO_REUSEPORT: {e}")
+        return False
+
+def test_ready_handshake():
+    """Testa a repetição do FILE_INFO até o READY do cliente"""
+    print("\nTestando handshake FILE_INFO/READY...")
+    
+    import socket
+    import threading
+    
+    try:
+        import protocol
+        from server import UDPServer
+        
+        server = UDPServer('127.0.0.1', 8894, rate=0)
+        threading.Thread(target=server.start, daemon=True).start()
+        time.sleep(0.5)
+        
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        client.settimeout(2.0)
+        try:
+            request = b"GET arquivo_pequeno.txt mode=stream"
+            client.sendto(request, ('127.0.0.1', 8894))
+            first, _ = client.recvfrom(4096)
+            
+            # Sem READY o servidor repete o mesmo FILE_INFO; GETs repetidos não criam transferências
+            client.sendto(request, ('127.0.0.1', 8894))
+            second, _ = client.recvfrom(4096)
+            if not first.startswith(b'FILE_INFO ') or second != first or len(server.sessions) != 1:
+                print(f"✗ FILE_INFO não foi repetido: {second[:60]}")
+                return False
+            print("✓ FILE_INFO repetido enquanto o READY não chega")
+            
+            _, options = protocol.parse_options(first.decode('utf-8').split(' '))
+            ready = f"READY transfer={options['transfer']} segment_size={options['segment_size']} start=0"
+            client.sendto(ready.encode('utf-8'), ('127.0.0.1', 8894))
+            data, _ = client.recvfrom(65535)
+            while data.startswith(b'FILE_INFO '):
+                data, _ = client.recvfrom(65535)
+            if data[0] != protocol.MSG_DATA:
+                print("✗ Segmentos não enviados após o READY")
+                return False
+            print("✓ Segmentos enviados após o READY")
+            return True
+        finally:
+            client.close()
+            server.stop()
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de handshake: {e}")
+        return False
+
 def test_server_client():
     """Testa servidor e cliente básicos"""
     print("\nTestando servidor e cliente básicos...")
@@ -120,7 +1093,7 @@ def test_server_client():
         # Inicia servidor em background
         server_process = subprocess.Popen([
             "python3", "server.py", "--port", "8890"
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         
         # Aguarda servidor inicializar
         time.sleep(3)
@@ -153,6 +1126,360 @@ def test_server_client():
         print(f"✗ Erro no teste servidor/cliente: {e}")
         return False
 
+def test_selective_repeat_loss():
+    """Testa transferência selective repeat com perda simulada"""
+    print("\nTestando selective repeat com perda simulada...")
+    
+    import filecmp
+    import tempfile
+    
+    try:
+        output_dir = tempfile.mkdtemp()
+        
+        # Inicia servidor sem pacing em background
+        server_process = subprocess.Popen([
+            "python3", "server.py", "--port", "8891", "--no-pacing"
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        
+        # Aguarda servidor inicializar
+        time.sleep(2)
+        
+        # Cliente descarta 5% dos segmentos
+        result = subprocess.run([
+            "python3", "client.py", "127.0.0.1", "8891", "arquivo_medio.txt",
+            "--output-dir", output_dir, "--mode", "sr",
+            "--simulate-loss", "--loss-probability", "0.05"
+        ], capture_output=True, text=True, timeout=60)
+        
+        # Para servidor
+        server_process.terminate()
+        server_process.wait()
+        
+        output_file = os.path.join(output_dir, "arquivo_medio.txt")
+        if result.returncode == 0 and filecmp.cmp("arquivo_medio.txt", output_file, shallow=False):
+            print("✓ Arquivo recebido íntegro apesar das perdas")
+            return True
+        else:
+            print(f"✗ Falha na transferência: {result.stderr[-500:]}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Erro no teste selective repeat: {e}")
+        return False
+
+def test_fec_transfer():
+    """Testa a reconstrução de perdas por FEC nos modos stream e selective repeat"""
+    print("\nTestando transferência com FEC...")
+    
+    import filecmp
+    import re
+    import tempfile
+    
+    try:
+        output_dir = tempfile.mkdtemp()
+        server_process = subprocess.Popen([
+            "python3", "server.py", "--port", "8898", "--no-pacing"
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(2)
+        
+        for mode in ("stream", "sr"):
+            result = subprocess.run([
+                "python3", "client.py", "127.0.0.1", "8898", "arquivo_medio.txt",
+                "--output-dir", output_dir, "--mode", mode, "--fec", "16:2",
+                "--simulate-loss", "--loss-probability", "0.05"
+            ], capture_output=True, text=True, timeout=60)
+            
+            output_file = os.path.join(output_dir, "arquivo_medio.txt")
+            if result.returncode != 0 or not filecmp.cmp("arquivo_medio.txt", output_file, shallow=False):
+                server_process.terminate()
+                server_process.wait()
+                print(f"✗ Falha na transferência {mode}: {result.stderr[-500:]}")
+                return False
+            os.remove(output_file)
+            
+            recovered = re.search(r"(\d+) segmento\(s\) reconstruído\(s\) por FEC", result.stderr)
+            if not recovered:
+                server_process.terminate()
+                server_process.wait()
+                print(f"✗ Nenhuma perda reconstruída por FEC no modo {mode}")
+                return False
+            print(f"✓ Modo {mode}: {recovered.group(1)} segmentos reconstruídos sem retransmissão")
+        
+        server_process.terminate()
+        server_process.wait()
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de FEC: {e}")
+        return False
+
+def test_parallel_streams():
+    """Testa a divisão do arquivo em fluxos paralelos"""
+    print("\nTestando fluxos paralelos...")
+    
+    import filecmp
+    import tempfile
+    
+    try:
+        from client import split_segments
+        
+        if split_segments(10, 3) != [(0, 4), (4, 7), (7, 10)] or split_segments(2, 4) != [(0, 1), (1, 2)]:
+            print(f"✗ Divisão incorreta: {split_segments(10, 3)}")
+            return False
+        print("✓ Intervalos contíguos e balanceados")
+        
+        output_dir = tempfile.mkdtemp()
+        server_process = subprocess.Popen([
+            "python3", "server.py", "--port", "8895", "--no-pacing"
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(2)
+        
+        result = subprocess.run([
+            "python3", "client.py", "127.0.0.1", "8895", "arquivo_medio.txt",
+            "--output-dir", output_dir, "--streams", "3",
+            "--simulate-loss", "--loss-probability", "0.05"
+        ], capture_output=True, text=True, timeout=60)
+        
+        server_process.terminate()
+        server_process.wait()
+        
+        output_file = os.path.join(output_dir, "arquivo_medio.txt")
+        if result.returncode == 0 and filecmp.cmp("arquivo_medio.txt", output_file, shallow=False):
+            print("✓ Arquivo remontado a partir de 3 fluxos")
+            return True
+        else:
+            print(f"✗ Falha na transferência: {result.stderr[-500:]}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Erro no teste de fluxos paralelos: {e}")
+        return False
+
+def test_delta_sync():
+    """Testa a sincronização delta a partir de uma cópia local antiga"""
+    print("\nTestando sincronização delta...")
+    
+    import filecmp
+    import hashlib
+    import re
+    import tempfile
+    
+    try:
+        # Cópia local com alguns bytes alterados no início e no meio do arquivo
+        output_dir = tempfile.mkdtemp()
+        with open("arquivo_medio.txt", 'rb') as original:
+            content = bytearray(original.read())
+        for position in (0, len(content) // 2):
+            content[position] ^= 0xFF
+        with open(os.path.join(output_dir, "arquivo_medio.txt"), 'wb') as old_copy:
+            old_copy.write(content)
+        
+        server_process = subprocess.Popen([
+            "python3", "server.py", "--port", "8897", "--no-pacing"
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(2)
+        
+        result = subprocess.run([
+            "python3", "client.py", "127.0.0.1", "8897", "arquivo_medio.txt",
+            "--output-dir", output_dir, "--delta"
+        ], capture_output=True, text=True, timeout=60)
+        
+        server_process.terminate()
+        server_process.wait()
+        
+        output_file = os.path.join(output_dir, "arquivo_medio.txt")
+        if result.returncode != 0 or not filecmp.cmp("arquivo_medio.txt", output_file, shallow=False):
+            print(f"✗ Falha na transferência: {result.stderr[-500:]}")
+            return False
+        
+        # Só os dois segmentos alterados precisam vir do servidor
+        delta = re.search(r"Delta: (\d+) de (\d+) segmentos", result.stderr)
+        if not delta or int(delta.group(2)) - int(delta.group(1)) != 2:
+            print(f"✗ Segmentos iguais não foram reaproveitados: {delta.group(0) if delta else 'sem delta'}")
+            return False
+        print(f"✓ {delta.group(1)} de {delta.group(2)} segmentos reaproveitados da cópia local")
+        
+        # Remontagem que não confere com o digest não substitui a cópia local; .part e journal ficam
+        from client import UDPClient
+        from reassembly import FileAssembler
+        
+        client = UDPClient("127.0.0.1", 8897)
+        client.assembler = FileAssembler(output_file, len(content), 1024, 'md5', hashlib.md5(bytes(content)).hexdigest())
+        for segment_number in range(client.assembler.num_segments):
+            client.assembler.write(segment_number, bytes(client.assembler.segment_length(segment_number)))
+        saved = client.save_file(hashlib.md5(bytes(content)).hexdigest())
+        client.assembler.suspend()
+        if saved or not filecmp.cmp("arquivo_medio.txt", output_file, shallow=False) or not os.path.exists(client.assembler.journal_path):
+            print("✗ Arquivo com digest divergente substituiu a cópia local")
+            return False
+        print("✓ Digest divergente mantém a cópia local e o .part para retomada")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de sincronização delta: {e}")
+        return False
+
+def test_multicast():
+    """Testa a distribuição multicast para vários receptores com recuperação por NACK unicast"""
+    print("\nTestando distribuição multicast...")
+    
+    import filecmp
+    import re
+    import tempfile
+    
+    try:
+        import multicast
+        from sessions import TransferSession
+        
+        if multicast.parse_group("239.255.42.99:9889") != ("239.255.42.99", 9889):
+            print("✗ Grupo multicast mal interpretado")
+            return False
+        try:
+            multicast.parse_group("10.0.0.1:9889")
+            print("✗ Endereço unicast aceito como grupo")
+            return False
+        except ValueError:
+            pass
+        
+        # Só o primeiro receptor conduz o envio; ao fechar, as transferências voltam a expirar
+        table = multicast.ChannelTable()
+        channel = table.add(multicast.Channel(("arquivo", 1024), TransferSession(1, "arquivo", ("239.255.42.99", 9889), "md5")))
+        receivers = [TransferSession(n, "arquivo", ("127.0.0.1", 5000 + n), "md5") for n in (2, 3)]
+        if [table.join(channel, session) for session in receivers] != [True, False]:
+            print("✗ Canal deveria ser iniciado só pelo primeiro receptor")
+            return False
+        if not all(session.sending for session in receivers) or table.close(channel) != receivers:
+            print("✗ Receptores não acompanharam o canal")
+            return False
+        if any(session.sending for session in receivers) or len(table) or table.join(channel, receivers[0]):
+            print("✗ Canal encerrado continuou aceitando receptores")
+            return False
+        print("✓ Canal compartilhado iniciado pelo primeiro receptor")
+        
+        try:
+            multicast.open_receiver(("239.255.42.99", 9889), "127.0.0.1").close()
+        except OSError as e:
+            print(f"✓ Multicast indisponível neste ambiente ({e}; transferência ignorada)")
+            return True
+        
+        # Três receptores, um com perdas, recebem o mesmo envio ao grupo; os logs vão para arquivos
+        # temporários, que não enchem como um pipe lido só no final
+        output_dirs = [tempfile.mkdtemp() for _ in range(3)]
+        logs = [tempfile.TemporaryFile(mode='w+') for _ in range(4)]
+        server_process = subprocess.Popen([
+            "python3", "server.py", "--host", "127.0.0.1", "--port", "8889", "--no-pacing",
+            "--multicast", "239.255.42.99:9889"
+        ], stdout=subprocess.DEVNULL, stderr=logs[0], text=True)
+        try:
+            time.sleep(2)
+            clients = [subprocess.Popen([
+                "python3", "client.py", "127.0.0.1", "8889", "arquivo_medio.txt",
+                "--output-dir", output_dir, "--multicast"
+            ] + (["--simulate-loss", "--loss-probability", "0.05"] if index == 0 else []),
+                stdout=subprocess.DEVNULL, stderr=log, text=True)
+                for index, (output_dir, log) in enumerate(zip(output_dirs, logs[1:]))]
+            returncodes = [client.wait(timeout=60) for client in clients]
+        finally:
+            server_process.terminate()
+            server_process.wait()
+        
+        for log in logs:
+            log.seek(0)
+        server_log = logs[0].read()
+        results = [(returncode, log.read()) for returncode, log in zip(returncodes, logs[1:])]
+        for log in logs:
+            log.close()
+        
+        for (returncode, log), output_dir in zip(results, output_dirs):
+            output_file = os.path.join(output_dir, "arquivo_medio.txt")
+            if returncode != 0 or not filecmp.cmp("arquivo_medio.txt", output_file, shallow=False):
+                print(f"✗ Falha em um receptor multicast: {log[-500:]}")
+                return False
+        
+        channels = re.findall(r"Canal multicast \d+ .*: (\d+) receptor", server_log)
+        if channels != ["3"]:
+            print(f"✗ Esperado um único envio para 3 receptores, obtido {channels}")
+            return False
+        if not re.search(r"Rodada \d+: \d+ de \d+ segmentos recuperados", results[0][1]):
+            print("✗ Perdas do receptor não foram recuperadas por NACK")
+            return False
+        print("✓ Um único envio ao grupo para 3 receptores; perdas recuperadas por NACK unicast")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erro no teste de multicast: {e}")
+        return False
+
+def test_async_engine():
+    """Testa o servidor asyncio com perda simulada"""
+    print("\nTestando servidor asyncio...")
+    
+    import asyncio
+    import filecmp
+    import tempfile
+    
+    try:
+        from async_server import AsyncUDPServer
+        
+        # Sem pools de workers, e o envio com o buffer cheio aguarda a escrita pelo event loop
+        server = AsyncUDPServer('127.0.0.1', 0)
+        if server.transfer_pool is not None or server.control_pool is not None:
+            print("✗ Servidor asyncio criou pools de workers")
+            return False
+        
+        async def wait_writable():
+            server.loop = asyncio.get_event_loop()
+            server.socket = server.create_socket()
+            server.writer_socket = server.socket.dup()
+            try:
+                await asyncio.wait_for(asyncio.shield(server.wait_writable()), timeout=1)
+            finally:
+                server.writer_socket.close()
+                server.socket.close()
+        
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(wait_writable())
+        finally:
+            loop.close()
+        print("✓ Envio aguarda o socket pelo event loop, sem pools de workers")
+        
+        output_dir = tempfile.mkdtemp()
+        
+        # Inicia servidor asyncio sem pacing em background
+        server_process = subprocess.Popen([
+            "python3", "server.py", "--port", "8892", "--no-pacing", "--engine", "asyncio"
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        
+        # Aguarda servidor inicializar
+        time.sleep(2)
+        
+        # Selective repeat e stream (NACK) sobre o mesmo event loop
+        for mode in ("sr", "stream"):
+            result = subprocess.run([
+                "python3", "client.py", "127.0.0.1", "8892", "arquivo_medio.txt",
+                "--output-dir", output_dir, "--mode", mode,
+                "--simulate-loss", "--loss-probability", "0.05"
+            ], capture_output=True, text=True, timeout=60)
+            
+            output_file = os.path.join(output_dir, "arquivo_medio.txt")
+            if result.returncode != 0 or not filecmp.cmp("arquivo_medio.txt", output_file, shallow=False):
+                server_process.terminate()
+                server_process.wait()
+                print(f"✗ Falha na transferência {mode}: {result.stderr[-500:]}")
+                return False
+            os.remove(output_file)
+            print(f"✓ Modo {mode} íntegro no servidor asyncio")
+        
+        # Para servidor
+        server_process.terminate()
+        server_process.wait()
+        return True
+            
+    except Exception as e:
+        print(f"✗ Erro no teste do servidor asyncio: {e}")
+        return False
+
 def main():
     """Função principal de teste"""
     print("TESTE SIMPLES DO SISTEMA UDP")
@@ -162,7 +1489,32 @@ def main():
         ("Imports", test_imports),
         ("Criação de Arquivo", test_file_creation),
         ("Hello World UDP", test_hello_world),
-        ("Servidor/Cliente", test_server_client)
+        ("Pacing", test_pacing),
+        ("Estimativa de RTT", test_rtt_estimator),
+        ("Controle de Congestionamento", test_congestion_control),
+        ("NACK", test_nack_ranges),
+        ("Código FEC", test_fec_code),
+        ("Cache de Segmentos", test_segment_cache),
+        ("Índice de Checksums", test_checksum_index),
+        ("Bitmap de Segmentos", test_segment_bitmap),
+        ("Remontagem em Disco", test_file_assembler),
+        ("Retomada de Downloads", test_resume_journal),
+        ("Leituras Parciais", test_byte_ranges),
+        ("Negociação de Checksum", test_checksum_negotiation),
+        ("Compressão", test_compression),
+        ("IDs de Transferência", test_transfer_sessions),
+        ("Limites de Sessões", test_session_limits),
+        ("Tamanho de Segmento", test_segment_size_negotiation),
+        ("Pool de Workers", test_worker_pool),
+        ("SO_REUSEPORT", test_reuse_port),
+        ("Handshake READY", test_ready_handshake),
+        ("Servidor/Cliente", test_server_client),
+        ("Selective Repeat com Perda", test_selective_repeat_loss),
+        ("FEC com Perda", test_fec_transfer),
+        ("Fluxos Paralelos", test_parallel_streams),
+        ("Sincronização Delta", test_delta_sync),
+        ("Distribuição Multicast", test_multicast),
+        ("Servidor Asyncio", test_async_engine)
     ]
     
     passed = 0
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Pool de Workers com Fila Limitada para o Servidor UDP
+Substitui uma thread por datagrama por um número fixo de threads e uma fila com política de descarte
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Set
+
+class BoundedExecutor:
+    """ThreadPoolExecutor que aceita no máximo max_workers + queue_depth tarefas pendentes"""
+
+    POLICIES = ('drop', 'block')
+
+    def __init__(self, name: str, max_workers: int, queue_depth: int, policy: str = 'drop'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de fila inválida: {policy}")
+
+        self.name = name
+        self.policy = policy
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.slots = threading.BoundedSemaphore(max_workers + queue_depth)
+        self.lock = threading.Lock()
+        self.pending: Set[Future] = set()  # Tarefas ainda não concluídas, canceladas no shutdown
+
+        # Contadores de desempenho
+        self.submitted = 0
+        self.dropped = 0
+
+    def submit(self, fn: Callable, *args) -> bool:
+        """Enfileira uma tarefa; com a fila cheia descarta ('drop') ou espera ('block')"""
+        if not self.slots.acquire(blocking=self.policy == 'block'):
+            with self.lock:
+                self.dropped += 1
+            return False
+
+        try:
+            future = self.executor.submit(self._run, fn, args)
+        except RuntimeError:
+            # Pool já encerrado
+            self.slots.release()
+            return False
+
+        with self.lock:
+            self.submitted += 1
+            self.pending.add(future)
+        future.add_done_callback(self._forget)
+        return True
+
+    def _forget(self, future: Future):
+        """Remove uma tarefa concluída ou cancelada do conjunto de pendentes"""
+        with self.lock:
+            self.pending.discard(future)
+
+    def _run(self, fn: Callable, args: tuple):
+        """Executa a tarefa e libera sua vaga na fila"""
+        try:
+            fn(*args)
+        finally:
+            self.slots.release()
+
+    def shutdown(self, wait: bool = False):
+        """Encerra o pool descartando tarefas ainda não iniciadas"""
+        # Cancela a fila manualmente: shutdown(cancel_futures=True) só existe a partir do Python 3.9
+        with self.lock:
+            pending = list(self.pending)
+        for future in pending:
+            future.cancel()
+        self.executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, int]:
+        """Resumo dos contadores do pool"""
+        with self.lock:
+            return {'submitted': self.submitted, 'dropped': self.dropped}